@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     Etudiant, Professeur, Administrateur, Classe,
-    Matiere, Note, BanqueExercices, Ressource  # 👈 Ajoutez Ressource ici
+    Matiere, Note, BanqueExercices, Ressource,  # 👈 Ajoutez Ressource ici
+    SyntheseNotes
 )
 
 @admin.register(Etudiant)
@@ -46,4 +47,12 @@ class BanqueExercicesAdmin(admin.ModelAdmin):
 class RessourceAdmin(admin.ModelAdmin):
     list_display = ('titre', 'matiere', 'Type_ressource', 'created_at')
     list_filter = ('Type_ressource', 'matiere')
-    search_fields = ('titre', 'description')
\ No newline at end of file
+    search_fields = ('titre', 'description')
+
+@admin.register(SyntheseNotes)
+class SyntheseNotesAdmin(admin.ModelAdmin):
+    list_display = ('student', 'matiere', 'nb_notes', 'somme', 'note_min', 'note_max', 'derniere_date')
+    list_filter = ('matiere',)
+    search_fields = ('student__nom', 'student__prenom')
+    raw_id_fields = ('student', 'matiere')
+    readonly_fields = ('updated_at',)
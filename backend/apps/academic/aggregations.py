@@ -0,0 +1,136 @@
+"""
+Agrégation des notes en un nombre constant de requêtes.
+
+Les moyennes par matière sont calculées en une seule requête groupée
+(values('matiere').annotate(...)) au lieu d'une boucle sur Matiere, et la
+comparaison de deux périodes (progression) en un seul aggregate() conditionnel.
+"""
+from django.db.models import Avg, Count, Q, Sum
+
+
+def calculer_priorite(moyenne, coefficient):
+    """Priorité d'une matière (0-100) utilisée par le moteur de suggestions"""
+    if moyenne >= 16:
+        return 0  # Déjà excellent
+    elif moyenne >= 12:
+        return 30  # Correct
+    elif moyenne >= 10:
+        return 60  # Limite
+    else:
+        # Priorité élevée : (10 - moyenne) * coefficient * 5
+        return min(100, (10 - moyenne) * coefficient * 5)
+
+
+def calculer_priorite_lineaire(moyenne, coefficient):
+    """Priorité linéaire (10 - moyenne) * coefficient * 5, bornée à 0-100"""
+    return max(0, min(100, int((10 - moyenne) * coefficient * 5)))
+
+
+class ResumeNotes:
+    """Résultat compact d'une agrégation de notes par matière"""
+
+    def __init__(self, par_matiere, sommes):
+        # {matiere_id: {'nom', 'moyenne', 'nb_notes', 'nb_reussites', 'coefficient', 'priorite'}}
+        self.par_matiere = par_matiere
+        self.nb_notes = sum(m['nb_notes'] for m in par_matiere.values())
+        self.nb_reussites = sum(m['nb_reussites'] for m in par_matiere.values())
+        somme_totale = sum(sommes.values())
+        self.moyenne_generale = somme_totale / self.nb_notes if self.nb_notes else None
+
+    def moyennes_par_nom(self):
+        """{nom_matiere: moyenne} pour les réponses indexées par nom"""
+        return {m['nom']: m['moyenne'] for m in self.par_matiere.values()}
+
+    def matieres_risque(self, seuil=10):
+        """Matières dont la moyenne est strictement inférieure au seuil"""
+        return [m for m in self.par_matiere.values() if m['moyenne'] < seuil]
+
+
+def _performance_matiere(ligne, calcul_priorite):
+    """Convertit une ligne groupée par matière en dictionnaire de performance"""
+    moyenne = float(ligne['moyenne'])
+    coefficient = ligne['matiere__coefficient']
+    return {
+        'nom': ligne['matiere__nom_matière'],
+        'moyenne': moyenne,
+        'nb_notes': ligne['nb_notes'],
+        'nb_reussites': ligne['nb_reussites'],
+        'coefficient': coefficient,
+        'priorite': calcul_priorite(moyenne, coefficient),
+    }
+
+
+def agreger_notes(notes, calcul_priorite=calculer_priorite):
+    """
+    Agrège un queryset de Note par matière en une seule requête.
+
+    La moyenne générale est déduite des sommes par matière, sans requête
+    supplémentaire.
+    """
+    lignes = notes.order_by().values(
+        'matiere', 'matiere__nom_matière', 'matiere__coefficient'
+    ).annotate(
+        somme=Sum('valeur_note'),
+        nb_notes=Count('id_note'),
+        nb_reussites=Count('id_note', filter=Q(valeur_note__gte=10)),
+        moyenne=Avg('valeur_note'),
+    )
+
+    par_matiere = {}
+    sommes = {}
+    for ligne in lignes:
+        par_matiere[ligne['matiere']] = _performance_matiere(ligne, calcul_priorite)
+        sommes[ligne['matiere']] = float(ligne['somme'])
+
+    return ResumeNotes(par_matiere, sommes)
+
+
+def agreger_notes_par_etudiant(notes, calcul_priorite=calculer_priorite):
+    """
+    Agrège un queryset de Note par (étudiant, matière) en une seule requête.
+
+    Retourne {student_id: ResumeNotes}, pour les traitements par lot
+    (classe entière, snapshots).
+    """
+    lignes = notes.order_by().values(
+        'student', 'matiere', 'matiere__nom_matière', 'matiere__coefficient'
+    ).annotate(
+        somme=Sum('valeur_note'),
+        nb_notes=Count('id_note'),
+        nb_reussites=Count('id_note', filter=Q(valeur_note__gte=10)),
+        moyenne=Avg('valeur_note'),
+    )
+
+    par_etudiant = {}
+    for ligne in lignes:
+        par_matiere, sommes = par_etudiant.setdefault(ligne['student'], ({}, {}))
+        par_matiere[ligne['matiere']] = _performance_matiere(ligne, calcul_priorite)
+        sommes[ligne['matiere']] = float(ligne['somme'])
+
+    return {
+        student_id: ResumeNotes(par_matiere, sommes)
+        for student_id, (par_matiere, sommes) in par_etudiant.items()
+    }
+
+
+def comparer_periodes(notes, coupure, debut=None):
+    """
+    Moyennes et effectifs avant/après une date de coupure en une requête.
+
+    Si `debut` est fourni, la période « avant » est bornée à [debut, coupure[.
+    """
+    avant = Q(date_note__lt=coupure)
+    if debut is not None:
+        avant &= Q(date_note__gte=debut)
+    apres = Q(date_note__gte=coupure)
+
+    resultat = notes.order_by().aggregate(
+        moyenne_avant=Avg('valeur_note', filter=avant),
+        nb_avant=Count('id_note', filter=avant),
+        moyenne_apres=Avg('valeur_note', filter=apres),
+        nb_apres=Count('id_note', filter=apres),
+    )
+    for cle in ('moyenne_avant', 'moyenne_apres'):
+        if resultat[cle] is not None:
+            resultat[cle] = float(resultat[cle])
+    return resultat
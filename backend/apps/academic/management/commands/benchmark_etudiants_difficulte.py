@@ -0,0 +1,109 @@
+import random
+import time
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.test import force_authenticate
+from apps.academic.models import Classe, Etudiant, Matiere, SyntheseNotes, SyntheseEtudiant
+from apps.academic.views import EtudiantsEnDifficulteView
+
+User = get_user_model()
+
+
+class Annulation(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Mesure EtudiantsEnDifficulteView sur un jeu synthétique "
+            "(créé dans une transaction annulée à la fin)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--etudiants', type=int, default=50000)
+        parser.add_argument('--matieres', type=int, default=5)
+        parser.add_argument('--classes', type=int, default=50)
+        parser.add_argument('--repetitions', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._mesurer(options)
+                raise Annulation
+        except Annulation:
+            self.stdout.write("Jeu de données synthétique annulé")
+
+    def _mesurer(self, options):
+        nb_etudiants = options['etudiants']
+        debut = time.monotonic()
+
+        classes = Classe.objects.bulk_create([
+            Classe(nom_class=f'Bench {i}', niveau='Bench') for i in range(options['classes'])
+        ])
+        matieres = Matiere.objects.bulk_create([
+            Matiere(nom_matière=f'Bench {i}', coefficient=1 + i % 4) for i in range(options['matieres'])
+        ])
+        users = User.objects.bulk_create([
+            User(username=f'bench_{i}', password='!') for i in range(nb_etudiants)
+        ], batch_size=2000)
+        etudiants = Etudiant.objects.bulk_create([
+            Etudiant(
+                matricule=f'BENCH{i}', nom='Bench', prenom=str(i), email=f'bench{i}@bench.local',
+                date_inscription=date.today(), classe=classes[i % len(classes)], user=user
+            )
+            for i, user in enumerate(users)
+        ], batch_size=2000)
+        # Les clés primaires ne sont pas renvoyées par bulk_create sur MySQL
+        etudiant_ids = list(
+            Etudiant.objects.filter(matricule__startswith='BENCH').values_list('id_student', flat=True)
+        )
+        syntheses = []
+        totaux = []
+        for etudiant_id in etudiant_ids:
+            somme = nombre = 0
+            for matiere in matieres:
+                valeurs = [random.randint(0, 20) for _ in range(4)]
+                somme += sum(valeurs)
+                nombre += len(valeurs)
+                syntheses.append(SyntheseNotes(
+                    student_id=etudiant_id, matiere=matiere, somme=sum(valeurs),
+                    nb_notes=len(valeurs), note_min=min(valeurs), note_max=max(valeurs),
+                    nb_reussites=sum(v >= 10 for v in valeurs), derniere_date=date.today(),
+                    somme_validees=sum(valeurs), nb_validees=len(valeurs)
+                ))
+            totaux.append(SyntheseEtudiant(
+                student_id=etudiant_id, somme=somme, nb_notes=nombre,
+                somme_validees=somme, nb_validees=nombre,
+                moyenne=somme / nombre, moyenne_validees=somme / nombre
+            ))
+        SyntheseNotes.objects.bulk_create(syntheses, batch_size=5000)
+        SyntheseEtudiant.objects.bulk_create(totaux, batch_size=5000)
+        self.stdout.write(
+            f"{len(etudiants)} étudiants, {len(syntheses)} lignes de synthèse "
+            f"créés en {time.monotonic() - debut:.1f}s"
+        )
+
+        vue = EtudiantsEnDifficulteView.as_view()
+        factory = RequestFactory(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        admin = users[0]
+        scenarios = {
+            'sans filtre': {},
+            'classe': {'classe': classes[0].id_classe},
+            'matiere + validees': {'matiere': matieres[0].id_matiere, 'validees': 'true'},
+        }
+        for nom, params in scenarios.items():
+            durees = []
+            for _ in range(options['repetitions']):
+                requete = factory.get('/api/academic/etudiants/difficile/', params)
+                force_authenticate(requete, user=admin)
+                t0 = time.perf_counter()
+                reponse = vue(requete)
+                reponse.render()
+                durees.append((time.perf_counter() - t0) * 1000)
+            self.stdout.write(
+                f"{nom:<20} : médiane {sorted(durees)[len(durees) // 2]:.1f} ms "
+                f"({reponse.data['count']} étudiants en difficulté)"
+            )
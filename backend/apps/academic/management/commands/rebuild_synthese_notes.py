@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.academic.synthese import reconstruire
+
+
+class Command(BaseCommand):
+    help = "Reconstruit la synthèse matérialisée des notes (SyntheseNotes) à partir de la table note"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=1000, help='Taille des lots bulk_create')
+
+    def handle(self, *args, **options):
+        debut = time.monotonic()
+        nb_lignes = reconstruire(taille_lot=options['taille_lot'])
+        duree = time.monotonic() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"{nb_lignes} lignes de synthèse reconstruites en {duree:.2f}s"
+        ))
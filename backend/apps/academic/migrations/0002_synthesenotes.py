@@ -0,0 +1,62 @@
+# Generated by Django 4.2 on 2026-10-18 10:41
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+import django.db.models.deletion
+
+
+def remplir_synthese(apps, schema_editor):
+    """Alimente la synthèse à partir des notes existantes"""
+    Note = apps.get_model('academic', 'Note')
+    SyntheseNotes = apps.get_model('academic', 'SyntheseNotes')
+
+    lignes = Note.objects.order_by().values('student', 'matiere').annotate(
+        somme=Sum('valeur_note'),
+        nb_notes=Count('id_note'),
+        note_min=Min('valeur_note'),
+        note_max=Max('valeur_note'),
+        nb_reussites=Count('id_note', filter=Q(valeur_note__gte=10)),
+        derniere_date=Max('date_note'),
+        somme_validees=Sum('valeur_note', filter=Q(valide=True)),
+        nb_validees=Count('id_note', filter=Q(valide=True)),
+    )
+    SyntheseNotes.objects.bulk_create([
+        SyntheseNotes(
+            student_id=ligne.pop('student'),
+            matiere_id=ligne.pop('matiere'),
+            **dict(ligne, somme_validees=ligne['somme_validees'] or 0)
+        )
+        for ligne in lignes
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyntheseNotes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('somme', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('nb_notes', models.IntegerField(default=0)),
+                ('note_min', models.DecimalField(decimal_places=2, max_digits=5, null=True)),
+                ('note_max', models.DecimalField(decimal_places=2, max_digits=5, null=True)),
+                ('nb_reussites', models.IntegerField(default=0)),
+                ('derniere_date', models.DateField(null=True)),
+                ('somme_validees', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('nb_validees', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('matiere', models.ForeignKey(db_column='id_matiere', on_delete=django.db.models.deletion.CASCADE, to='academic.matiere')),
+                ('student', models.ForeignKey(db_column='id_student', on_delete=django.db.models.deletion.CASCADE, related_name='syntheses_notes', to='academic.etudiant')),
+            ],
+            options={
+                'db_table': 'synthese_notes',
+                'unique_together': {('student', 'matiere')},
+            },
+        ),
+        migrations.RunPython(remplir_synthese, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2 on 2026-10-18 10:44
+
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def remplir_synthese_etudiant(apps, schema_editor):
+    """Alimente les totaux par étudiant à partir de SyntheseNotes"""
+    SyntheseNotes = apps.get_model('academic', 'SyntheseNotes')
+    SyntheseEtudiant = apps.get_model('academic', 'SyntheseEtudiant')
+
+    lignes = SyntheseNotes.objects.order_by().values('student').annotate(
+        total=Sum('somme'),
+        nombre=Sum('nb_notes'),
+        total_validees=Sum('somme_validees'),
+        nombre_validees=Sum('nb_validees'),
+    )
+    SyntheseEtudiant.objects.bulk_create([
+        SyntheseEtudiant(
+            student_id=ligne['student'],
+            somme=ligne['total'],
+            nb_notes=ligne['nombre'],
+            somme_validees=ligne['total_validees'],
+            nb_validees=ligne['nombre_validees'],
+            moyenne=float(ligne['total']) / ligne['nombre'] if ligne['nombre'] else None,
+            moyenne_validees=(
+                float(ligne['total_validees']) / ligne['nombre_validees']
+                if ligne['nombre_validees'] else None
+            ),
+        )
+        for ligne in lignes
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0002_synthesenotes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyntheseEtudiant',
+            fields=[
+                ('student', models.OneToOneField(db_column='id_student', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='synthese', serialize=False, to='academic.etudiant')),
+                ('somme', models.DecimalField(decimal_places=2, default=0, max_digits=11)),
+                ('nb_notes', models.IntegerField(default=0)),
+                ('somme_validees', models.DecimalField(decimal_places=2, default=0, max_digits=11)),
+                ('nb_validees', models.IntegerField(default=0)),
+                ('moyenne', models.FloatField(null=True)),
+                ('moyenne_validees', models.FloatField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'synthese_etudiant',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='syntheseetudiant',
+            index=models.Index(fields=['moyenne'], name='synthese_et_moyenne_a4874f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='syntheseetudiant',
+            index=models.Index(fields=['moyenne_validees'], name='synthese_et_moyenne_4e6a69_idx'),
+        ),
+        migrations.RunPython(remplir_synthese_etudiant, migrations.RunPython.noop),
+    ]
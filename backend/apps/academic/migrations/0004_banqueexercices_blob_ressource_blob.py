@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 11:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fichiers', '0001_initial'),
+        ('academic', '0003_syntheseetudiant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banqueexercices',
+            name='blob',
+            field=models.ForeignKey(blank=True, db_column='blob_sha256', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='exercices', to='fichiers.blob'),
+        ),
+        migrations.AddField(
+            model_name='ressource',
+            name='blob',
+            field=models.ForeignKey(blank=True, db_column='blob_sha256', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ressources', to='fichiers.blob'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0004_banqueexercices_blob_ressource_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professeur',
+            name='classes',
+            field=models.ManyToManyField(blank=True, db_table='professeur_classe', related_name='professeurs', to='academic.classe'),
+        ),
+    ]
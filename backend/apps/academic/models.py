@@ -1,5 +1,6 @@
 from django.db import models
 from apps.accounts.models import User
+from apps.fichiers.models import Blob
 
 
 class Classe(models.Model):
@@ -34,6 +35,8 @@ class Professeur(models.Model):
     prenom_prof = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     specialite = models.CharField(max_length=100, blank=True, null=True)
+    # Classes enseignées ; le compte User du professeur partage son email
+    classes = models.ManyToManyField(Classe, blank=True, related_name='professeurs', db_table='professeur_classe')
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -122,6 +125,53 @@ class Note(models.Model):
     def __str__(self):
         return f"{self.student} - {self.matiere}: {self.valeur_note}/20"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Clé de synthèse au chargement, pour mettre à jour l'ancienne ligne
+        # si l'étudiant ou la matière change
+        instance._cle_synthese = (instance.__dict__.get('student_id'), instance.__dict__.get('matiere_id'))
+        return instance
+
+
+class SyntheseNotes(models.Model):
+    """Synthèse matérialisée des notes d'un étudiant dans une matière"""
+    student = models.ForeignKey(
+        Etudiant,
+        on_delete=models.CASCADE,
+        db_column='id_student',
+        related_name='syntheses_notes'
+    )
+    matiere = models.ForeignKey(
+        Matiere,
+        on_delete=models.CASCADE,
+        db_column='id_matiere'
+    )
+    somme = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    nb_notes = models.IntegerField(default=0)
+    note_min = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    note_max = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    nb_reussites = models.IntegerField(default=0)  # notes >= 10
+    derniere_date = models.DateField(null=True)
+    somme_validees = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    nb_validees = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'synthese_notes'
+        unique_together = ['student', 'matiere']
+
+    def __str__(self):
+        return f"{self.student_id} - {self.matiere_id}: {self.nb_notes} notes"
+
+    @property
+    def moyenne(self):
+        return float(self.somme) / self.nb_notes if self.nb_notes else None
+
+    @property
+    def moyenne_validees(self):
+        return float(self.somme_validees) / self.nb_validees if self.nb_validees else None
+
 
 class BanqueExercices(models.Model):
     NIVEAUX_DIFFICULTE = (
@@ -139,6 +189,15 @@ class BanqueExercices(models.Model):
     titre = models.CharField(max_length=255)
     niveau_difficulte = models.IntegerField(choices=NIVEAUX_DIFFICULTE)
     fichier_url = models.TextField()
+    # Fichier stocké par contenu ; fichier_url pointe alors vers son adresse
+    blob = models.ForeignKey(
+        Blob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='exercices',
+        db_column='blob_sha256'
+    )
     cree_par = models.ForeignKey(
         Professeur,
         on_delete=models.CASCADE,
@@ -171,6 +230,14 @@ class Ressource(models.Model):
     description = models.TextField(blank=True, null=True)
     Type_ressource = models.CharField(max_length=20, choices=TYPE_RESSOURCE)
     fichier_url = models.TextField()
+    blob = models.ForeignKey(
+        Blob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='ressources',
+        db_column='blob_sha256'
+    )
     cree_par_admin = models.ForeignKey(
         Administrateur,
         on_delete=models.CASCADE,
@@ -182,4 +249,32 @@ class Ressource(models.Model):
         db_table = 'ressource'
 
     def __str__(self):
-        return self.titre
\ No newline at end of file
+        return self.titre
+
+
+class SyntheseEtudiant(models.Model):
+    """Totaux toutes matières d'un étudiant, avec moyennes indexées"""
+    student = models.OneToOneField(
+        Etudiant,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        db_column='id_student',
+        related_name='synthese'
+    )
+    somme = models.DecimalField(max_digits=11, decimal_places=2, default=0)
+    nb_notes = models.IntegerField(default=0)
+    somme_validees = models.DecimalField(max_digits=11, decimal_places=2, default=0)
+    nb_validees = models.IntegerField(default=0)
+    moyenne = models.FloatField(null=True)
+    moyenne_validees = models.FloatField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'synthese_etudiant'
+        indexes = [
+            models.Index(fields=['moyenne']),
+            models.Index(fields=['moyenne_validees']),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id}: {self.moyenne}"
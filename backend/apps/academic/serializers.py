@@ -1,4 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
+from apps.fichiers.liens import sha256_de_url, url_blob
+from apps.fichiers.stockage import enregistrer
 from .models import (
     Etudiant, Professeur, Classe, Matiere,
     Note, Ressource, BanqueExercices, Administrateur
@@ -28,6 +31,13 @@ class EtudiantSerializer(serializers.ModelSerializer):
         return f"{obj.prenom} {obj.nom}"
 
 
+class EtudiantDifficulteSerializer(EtudiantSerializer):
+    moyenne = serializers.FloatField(read_only=True)
+
+    class Meta(EtudiantSerializer.Meta):
+        fields = EtudiantSerializer.Meta.fields + ['moyenne']
+
+
 class ProfesseurSerializer(serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
 
@@ -87,32 +97,88 @@ class NoteSerializer(serializers.ModelSerializer):
         return value
 
 
-class RessourceSerializer(serializers.ModelSerializer):
+class FichierStockeMixin:
+    """
+    Accepte un upload `fichier`, stocké par contenu (apps.fichiers) : le
+    blob est référencé et fichier_url pointe vers son adresse, exposée en
+    lien signé. Une simple URL dans fichier_url reste possible (liens
+    externes).
+    """
+
+    def validate_fichier(self, value):
+        taille_max = getattr(settings, 'BLOBS_TAILLE_MAX', 100 * 1024 * 1024)
+        if value.size > taille_max:
+            raise serializers.ValidationError(
+                f"Fichier trop volumineux. Maximum: {taille_max // (1024 * 1024)}MB"
+            )
+        return value
+
+    def validate(self, data):
+        data = super().validate(data)
+        if not self.partial and not data.get('fichier') and not data.get('fichier_url'):
+            raise serializers.ValidationError({'fichier_url': 'Fournissez une URL ou un fichier'})
+        return data
+
+    def create(self, validated_data):
+        self._stocker(validated_data)
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        fichier_stocke = self._stocker(validated_data)
+        if not fichier_stocke and 'fichier_url' in validated_data:
+            if instance.blob_id and sha256_de_url(validated_data['fichier_url']) == instance.blob_id:
+                # Lien signé renvoyé tel quel par le formulaire : fichier inchangé
+                validated_data['fichier_url'] = instance.fichier_url
+            elif validated_data['fichier_url'] != instance.fichier_url:
+                # Nouvelle URL externe : le blob précédent n'est plus référencé
+                validated_data['blob'] = None
+        return super().update(instance, validated_data)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.blob_id:
+            data['fichier_url'] = url_blob(instance.blob_id, self.context.get('request'))
+        return data
+
+    def _stocker(self, validated_data):
+        fichier = validated_data.pop('fichier', None)
+        if fichier is None:
+            return False
+        validated_data['blob'] = enregistrer(fichier)
+        validated_data['fichier_url'] = validated_data['blob'].url
+        return True
+
+
+class RessourceSerializer(FichierStockeMixin, serializers.ModelSerializer):
     matiere_nom = serializers.CharField(source='matiere.nom_matière', read_only=True)
     cree_par_nom = serializers.CharField(source='cree_par_admin.nom', read_only=True)
+    fichier = serializers.FileField(write_only=True, required=False)
 
     class Meta:
         model = Ressource
         fields = [
             'id_ressource', 'matiere', 'matiere_nom', 'titre', 'description',
-            'Type_ressource', 'fichier_url', 'cree_par_admin', 'cree_par_nom', 'created_at'
+            'Type_ressource', 'fichier_url', 'fichier', 'blob', 'cree_par_admin', 'cree_par_nom', 'created_at'
         ]
-        read_only_fields = ['id_ressource', 'created_at']
+        read_only_fields = ['id_ressource', 'blob', 'created_at']
+        extra_kwargs = {'fichier_url': {'required': False}}
 
 
-class BanqueExercicesSerializer(serializers.ModelSerializer):
+class BanqueExercicesSerializer(FichierStockeMixin, serializers.ModelSerializer):
     subject_nom = serializers.CharField(source='subject.nom_matière', read_only=True)
     cree_par_nom = serializers.CharField(source='cree_par.nom_prof', read_only=True)
     difficulte_label = serializers.SerializerMethodField()
+    fichier = serializers.FileField(write_only=True, required=False)
 
     class Meta:
         model = BanqueExercices
         fields = [
             'id_exercice', 'subject', 'subject_nom', 'titre',
-            'niveau_difficulte', 'difficulte_label', 'fichier_url',
+            'niveau_difficulte', 'difficulte_label', 'fichier_url', 'fichier', 'blob',
             'cree_par', 'cree_par_nom', 'created_at'
         ]
-        read_only_fields = ['id_exercice', 'created_at']
+        read_only_fields = ['id_exercice', 'blob', 'created_at']
+        extra_kwargs = {'fichier_url': {'required': False}}
 
     def get_difficulte_label(self, obj):
         return dict(BanqueExercices.NIVEAUX_DIFFICULTE).get(obj.niveau_difficulte, '')
\ No newline at end of file
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Note
+from . import synthese
+
+
+@receiver(post_save, sender=Note)
+def synthese_note_enregistree(sender, instance, created, raw=False, **kwargs):
+    """Création : incrément ; modification/validation : recalcul des lignes touchées"""
+    if raw:
+        return
+    if created:
+        synthese.ajouter_note(instance)
+        return
+
+    cle_actuelle = (instance.student_id, instance.matiere_id)
+    cle_initiale = getattr(instance, '_cle_synthese', cle_actuelle)
+    synthese.recalculer(*cle_actuelle)
+    if cle_initiale != cle_actuelle and None not in cle_initiale:
+        synthese.recalculer(*cle_initiale)
+    instance._cle_synthese = cle_actuelle
+
+
+@receiver(post_delete, sender=Note)
+def synthese_note_supprimee(sender, instance, **kwargs):
+    synthese.recalculer(instance.student_id, instance.matiere_id)
@@ -0,0 +1,176 @@
+"""
+Maintenance de la synthèse matérialisée SyntheseNotes.
+
+Une ligne par (étudiant, matière) stocke somme, effectif, min, max, nombre
+de réussites et date de la dernière note. Une création de note met la ligne
+à jour par incréments (F()/Least/Greatest) ; une modification ou une
+suppression recalcule la seule ligne concernée. SyntheseEtudiant reprend les
+totaux toutes matières et stocke les moyennes (indexées) ; elle est recalculée
+à partir des quelques lignes SyntheseNotes de l'étudiant. `reconstruire`
+répare les deux tables en requêtes groupées.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, DecimalField, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Greatest, Least
+
+from .aggregations import ResumeNotes, calculer_priorite
+from .models import Note, SyntheseNotes, SyntheseEtudiant
+
+SEUIL_REUSSITE = 10
+
+_AGREGATS = {
+    'somme': Sum('valeur_note'),
+    'nb_notes': Count('id_note'),
+    'note_min': Min('valeur_note'),
+    'note_max': Max('valeur_note'),
+    'nb_reussites': Count('id_note', filter=Q(valeur_note__gte=SEUIL_REUSSITE)),
+    'derniere_date': Max('date_note'),
+    'somme_validees': Sum('valeur_note', filter=Q(valide=True)),
+    'nb_validees': Count('id_note', filter=Q(valide=True)),
+}
+
+_TOTAUX = {
+    'somme': Sum('somme'),
+    'nb_notes': Sum('nb_notes'),
+    'somme_validees': Sum('somme_validees'),
+    'nb_validees': Sum('nb_validees'),
+}
+
+
+def _normaliser(valeurs):
+    """Les sommes d'un ensemble vide valent 0, pas NULL"""
+    for cle in ('somme', 'somme_validees'):
+        if valeurs[cle] is None:
+            valeurs[cle] = 0
+    return valeurs
+
+
+def ajouter_note(note):
+    """Prend en compte une nouvelle note par incrément de sa ligne de synthèse"""
+    valeur = Note._meta.get_field('valeur_note').to_python(note.valeur_note)
+    date_note = Note._meta.get_field('date_note').to_python(note.date_note)
+    reussite = 1 if valeur >= SEUIL_REUSSITE else 0
+    validee = 1 if note.valide else 0
+
+    cle = {'student_id': note.student_id, 'matiere_id': note.matiere_id}
+    try:
+        with transaction.atomic():
+            SyntheseNotes.objects.create(
+                **cle,
+                somme=valeur,
+                nb_notes=1,
+                note_min=valeur,
+                note_max=valeur,
+                nb_reussites=reussite,
+                derniere_date=date_note,
+                somme_validees=valeur if validee else 0,
+                nb_validees=validee,
+            )
+    except IntegrityError:
+        # La ligne existe déjà : incrément
+        _incrementer(cle, valeur, date_note, reussite, validee)
+    recalculer_etudiant(note.student_id)
+
+
+def _incrementer(cle, valeur, date_note, reussite, validee):
+    """Incrémente une ligne existante sans la relire"""
+    valeur_sql = Value(valeur, output_field=DecimalField(max_digits=5, decimal_places=2))
+    SyntheseNotes.objects.filter(**cle).update(
+        somme=F('somme') + valeur,
+        nb_notes=F('nb_notes') + 1,
+        note_min=Least('note_min', valeur_sql),
+        note_max=Greatest('note_max', valeur_sql),
+        nb_reussites=F('nb_reussites') + reussite,
+        derniere_date=Greatest('derniere_date', Value(date_note, output_field=DateField())),
+        somme_validees=F('somme_validees') + (valeur if validee else 0),
+        nb_validees=F('nb_validees') + validee,
+    )
+
+
+def recalculer(student_id, matiere_id):
+    """Recalcule une ligne de synthèse à partir de ses seules notes"""
+    valeurs = Note.objects.filter(
+        student_id=student_id, matiere_id=matiere_id
+    ).aggregate(**_AGREGATS)
+
+    if not valeurs['nb_notes']:
+        SyntheseNotes.objects.filter(student_id=student_id, matiere_id=matiere_id).delete()
+    else:
+        SyntheseNotes.objects.update_or_create(
+            student_id=student_id,
+            matiere_id=matiere_id,
+            defaults=_normaliser(valeurs)
+        )
+    recalculer_etudiant(student_id)
+
+
+def _moyennes(totaux):
+    """Complète des totaux avec les moyennes stockées"""
+    totaux = _normaliser(totaux)
+    totaux['nb_notes'] = totaux['nb_notes'] or 0
+    totaux['nb_validees'] = totaux['nb_validees'] or 0
+    totaux['moyenne'] = (
+        float(totaux['somme']) / totaux['nb_notes'] if totaux['nb_notes'] else None
+    )
+    totaux['moyenne_validees'] = (
+        float(totaux['somme_validees']) / totaux['nb_validees'] if totaux['nb_validees'] else None
+    )
+    return totaux
+
+
+def recalculer_etudiant(student_id):
+    """Recalcule les totaux d'un étudiant depuis ses lignes SyntheseNotes"""
+    totaux = SyntheseNotes.objects.filter(student_id=student_id).aggregate(**_TOTAUX)
+
+    if not totaux['nb_notes']:
+        SyntheseEtudiant.objects.filter(student_id=student_id).delete()
+        return
+
+    SyntheseEtudiant.objects.update_or_create(
+        student_id=student_id,
+        defaults=_moyennes(totaux)
+    )
+
+
+def reconstruire(taille_lot=1000):
+    """Reconstruit toute la table en une requête groupée ; retourne le nombre de lignes"""
+    lignes = Note.objects.order_by().values('student', 'matiere').annotate(**_AGREGATS)
+
+    with transaction.atomic():
+        SyntheseNotes.objects.all().delete()
+        syntheses = [
+            SyntheseNotes(
+                student_id=ligne.pop('student'),
+                matiere_id=ligne.pop('matiere'),
+                **_normaliser(ligne)
+            )
+            for ligne in lignes
+        ]
+        SyntheseNotes.objects.bulk_create(syntheses, batch_size=taille_lot)
+
+        SyntheseEtudiant.objects.all().delete()
+        SyntheseEtudiant.objects.bulk_create([
+            SyntheseEtudiant(student_id=ligne.pop('student'), **_moyennes(ligne))
+            for ligne in SyntheseNotes.objects.order_by().values('student').annotate(**_TOTAUX)
+        ], batch_size=taille_lot)
+    return len(syntheses)
+
+
+def resume_etudiant(student_id, calcul_priorite=calculer_priorite):
+    """ResumeNotes d'un étudiant lu depuis la synthèse (une requête indexée)"""
+    par_matiere = {}
+    sommes = {}
+    for synthese in SyntheseNotes.objects.filter(
+        student_id=student_id, nb_notes__gt=0
+    ).select_related('matiere'):
+        moyenne = synthese.moyenne
+        par_matiere[synthese.matiere_id] = {
+            'nom': synthese.matiere.nom_matière,
+            'moyenne': moyenne,
+            'nb_notes': synthese.nb_notes,
+            'nb_reussites': synthese.nb_reussites,
+            'coefficient': synthese.matiere.coefficient,
+            'priorite': calcul_priorite(moyenne, synthese.matiere.coefficient),
+        }
+        sommes[synthese.matiere_id] = float(synthese.somme)
+    return ResumeNotes(par_matiere, sommes)
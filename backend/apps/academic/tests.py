@@ -2,7 +2,9 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Classe, Etudiant, Matiere, Note
+from .models import Classe, Etudiant, Matiere, Note, Administrateur, SyntheseNotes, SyntheseEtudiant
+from .aggregations import agreger_notes
+from .synthese import reconstruire
 
 User = get_user_model()
 
@@ -32,7 +34,8 @@ class AcademicAPITestCase(TestCase):
             prenom='Jean',
             email='jean.dupont@test.com',
             date_inscription='2024-09-01',
-            classe=self.classe
+            classe=self.classe,
+            user=self.user
         )
 
     def test_get_classes(self):
@@ -53,7 +56,8 @@ class AcademicAPITestCase(TestCase):
             'prenom': 'Sophie',
             'email': 'sophie.martin@test.com',
             'date_inscription': '2024-09-01',
-            'classe': self.classe.id_classe
+            'classe': self.classe.id_classe,
+            'user': self.user.id
         }
         response = self.client.post('/api/academic/etudiants/', data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
@@ -61,4 +65,91 @@ class AcademicAPITestCase(TestCase):
     def test_etudiant_statistiques(self):
         """Test des statistiques étudiant"""
         response = self.client.get(f'/api/academic/etudiants/{self.etudiant.id_student}/statistiques/')
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def _creer_notes(self):
+        """Crée quelques notes réparties sur deux matières"""
+        admin = Administrateur.objects.create(
+            nom='Admin', prenom='Test', email='admin@test.com', mot_de_passe='x'
+        )
+        maths = Matiere.objects.create(nom_matière='Maths', coefficient=4)
+        info = Matiere.objects.create(nom_matière='Info', coefficient=2)
+        for matiere, valeurs in ((maths, [6, 8]), (info, [14, 16, 18])):
+            for i, valeur in enumerate(valeurs):
+                Note.objects.create(
+                    student=self.etudiant, matiere=matiere, admin=admin,
+                    type_evaluation='devoir', valeur_note=valeur,
+                    date_note=f'2024-10-0{i + 1}', valide=True
+                )
+        return maths, info
+
+    def test_agreger_notes(self):
+        """Test de l'agrégation par matière en une seule requête"""
+        maths, info = self._creer_notes()
+        with self.assertNumQueries(1):
+            resume = agreger_notes(Note.objects.filter(student=self.etudiant))
+
+        self.assertEqual(resume.nb_notes, 5)
+        self.assertAlmostEqual(resume.moyenne_generale, 62 / 5)
+        self.assertEqual(resume.par_matiere[maths.id_matiere]['moyenne'], 7)
+        self.assertEqual(resume.par_matiere[info.id_matiere]['nb_notes'], 3)
+        self.assertEqual([m['nom'] for m in resume.matieres_risque()], ['Maths'])
+
+    def test_etudiant_statistiques_requetes_constantes(self):
+        """Le nombre de requêtes ne dépend pas du nombre de matières"""
+        self._creer_notes()
+        url = f'/api/academic/etudiants/{self.etudiant.id_student}/statistiques/'
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.data['total_notes'], 5)
+        self.assertEqual(response.data['matiere_faible'], 'Maths')
+        self.assertEqual(response.data['matiere_forte'], 'Info')
+
+    def test_synthese_incrementale(self):
+        """La synthèse suit les créations, validations et suppressions de notes"""
+        maths, info = self._creer_notes()
+        synthese = SyntheseNotes.objects.get(student=self.etudiant, matiere=info)
+        self.assertEqual((synthese.nb_notes, synthese.somme), (3, 48))
+        self.assertEqual((synthese.note_min, synthese.note_max), (14, 18))
+        self.assertEqual(synthese.nb_reussites, 3)
+
+        note = Note.objects.filter(matiere=info).order_by('valeur_note').first()
+        note.valeur_note = 4
+        note.valide = False
+        note.save()
+        synthese.refresh_from_db()
+        self.assertEqual((synthese.somme, synthese.note_min, synthese.nb_reussites), (38, 4, 2))
+        self.assertEqual(synthese.nb_validees, 2)
+
+        Note.objects.filter(matiere=maths).first().delete()
+        Note.objects.filter(matiere=maths).first().delete()
+        self.assertFalse(SyntheseNotes.objects.filter(matiere=maths).exists())
+        totaux = SyntheseEtudiant.objects.get(student=self.etudiant)
+        self.assertEqual((totaux.nb_notes, totaux.moyenne, totaux.moyenne_validees), (3, 38 / 3, 17))
+
+        attendu = list(SyntheseNotes.objects.values_list('somme', 'nb_notes', 'note_min', 'note_max'))
+        self.assertEqual(reconstruire(), 1)
+        self.assertEqual(
+            list(SyntheseNotes.objects.values_list('somme', 'nb_notes', 'note_min', 'note_max')),
+            attendu
+        )
+
+    def test_etudiants_en_difficulte(self):
+        """Seuls les étudiants sous le seuil sont listés, avec leur moyenne"""
+        maths, info = self._creer_notes()
+        url = '/api/academic/etudiants/difficile/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+
+        response = self.client.get(url, {'seuil': 13, 'classe': self.classe.id_classe})
+        self.assertEqual(response.data['count'], 1)
+        self.assertAlmostEqual(response.data['results'][0]['moyenne'], 12.4)
+
+        response = self.client.get(url, {'matiere': maths.id_matiere, 'validees': 'true'})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['moyenne'], 7)
+
+        response = self.client.get(url, {'seuil': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,15 +1,21 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Avg, Max, Min, Count, Q
+from rest_framework.exceptions import ValidationError
+from django.db.models import Avg, Max, Min, Count, Q, F, FloatField
+from django.db.models.functions import Cast, NullIf
 from django.shortcuts import get_object_or_404
 from datetime import datetime, timedelta
 from .models import (
     Etudiant, Professeur, Classe, Matiere,
     Note, Ressource, BanqueExercices, Administrateur
 )
+from .aggregations import comparer_periodes
+from .synthese import resume_etudiant
+from apps.fichiers.views import HachageUploadMixin
+from apps.notifications.services import NotificationService
 from .serializers import (
-    EtudiantSerializer, ProfesseurSerializer, ClasseSerializer,
+    EtudiantSerializer, EtudiantDifficulteSerializer, ProfesseurSerializer, ClasseSerializer,
     MatiereSerializer, NoteSerializer, RessourceSerializer,
     BanqueExercicesSerializer, AdministrateurSerializer
 )
@@ -93,9 +99,12 @@ class EtudiantStatistiquesView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        notes = Note.objects.filter(student=etudiant).select_related('matiere')
+        notes = Note.objects.filter(student=etudiant)
 
-        if not notes.exists():
+        # Moyennes par matière lues dans la synthèse matérialisée
+        resume = resume_etudiant(etudiant.id_student)
+
+        if not resume.nb_notes:
             return Response({
                 'etudiant_id': pk,
                 'etudiant_nom': f"{etudiant.prenom} {etudiant.nom}",
@@ -107,45 +116,33 @@ class EtudiantStatistiquesView(APIView):
                 'progression': 'stable'
             })
 
-        # Moyenne générale
-        moyenne_generale = notes.aggregate(Avg('valeur_note'))['valeur_note__avg']
-
-        # Calcul des moyennes par matière
-        moyennes_par_matiere = {}
-        for note in notes:
-            matiere_nom = note.matiere.nom_matière
-            if matiere_nom not in moyennes_par_matiere:
-                moyennes_par_matiere[matiere_nom] = []
-            moyennes_par_matiere[matiere_nom].append(float(note.valeur_note))
-
-        moyennes = {}
-        for matiere, notes_list in moyennes_par_matiere.items():
-            moyennes[matiere] = round(sum(notes_list) / len(notes_list), 2)
+        moyenne_generale = resume.moyenne_generale
+        moyennes = {
+            matiere: round(moyenne, 2)
+            for matiere, moyenne in resume.moyennes_par_nom().items()
+        }
 
         # Matière forte et faible
         matiere_forte = max(moyennes, key=moyennes.get) if moyennes else None
         matiere_faible = min(moyennes, key=moyennes.get) if moyennes else None
 
-        # Progression
+        # Progression (30 derniers jours vs avant, en une requête)
         progression = 'stable'
         trente_jours_avant = datetime.now().date() - timedelta(days=30)
-        notes_recentes = notes.filter(date_note__gte=trente_jours_avant)
-        notes_anciennes = notes.filter(date_note__lt=trente_jours_avant)
+        periodes = comparer_periodes(notes, coupure=trente_jours_avant)
+        moy_ancienne = periodes['moyenne_avant']
+        moy_recente = periodes['moyenne_apres']
 
-        if notes_recentes.exists() and notes_anciennes.exists():
-            moy_recente = notes_recentes.aggregate(Avg('valeur_note'))['valeur_note__avg']
-            moy_ancienne = notes_anciennes.aggregate(Avg('valeur_note'))['valeur_note__avg']
-
-            if moy_recente and moy_ancienne:
-                if moy_recente > moy_ancienne + 1:
-                    progression = 'en_progres'
-                elif moy_recente < moy_ancienne - 1:
-                    progression = 'en_baisse'
+        if moy_recente and moy_ancienne:
+            if moy_recente > moy_ancienne + 1:
+                progression = 'en_progres'
+            elif moy_recente < moy_ancienne - 1:
+                progression = 'en_baisse'
 
         return Response({
             'etudiant_id': pk,
             'etudiant_nom': f"{etudiant.prenom} {etudiant.nom}",
-            'total_notes': notes.count(),
+            'total_notes': resume.nb_notes,
             'moyenne_generale': round(moyenne_generale, 2) if moyenne_generale else None,
             'matiere_forte': matiere_forte,
             'matiere_faible': matiere_faible,
@@ -155,20 +152,43 @@ class EtudiantStatistiquesView(APIView):
 
 
 class EtudiantsEnDifficulteView(generics.ListAPIView):
-    """Liste des étudiants en difficulté (moyenne < 10)"""
-    serializer_class = EtudiantSerializer
+    """
+    Liste paginée des étudiants en difficulté (moyenne < seuil).
+
+    Filtres optionnels : classe, matiere, seuil (10 par défaut) et
+    validees=true pour ne compter que les notes validées.
+    """
+    serializer_class = EtudiantDifficulteSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        etudiants = Etudiant.objects.all()
-        resultats = []
-        for etudiant in etudiants:
-            notes = Note.objects.filter(student=etudiant)
-            if notes.exists():
-                moyenne = notes.aggregate(Avg('valeur_note'))['valeur_note__avg']
-                if moyenne and moyenne < 10:
-                    resultats.append(etudiant)
-        return resultats
+        params = self.request.query_params
+        try:
+            seuil = float(params.get('seuil', 10))
+        except ValueError:
+            raise ValidationError({'error': 'Le paramètre seuil doit être un nombre'})
+        validees = params.get('validees', 'false').lower() == 'true'
+
+        queryset = Etudiant.objects.select_related('classe')
+        classe = params.get('classe')
+        if classe:
+            queryset = queryset.filter(classe_id=classe)
+        matiere = params.get('matiere')
+        if matiere:
+            # Une seule ligne de synthèse par (étudiant, matière) : pas de GROUP BY,
+            # la jointure filtrée est réutilisée par l'annotation
+            queryset = queryset.filter(syntheses_notes__matiere_id=matiere)
+            somme, nombre = ('somme_validees', 'nb_validees') if validees else ('somme', 'nb_notes')
+            moyenne = Cast(F(f'syntheses_notes__{somme}'), FloatField()) / NullIf(
+                F(f'syntheses_notes__{nombre}'), 0
+            )
+        else:
+            # Moyenne générale stockée et indexée dans SyntheseEtudiant
+            moyenne = F('synthese__moyenne_validees' if validees else 'synthese__moyenne')
+
+        return queryset.annotate(
+            moyenne=moyenne
+        ).filter(moyenne__lt=seuil).order_by('moyenne', 'id_student')
 
 
 # ==================== VUES POUR NOTES ====================
@@ -223,7 +243,7 @@ class NoteValiderView(APIView):
 
     def post(self, request, pk):
         try:
-            note = Note.objects.get(id_note=pk)
+            note = Note.objects.select_related('student', 'matiere').get(id_note=pk)
         except Note.DoesNotExist:
             return Response(
                 {'error': 'Note non trouvée'},
@@ -232,6 +252,8 @@ class NoteValiderView(APIView):
 
         note.valide = True
         note.save()
+        # Regroupée avec les autres validations récentes de l'étudiant
+        NotificationService.notifier_note_validee(note)
 
         return Response({
             'message': 'Note validée avec succès',
@@ -411,7 +433,7 @@ class MatiereStatistiquesView(APIView):
 
 # ==================== VUES POUR EXERCICES ====================
 
-class ExerciceListCreateView(generics.ListCreateAPIView):
+class ExerciceListCreateView(HachageUploadMixin, generics.ListCreateAPIView):
     """Liste et création des exercices"""
     queryset = BanqueExercices.objects.all()
     serializer_class = BanqueExercicesSerializer
@@ -430,7 +452,7 @@ class ExerciceListCreateView(generics.ListCreateAPIView):
         return queryset.select_related('subject', 'cree_par')
 
 
-class ExerciceRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class ExerciceRetrieveUpdateDestroyView(HachageUploadMixin, generics.RetrieveUpdateDestroyAPIView):
     """Détail, modification et suppression d'un exercice"""
     queryset = BanqueExercices.objects.all()
     serializer_class = BanqueExercicesSerializer
@@ -441,7 +463,7 @@ class ExerciceRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
 # ==================== VUES POUR RESSOURCES ====================
 
-class RessourceListCreateView(generics.ListCreateAPIView):
+class RessourceListCreateView(HachageUploadMixin, generics.ListCreateAPIView):
     """Liste et création des ressources"""
     queryset = Ressource.objects.all()
     serializer_class = RessourceSerializer
@@ -460,7 +482,7 @@ class RessourceListCreateView(generics.ListCreateAPIView):
         return queryset.select_related('matiere', 'cree_par_admin')
 
 
-class RessourceRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class RessourceRetrieveUpdateDestroyView(HachageUploadMixin, generics.RetrieveUpdateDestroyAPIView):
     """Détail, modification et suppression d'une ressource"""
     queryset = Ressource.objects.all()
     serializer_class = RessourceSerializer
@@ -505,9 +527,7 @@ class ProfesseurClassesView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        professeur_id = self.kwargs['pk']
-        # Logique à implémenter selon votre modèle de données
-        return Classe.objects.all()[:3]
+        return Classe.objects.filter(professeurs__id_professeur=self.kwargs['pk'])
 
 
 # ==================== VUES POUR ADMINISTRATEURS ====================
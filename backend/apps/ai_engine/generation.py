@@ -0,0 +1,107 @@
+"""
+Génération des suggestions d'une classe hors de la requête.
+
+La demande est enregistrée (ligne GenerationSuggestions) dans la transaction
+de la requête, puis exécutée par un thread du processus après le commit. La
+progression est écrite sur la ligne : un GET la lit depuis n'importe quel
+worker. Une exécution réclame la ligne par un UPDATE qui pose un jeton ; une
+génération interrompue (redémarrage) est reprise après
+SUGGESTIONS_DELAI_REPRISE secondes par generer_suggestions_classe --file, et
+les écritures d'une exécution dépassée sont ignorées.
+"""
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .ia_logic import ClasseSuggestionEngine
+from .models import GenerationSuggestions
+
+logger = logging.getLogger(__name__)
+
+PAS_PROGRESSION = 50  # étudiants traités entre deux écritures de la progression
+
+# Générations mises en file : exécutées une à une hors de la requête
+_file_generation = ThreadPoolExecutor(max_workers=1, thread_name_prefix='suggestions-classe')
+
+
+def a_reprendre():
+    """Générations en file, ou en cours sans progression depuis le délai de reprise"""
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'SUGGESTIONS_DELAI_REPRISE', 600))
+    return GenerationSuggestions.objects.filter(
+        Q(statut='en_file') | Q(statut='en_cours', date_maj__lt=limite)
+    )
+
+
+def mettre_en_file(classe_id, nb_suggestions):
+    """
+    Enregistre une génération et la lance après la transaction.
+
+    Avec SUGGESTIONS_GENERATION_ASYNC = False, elle est exécutée
+    immédiatement (tests, commandes).
+    """
+    generation = GenerationSuggestions.objects.create(classe_id=classe_id, nb_suggestions=nb_suggestions)
+    if not getattr(settings, 'SUGGESTIONS_GENERATION_ASYNC', True):
+        executer(generation.pk)
+        generation.refresh_from_db()
+        return generation
+    transaction.on_commit(lambda: _file_generation.submit(_executer_en_tache, generation.pk))
+    return generation
+
+
+def executer(generation_id):
+    """
+    Exécute une génération si elle est en file ou abandonnée.
+
+    Retourne son statut final, ou None si elle est terminée ou prise ailleurs.
+    """
+    jeton = uuid.uuid4().hex
+    if not a_reprendre().filter(pk=generation_id).update(
+        statut='en_cours', jeton=jeton, date_maj=timezone.now()
+    ):
+        return None
+    ligne = GenerationSuggestions.objects.filter(pk=generation_id, jeton=jeton)
+    generation = ligne.get()
+
+    def progression(traites, total):
+        if traites == total or traites % PAS_PROGRESSION == 0:
+            ligne.update(traites=traites, total=total, date_maj=timezone.now())
+
+    try:
+        engine = ClasseSuggestionEngine(generation.classe_id, nb_suggestions=generation.nb_suggestions)
+        suggestions, resultat = engine.planifier(progression)
+        with transaction.atomic():
+            # Suggestions et fin de génération écrites ensemble, si la ligne est toujours à nous
+            if not ligne.select_for_update().exists():
+                return None
+            engine.enregistrer(suggestions)
+            ligne.update(
+                statut='termine', resultat=resultat, traites=resultat['nb_etudiants'],
+                total=resultat['nb_etudiants'], date_maj=timezone.now()
+            )
+    except Exception:
+        logger.exception("Échec de la génération de suggestions %s", generation_id)
+        ligne.update(statut='echec', date_maj=timezone.now())
+        return 'echec'
+    return 'termine'
+
+
+def traiter_en_file():
+    """Exécute les générations en file ou interrompues ; retourne leur nombre"""
+    executees = 0
+    for generation_id in list(a_reprendre().order_by('id').values_list('id', flat=True)):
+        if executer(generation_id) is not None:
+            executees += 1
+    return executees
+
+
+def _executer_en_tache(generation_id):
+    close_old_connections()
+    try:
+        executer(generation_id)
+    finally:
+        close_old_connections()
@@ -1,10 +1,15 @@
-from django.db.models import Avg, Count, Q, F
+from django.db.models import Count, Q, F
 from django.utils import timezone
 from datetime import timedelta
-from apps.academic.models import Etudiant, Note, BanqueExercices, Matiere
+from apps.academic.models import Etudiant, Note, BanqueExercices, Classe
+from apps.academic.aggregations import (
+    agreger_notes, agreger_notes_par_etudiant, comparer_periodes, calculer_priorite
+)
 from .models import SuggestionExercice, StatistiqueApprentissage
+from .sampling import echantillonneur
 import random
 import math
+from collections import defaultdict
 
 
 class SmartSuggestionEngine:
@@ -19,63 +24,45 @@ class SmartSuggestionEngine:
 
     def __init__(self, etudiant_id):
         self.etudiant = Etudiant.objects.get(id_student=etudiant_id)
-        self.notes = Note.objects.filter(student=etudiant, valide=True)
+        self.notes = Note.objects.filter(student=self.etudiant, valide=True)
         self.suggestions_recents = SuggestionExercice.objects.filter(
-            etudiant=etudiant,
+            etudiant=self.etudiant,
             date_suggestion__gte=timezone.now() - timedelta(days=7)
         )
+        self._performance = None
 
     def analyser_performance(self):
         """Analyse complète de la performance de l'étudiant"""
+        if self._performance is not None:
+            return self._performance
+
+        # 1. Performance par matière (une seule requête groupée)
+        resume = agreger_notes(self.notes)
 
-        # 1. Moyenne générale
-        moyenne_generale = self.notes.aggregate(Avg('valeur_note'))['valeur_note__avg'] or 0
-
-        # 2. Performance par matière
-        performance_par_matiere = {}
-        for matiere in Matiere.objects.all():
-            notes_matiere = self.notes.filter(matiere=matiere)
-            if notes_matiere.exists():
-                moyenne = notes_matiere.aggregate(Avg('valeur_note'))['valeur_note__avg']
-                nb_notes = notes_matiere.count()
-                performance_par_matiere[matiere.id_matiere] = {
-                    'nom': matiere.nom_matière,
-                    'moyenne': moyenne,
-                    'nb_notes': nb_notes,
-                    'coefficient': matiere.coefficient,
-                    'priorite': self._calculer_priorite(moyenne, matiere.coefficient)
-                }
+        # 2. Moyenne générale (déduite de l'agrégation)
+        moyenne_generale = resume.moyenne_generale or 0
 
         # 3. Matières à risque (notes < 10)
-        matieres_risque = [
-            m for m in performance_par_matiere.values()
-            if m['moyenne'] < 10
-        ]
+        matieres_risque = resume.matieres_risque()
 
         # 4. Progression récente
         progression = self._analyser_progression()
 
-        return {
+        self._performance = {
             'moyenne_generale': round(moyenne_generale, 2),
-            'performance_par_matiere': performance_par_matiere,
+            'performance_par_matiere': resume.par_matiere,
             'matieres_risque': matieres_risque,
             'progression': progression,
             'niveau_global': self._determiner_niveau_global(moyenne_generale)
         }
+        return self._performance
 
     def _calculer_priorite(self, moyenne, coefficient):
         """Calcule la priorité d'une matière (0-100)"""
-        if moyenne >= 16:
-            return 0  # Déjà excellent
-        elif moyenne >= 12:
-            return 30  # Correct
-        elif moyenne >= 10:
-            return 60  # Limite
-        else:
-            # Priorité élevée : (10 - moyenne) * coefficient * 5
-            return min(100, (10 - moyenne) * coefficient * 5)
+        return calculer_priorite(moyenne, coefficient)
 
-    def _determiner_niveau_global(self, moyenne):
+    @staticmethod
+    def _determiner_niveau_global(moyenne):
         """Détermine le niveau global de l'étudiant"""
         if moyenne >= 16:
             return "expert"
@@ -88,26 +75,20 @@ class SmartSuggestionEngine:
 
     def _analyser_progression(self):
         """Analyse la progression sur les 30 derniers jours"""
-        date_limite = timezone.now() - timedelta(days=30)
+        aujourd_hui = timezone.now().date()
+        date_limite = aujourd_hui - timedelta(days=30)
 
-        notes_recentes = self.notes.filter(date_note__gte=date_limite)
+        # Moyenne des 15 premiers jours vs 15 derniers jours, en une requête
+        mi_parcours = aujourd_hui - timedelta(days=15)
+        periodes = comparer_periodes(self.notes, coupure=mi_parcours, debut=date_limite)
 
-        if notes_recentes.count() < 2:
+        if periodes['nb_avant'] + periodes['nb_apres'] < 2:
             return "progression_insuffisante"
 
-        # Moyenne des 15 premiers jours vs 15 derniers jours
-        mi_parcours = timezone.now() - timedelta(days=15)
-
-        anciennes = notes_recentes.filter(date_note__lt=mi_parcours)
-        recentes = notes_recentes.filter(date_note__gte=mi_parcours)
-
-        if not anciennes.exists() or not recentes.exists():
+        if not periodes['nb_avant'] or not periodes['nb_apres']:
             return "donnees_insuffisantes"
 
-        moyenne_ancienne = anciennes.aggregate(Avg('valeur_note'))['valeur_note__avg']
-        moyenne_recente = recentes.aggregate(Avg('valeur_note'))['valeur_note__avg']
-
-        difference = moyenne_recente - moyenne_ancienne
+        difference = periodes['moyenne_apres'] - periodes['moyenne_avant']
 
         if difference > 2:
             return "en_progres"
@@ -123,10 +104,12 @@ class SmartSuggestionEngine:
         performance = self.analyser_performance()
 
         # 2. Récupérer les exercices déjà suggérés récemment
-        exercices_deja_suggeres = self.suggestions_recents.values_list('exercice_id', flat=True)
+        exercices_deja_suggeres = set(
+            self.suggestions_recents.values_list('exercice_id', flat=True)
+        )
 
-        # 3. Définir les poids pour chaque matière
-        suggestions = []
+        # 3. Tirer des exercices non suggérés récemment pour chaque matière
+        tirages = []
 
         for matiere_id, data in performance['performance_par_matiere'].items():
             priorite = data['priorite']
@@ -135,24 +118,28 @@ class SmartSuggestionEngine:
                 continue  # Ignorer les matières où l'étudiant excelle
 
             # Déterminer la difficulté appropriée
-            if data['moyenne'] < 8:
-                difficulte = 1  # Facile
-            elif data['moyenne'] < 12:
-                difficulte = 2  # Moyen
-            else:
-                difficulte = 3  # Difficile
-
-            # Chercher des exercices non suggérés récemment
-            exercices = BanqueExercices.objects.filter(
-                subject_id=matiere_id,
-                niveau_difficulte=difficulte
-            ).exclude(
-                id_exercice__in=exercices_deja_suggeres
-            ).order_by('?')[:min(3, nb_suggestions)]
-
-            for exo in exercices:
+            difficulte = self._determiner_difficulte(data['moyenne'])
+
+            exercice_ids = echantillonneur.tirer(
+                min(3, nb_suggestions),
+                matiere_id=matiere_id,
+                difficulte=difficulte,
+                a_exclure=exercices_deja_suggeres
+            )
+            tirages.append((exercice_ids, data, priorite, difficulte))
+
+        # Un seul chargement par clé primaire pour tous les exercices tirés
+        exercices = BanqueExercices.objects.in_bulk(
+            [exercice_id for exercice_ids, *_ in tirages for exercice_id in exercice_ids]
+        )
+
+        suggestions = []
+        for exercice_ids, data, priorite, difficulte in tirages:
+            for exercice_id in exercice_ids:
+                if exercice_id not in exercices:
+                    continue  # Supprimé depuis le chargement de l'index
                 suggestions.append({
-                    'exercice': exo,
+                    'exercice': exercices[exercice_id],
                     'matiere': data['nom'],
                     'note_actuelle': data['moyenne'],
                     'priorite': priorite,
@@ -168,12 +155,23 @@ class SmartSuggestionEngine:
         if len(suggestions) < nb_suggestions:
             suggestions += self._suggestions_aleatoires(
                 nb_suggestions - len(suggestions),
-                exercices_deja_suggeres
+                exercices_deja_suggeres | {s['exercice'].id_exercice for s in suggestions}
             )
 
         return suggestions
 
-    def _generer_raison(self, data_matiere, niveau_global):
+    @staticmethod
+    def _determiner_difficulte(moyenne):
+        """Niveau de difficulté adapté à la moyenne d'une matière"""
+        if moyenne < 8:
+            return 1  # Facile
+        elif moyenne < 12:
+            return 2  # Moyen
+        else:
+            return 3  # Difficile
+
+    @staticmethod
+    def _generer_raison(data_matiere, niveau_global):
         """Génère une raison personnalisée pour la suggestion"""
 
         moyenne = data_matiere['moyenne']
@@ -190,9 +188,10 @@ class SmartSuggestionEngine:
 
     def _suggestions_aleatoires(self, nombre, a_exclure):
         """Complète avec des suggestions aléatoires si besoin"""
-        exercices = BanqueExercices.objects.exclude(
-            id_exercice__in=a_exclure
-        ).order_by('?')[:nombre]
+        exercice_ids = echantillonneur.tirer(nombre, a_exclure=a_exclure)
+        exercices = BanqueExercices.objects.filter(
+            id_exercice__in=exercice_ids
+        ).select_related('subject')
 
         suggestions = []
         for exo in exercices:
@@ -209,15 +208,17 @@ class SmartSuggestionEngine:
 
     def sauvegarder_suggestions(self, suggestions):
         """Sauvegarde les suggestions en base de données"""
-        for sugg in suggestions:
-            SuggestionExercice.objects.create(
+        SuggestionExercice.objects.bulk_create([
+            SuggestionExercice(
                 etudiant=self.etudiant,
                 exercice=sugg['exercice'],
-                matiere=sugg['exercice'].subject,
+                matiere_id=sugg['exercice'].subject_id,
                 note_actuelle=sugg.get('note_actuelle'),
                 raison=sugg['raison'],
                 niveau_suggere=sugg['difficulte']
             )
+            for sugg in suggestions
+        ])
 
     def get_statistiques_apprentissage(self):
         """Retourne les statistiques d'apprentissage"""
@@ -238,4 +239,128 @@ class SmartSuggestionEngine:
 
         # Ici tu pourrais ajouter une logique pour évaluer la réussite
         # Par exemple, vérifier si l'étudiant a amélioré ses notes après
-        return 50  # Valeur par défaut
\ No newline at end of file
+        return 50  # Valeur par défaut
+
+
+class ClasseSuggestionEngine:
+    """
+    Génération des suggestions pour tous les étudiants d'une classe.
+
+    Les notes et les suggestions récentes sont chargées en quelques requêtes
+    groupées, les exercices candidats sont tirés dans l'index en mémoire de
+    l'échantillonneur, puis toutes les SuggestionExercice sont écrites avec
+    bulk_create.
+    """
+
+    def __init__(self, classe_id, nb_suggestions=5, taille_lot=500):
+        self.classe = Classe.objects.get(id_classe=classe_id)
+        self.nb_suggestions = nb_suggestions
+        self.taille_lot = taille_lot
+
+    def generer(self, progression=None):
+        """
+        Génère et sauvegarde les suggestions de toute la classe.
+
+        `progression(traites, total)` est appelé après chaque étudiant.
+        """
+        suggestions, resultat = self.planifier(progression)
+        self.enregistrer(suggestions)
+        return resultat
+
+    def planifier(self, progression=None):
+        """Suggestions de toute la classe, non sauvegardées ; retourne (suggestions, résultat)"""
+        etudiant_ids = list(
+            Etudiant.objects.filter(classe=self.classe).values_list('id_student', flat=True)
+        )
+
+        # Performances de tous les étudiants en une requête groupée
+        resumes = agreger_notes_par_etudiant(
+            Note.objects.filter(student__classe=self.classe, valide=True)
+        )
+
+        # Exercices déjà suggérés récemment, par étudiant
+        recents = defaultdict(set)
+        for etudiant_id, exercice_id in SuggestionExercice.objects.filter(
+            etudiant__classe=self.classe,
+            date_suggestion__gte=timezone.now() - timedelta(days=7)
+        ).values_list('etudiant_id', 'exercice_id'):
+            recents[etudiant_id].add(exercice_id)
+
+        suggestions = []
+        total = len(etudiant_ids)
+        for traites, etudiant_id in enumerate(etudiant_ids, start=1):
+            resume = resumes.get(etudiant_id)
+            suggestions.extend(self._planifier(etudiant_id, resume, recents[etudiant_id]))
+            if progression:
+                progression(traites, total)
+
+        return suggestions, {
+            'classe_id': self.classe.id_classe,
+            'classe_nom': self.classe.nom_class,
+            'nb_etudiants': total,
+            'nb_suggestions': len(suggestions),
+        }
+
+    def enregistrer(self, suggestions):
+        SuggestionExercice.objects.bulk_create(suggestions, batch_size=self.taille_lot)
+
+    def _planifier(self, etudiant_id, resume, a_exclure):
+        """Plan de suggestions d'un étudiant, calculé en mémoire"""
+        candidats = []
+        if resume is not None:
+            moyenne_generale = resume.moyenne_generale or 0
+            niveau_global = SmartSuggestionEngine._determiner_niveau_global(moyenne_generale)
+
+            for matiere_id, data in resume.par_matiere.items():
+                priorite = data['priorite']
+                if priorite == 0:
+                    continue  # Ignorer les matières où l'étudiant excelle
+
+                difficulte = SmartSuggestionEngine._determiner_difficulte(data['moyenne'])
+                for exercice_id in echantillonneur.tirer(
+                    min(3, self.nb_suggestions),
+                    matiere_id=matiere_id,
+                    difficulte=difficulte,
+                    a_exclure=a_exclure
+                ):
+                    candidats.append({
+                        'exercice_id': exercice_id,
+                        'matiere_id': matiere_id,
+                        'note_actuelle': round(data['moyenne'], 2),
+                        'priorite': priorite,
+                        'raison': SmartSuggestionEngine._generer_raison(data, niveau_global),
+                        'difficulte': difficulte
+                    })
+
+            candidats.sort(key=lambda x: x['priorite'], reverse=True)
+            candidats = candidats[:self.nb_suggestions]
+
+        # Compléter avec des exercices aléatoires si besoin
+        manquants = self.nb_suggestions - len(candidats)
+        if manquants > 0:
+            deja_pris = a_exclure | {c['exercice_id'] for c in candidats}
+            for exercice_id in echantillonneur.tirer(manquants, a_exclure=deja_pris):
+                caracteristiques = echantillonneur.caracteristiques(exercice_id)
+                if caracteristiques is None:
+                    continue  # exercice retiré par un rechargement de l'index entre les deux lectures
+                subject_id, niveau = caracteristiques
+                candidats.append({
+                    'exercice_id': exercice_id,
+                    'matiere_id': subject_id,
+                    'note_actuelle': None,
+                    'priorite': 30,
+                    'raison': "🌱 Pour diversifier tes compétences, essaie cet exercice !",
+                    'difficulte': niveau
+                })
+
+        return [
+            SuggestionExercice(
+                etudiant_id=etudiant_id,
+                exercice_id=c['exercice_id'],
+                matiere_id=c['matiere_id'],
+                note_actuelle=c['note_actuelle'],
+                raison=c['raison'],
+                niveau_suggere=c['difficulte']
+            )
+            for c in candidats
+        ]
@@ -0,0 +1,37 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from apps.ai_engine.sampling import EchantillonneurExercices
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût d'un tirage d'exercices selon la taille de la banque (index synthétique)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tailles', nargs='+', type=int, default=[1000, 10000, 100000])
+        parser.add_argument('--tirages', type=int, default=10000)
+        parser.add_argument('--nb', type=int, default=3, help="Exercices par tirage")
+        parser.add_argument('--exclus', type=int, default=20, help="Taille de l'ensemble exclu")
+
+    def handle(self, *args, **options):
+        for taille in options['tailles']:
+            echantillonneur = EchantillonneurExercices()
+            # 10 matières x 3 difficultés, comme une banque réelle ; index
+            # synthétique figé : pas de rechargement depuis la base
+            echantillonneur.charger(
+                ((i, i % 10, 1 + i % 3) for i in range(1, taille + 1)), fige=True
+            )
+
+            a_exclure = set(random.sample(range(1, taille + 1), options['exclus']))
+            debut = time.perf_counter()
+            for _ in range(options['tirages']):
+                echantillonneur.tirer(
+                    options['nb'], matiere_id=random.randrange(10),
+                    difficulte=random.randint(1, 3), a_exclure=a_exclure
+                )
+            duree = time.perf_counter() - debut
+
+            self.stdout.write(
+                f"{taille:>8} exercices : {duree / options['tirages'] * 1e6:.1f} µs par tirage"
+            )
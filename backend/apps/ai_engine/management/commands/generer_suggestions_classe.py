@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from apps.academic.models import Classe
+from apps.ai_engine.generation import traiter_en_file
+from apps.ai_engine.ia_logic import ClasseSuggestionEngine
+from apps.ai_engine.sampling import echantillonneur
+
+
+class Command(BaseCommand):
+    help = "Génère les suggestions d'exercices de tous les étudiants d'une classe (ou de toutes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('classe_ids', nargs='*', type=int, help='Identifiants des classes')
+        parser.add_argument('--toutes', action='store_true', help='Traiter toutes les classes')
+        parser.add_argument('--nb', type=int, default=5, help='Nombre de suggestions par étudiant')
+        parser.add_argument('--file', action='store_true',
+                            help="Exécuter les générations lancées par l'API restées en file ou interrompues")
+
+    def handle(self, *args, **options):
+        if options['file']:
+            echantillonneur.recharger()
+            executees = traiter_en_file()
+            self.stdout.write(self.style.SUCCESS(f"{executees} générations en file exécutées"))
+            return
+
+        classe_ids = options['classe_ids']
+        if options['toutes']:
+            classe_ids = list(Classe.objects.values_list('id_classe', flat=True))
+        if not classe_ids:
+            raise CommandError("Indiquez au moins un identifiant de classe ou --toutes")
+
+        # Index des exercices construit une fois, hors des durées mesurées
+        echantillonneur.recharger()
+        for classe_id in classe_ids:
+            try:
+                engine = ClasseSuggestionEngine(classe_id, nb_suggestions=options['nb'])
+            except Classe.DoesNotExist:
+                raise CommandError(f"Classe {classe_id} non trouvée")
+
+            debut = time.monotonic()
+            resultat = engine.generer(progression=self._afficher_progression)
+            duree = time.monotonic() - debut
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{resultat['classe_nom']} : {resultat['nb_suggestions']} suggestions "
+                f"pour {resultat['nb_etudiants']} étudiants en {duree:.2f}s"
+            ))
+
+    def _afficher_progression(self, traites, total):
+        if traites == total or traites % 100 == 0:
+            self.stdout.write(f"  {traites}/{total} étudiants traités")
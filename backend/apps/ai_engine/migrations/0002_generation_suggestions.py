@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 12:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0005_professeur_classes'),
+        ('ai_engine', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationSuggestions',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nb_suggestions', models.PositiveIntegerField(default=5)),
+                ('statut', models.CharField(choices=[('en_file', 'En file'), ('en_cours', 'En cours'), ('termine', 'Terminée'), ('echec', 'Échec')], default='en_file', max_length=20)),
+                ('jeton', models.CharField(blank=True, default='', max_length=32)),
+                ('traites', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('resultat', models.JSONField(blank=True, null=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+                ('classe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academic.classe')),
+            ],
+            options={
+                'db_table': 'generation_suggestions',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='generationsuggestions',
+            index=models.Index(fields=['statut', 'date_maj'], name='generation_en_file_idx'),
+        ),
+    ]
@@ -42,4 +42,38 @@ class StatistiqueApprentissage(models.Model):
         unique_together = ['etudiant', 'matiere']
 
     def __str__(self):
-        return f"Stats {self.etudiant_id} - {self.matiere_id}"
\ No newline at end of file
+        return f"Stats {self.etudiant_id} - {self.matiere_id}"
+
+
+class GenerationSuggestions(models.Model):
+    """
+    Génération des suggestions d'une classe mise en file (apps.ai_engine.generation).
+
+    Porte la progression, lisible depuis n'importe quel processus ; une
+    génération interrompue reste en file jusqu'à sa reprise.
+    """
+    STATUTS = (
+        ('en_file', 'En file'),
+        ('en_cours', 'En cours'),
+        ('termine', 'Terminée'),
+        ('echec', 'Échec'),
+    )
+
+    classe = models.ForeignKey('academic.Classe', on_delete=models.CASCADE)
+    nb_suggestions = models.PositiveIntegerField(default=5)
+    statut = models.CharField(max_length=20, choices=STATUTS, default='en_file')
+    jeton = models.CharField(max_length=32, blank=True, default='')  # exécution en cours
+    traites = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    resultat = models.JSONField(null=True, blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_maj = models.DateTimeField(auto_now=True)  # dernière progression écrite
+
+    class Meta:
+        db_table = 'generation_suggestions'
+        indexes = [
+            models.Index(fields=['statut', 'date_maj'], name='generation_en_file_idx'),
+        ]
+
+    def __str__(self):
+        return f"Génération {self.classe_id} ({self.statut})"
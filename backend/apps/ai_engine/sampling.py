@@ -0,0 +1,142 @@
+"""
+Tirage aléatoire d'exercices sans ORDER BY RAND().
+
+Les identifiants de la banque d'exercices sont indexés en mémoire par
+(matière, difficulté). Un tirage sans remise se fait alors en temps constant
+par rejet, quelle que soit la taille de la banque. Un numéro de version
+stocké dans le cache (incrémenté à chaque modification de la banque) et une
+durée de validité bornée permettent de recharger l'index au besoin.
+"""
+import random
+import threading
+import time
+
+from django.core.cache import cache
+
+CLE_VERSION = 'echantillonneur_exercices_version'
+DUREE_VALIDITE = 300  # secondes avant rechargement de l'index
+
+
+def tirer_sans_remise(ids, nombre, a_exclure=frozenset()):
+    """
+    Tire au plus `nombre` identifiants distincts de `ids` hors `a_exclure`.
+
+    Le tirage par rejet coûte O(nombre) tant que les exclusions restent rares
+    devant la taille du pool ; sinon on se replie sur un filtrage complet.
+    """
+    taille = len(ids)
+    if not taille or nombre <= 0:
+        return []
+
+    choisis = []
+    vus = set()
+    if taille > 2 * (nombre + len(a_exclure)):
+        essais_max = 4 * nombre + 2 * len(a_exclure)
+        for _ in range(essais_max):
+            exercice_id = ids[random.randrange(taille)]
+            if exercice_id in vus or exercice_id in a_exclure:
+                continue
+            vus.add(exercice_id)
+            choisis.append(exercice_id)
+            if len(choisis) == nombre:
+                return choisis
+
+    # Pool petit ou presque épuisé : filtrage complet
+    restants = [i for i in ids if i not in vus and i not in a_exclure]
+    choisis += random.sample(restants, min(nombre - len(choisis), len(restants)))
+    return choisis
+
+
+class EchantillonneurExercices:
+    """Index en mémoire des exercices par (matière, difficulté)"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._version = None
+        self._charge_le = 0
+        self._par_cle = {}
+        self._tous = []
+        self._catalogue = {}
+        self._fige = False
+
+    def charger(self, lignes, version=None, fige=False):
+        """
+        Construit l'index à partir de tuples (id, matiere_id, difficulte).
+
+        `fige` : index fourni par l'appelant (benchmark, tests), jamais
+        rechargé depuis la base tant que recharger(force=True) n'est pas appelé.
+        """
+        par_cle = {}
+        tous = []
+        catalogue = {}
+        for exercice_id, matiere_id, difficulte in lignes:
+            par_cle.setdefault((matiere_id, difficulte), []).append(exercice_id)
+            tous.append(exercice_id)
+            catalogue[exercice_id] = (matiere_id, difficulte)
+
+        self._par_cle, self._tous, self._catalogue = par_cle, tous, catalogue
+        self._version = version
+        self._charge_le = time.monotonic()
+        self._fige = fige
+
+    def _a_jour(self, version):
+        return self._fige or (version == self._version and time.monotonic() - self._charge_le < DUREE_VALIDITE)
+
+    def recharger(self, force=False):
+        """
+        Charge l'index depuis la base s'il est absent, périmé ou invalidé.
+
+        Appelé avant chaque tirage ; peut l'être à l'avance pour construire
+        l'index hors du chemin d'une requête. `force` recharge dans tous les cas.
+        """
+        version = cache.get(CLE_VERSION, 0)
+        if not force and self._a_jour(version):
+            return
+
+        with self._verrou:
+            if not force and self._a_jour(version):
+                return
+            from apps.academic.models import BanqueExercices
+            self.charger(
+                BanqueExercices.objects.order_by().values_list(
+                    'id_exercice', 'subject_id', 'niveau_difficulte'
+                ),
+                version=version
+            )
+
+    def invalider(self):
+        """Force le rechargement de l'index (tous processus partageant le cache)"""
+        try:
+            cache.incr(CLE_VERSION)
+        except ValueError:
+            cache.set(CLE_VERSION, 1, None)
+        self._version = None
+
+    def tirer(self, nombre, matiere_id=None, difficulte=None, a_exclure=()):
+        """
+        Tire `nombre` exercices distincts, filtrés par matière et difficulté
+        si elles sont fournies, en excluant `a_exclure`.
+        """
+        self.recharger()
+        if matiere_id is None and difficulte is None:
+            ids = self._tous
+        elif matiere_id is not None and difficulte is not None:
+            ids = self._par_cle.get((matiere_id, difficulte), [])
+        else:
+            ids = [
+                exercice_id for (m, d), liste in self._par_cle.items()
+                if matiere_id in (None, m) and difficulte in (None, d)
+                for exercice_id in liste
+            ]
+
+        if not isinstance(a_exclure, (set, frozenset)):
+            a_exclure = set(a_exclure)
+        return tirer_sans_remise(ids, nombre, a_exclure)
+
+    def caracteristiques(self, exercice_id):
+        """(matiere_id, difficulte) d'un exercice indexé, ou None"""
+        self.recharger()
+        return self._catalogue.get(exercice_id)
+
+
+echantillonneur = EchantillonneurExercices()
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import SuggestionExercice, StatistiqueApprentissage
+from .models import GenerationSuggestions, SuggestionExercice, StatistiqueApprentissage
 from apps.academic.serializers import EtudiantSerializer, BanqueExercicesSerializer, MatiereSerializer
 
 
@@ -30,4 +30,13 @@ class StatistiqueApprentissageSerializer(serializers.ModelSerializer):
             'moyenne', 'exercices_realises', 'exercices_reussis',
             'taux_reussite', 'date_mise_a_jour'
         ]
-        read_only_fields = ['date_mise_a_jour']
\ No newline at end of file
+        read_only_fields = ['date_mise_a_jour']
+
+
+class GenerationSuggestionsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GenerationSuggestions
+        fields = [
+            'id', 'classe', 'nb_suggestions', 'statut', 'traites', 'total',
+            'resultat', 'date_creation', 'date_maj'
+        ]
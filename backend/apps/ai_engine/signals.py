@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.academic.models import BanqueExercices
+from .sampling import echantillonneur
+
+
+@receiver([post_save, post_delete], sender=BanqueExercices)
+def invalider_echantillonneur(sender, **kwargs):
+    """La banque d'exercices a changé : l'index de tirage doit être rechargé"""
+    echantillonneur.invalider()
@@ -1,3 +1,147 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from apps.academic.models import (
+    Classe, Etudiant, Matiere, Note, Administrateur, Professeur, BanqueExercices
+)
+from .generation import executer
+from .ia_logic import ClasseSuggestionEngine
+from .models import GenerationSuggestions, SuggestionExercice
+from .sampling import EchantillonneurExercices, echantillonneur, tirer_sans_remise
+
+User = get_user_model()
+
+
+class ClasseSuggestionEngineTestCase(TestCase):
+    def setUp(self):
+        """Une classe de plusieurs étudiants, deux matières et une banque d'exercices"""
+        self.classe = Classe.objects.create(nom_class='L1 INFO', niveau='Licence 1')
+        admin = Administrateur.objects.create(
+            nom='Admin', prenom='Test', email='admin@test.com', mot_de_passe='x'
+        )
+        prof = Professeur.objects.create(nom_prof='Prof', prenom_prof='Test', email='prof@test.com')
+        self.maths = Matiere.objects.create(nom_matière='Maths', coefficient=4)
+        self.info = Matiere.objects.create(nom_matière='Info', coefficient=2)
+
+        for matiere in (self.maths, self.info):
+            for niveau in (1, 2, 3):
+                for i in range(4):
+                    BanqueExercices.objects.create(
+                        subject=matiere, titre=f'{matiere} {niveau}-{i}',
+                        niveau_difficulte=niveau, fichier_url='x', cree_par=prof
+                    )
+
+        self.etudiants = []
+        for i in range(5):
+            user = User.objects.create_user(username=f'etu{i}', password='x')
+            etudiant = Etudiant.objects.create(
+                matricule=f'M{i}', nom=f'Nom{i}', prenom='Test', email=f'etu{i}@test.com',
+                date_inscription='2024-09-01', classe=self.classe, user=user
+            )
+            Note.objects.create(
+                student=etudiant, matiere=self.maths, admin=admin, type_evaluation='devoir',
+                valeur_note=6 + i, date_note='2024-10-01', valide=True
+            )
+            self.etudiants.append(etudiant)
+
+    def test_generer_classe(self):
+        """Toute la classe est traitée en un nombre constant de requêtes"""
+        engine = ClasseSuggestionEngine(self.classe.id_classe, nb_suggestions=3)
+        appels = []
+        with self.assertNumQueries(5):
+            resultat = engine.generer(progression=lambda traites, total: appels.append(traites))
+
+        self.assertEqual(resultat['nb_etudiants'], 5)
+        self.assertEqual(resultat['nb_suggestions'], 15)
+        self.assertEqual(appels, [1, 2, 3, 4, 5])
+
+        premier = SuggestionExercice.objects.filter(etudiant=self.etudiants[0])
+        self.assertEqual(premier.count(), 3)
+        # Moyenne de 6 en maths : exercices faciles de maths en priorité
+        self.assertTrue(all(
+            s.matiere_id == self.maths.id_matiere and s.niveau_suggere == 1 for s in premier
+        ))
+
+    def test_exercice_retire_de_l_index(self):
+        """Un exercice tiré puis absent de l'index rechargé est ignoré"""
+        with mock.patch.object(echantillonneur, 'caracteristiques', return_value=None):
+            resultat = ClasseSuggestionEngine(self.classe.id_classe, nb_suggestions=5).generer()
+        self.assertEqual(resultat['nb_etudiants'], 5)
+
+    @override_settings(SUGGESTIONS_GENERATION_ASYNC=False)
+    def test_generer_classe_api(self):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(username='admin', password='x', is_staff=True))
+        url = f'/api/ia/suggestions/classe/{self.classe.id_classe}/generer/'
+        for invalide in ('abc', 0, -2):
+            self.assertEqual(client.post(url, {'nb': invalide}).status_code, 400)
+        self.assertEqual(client.post('/api/ia/suggestions/classe/999/generer/').status_code, 404)
+
+        response = client.post(url, {'nb': 2})
+        self.assertEqual(response.status_code, 202)
+        suivi = client.get(f"/api/ia/suggestions/classe/generations/{response.data['id']}/").data
+        self.assertEqual((suivi['statut'], suivi['traites'], suivi['total']), ('termine', 5, 5))
+        self.assertEqual(suivi['resultat']['nb_suggestions'], 10)
+
+    @override_settings(SUGGESTIONS_GENERATION_ASYNC=True)
+    def test_generation_en_file_reprise(self):
+        """Une génération acceptée mais perdue par le processus est reprise par la commande, une seule fois"""
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(username='admin', password='x', is_staff=True))
+        with mock.patch('apps.ai_engine.generation._file_generation') as file_generation, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'/api/ia/suggestions/classe/{self.classe.id_classe}/generer/', {'nb': 2})
+        self.assertEqual((response.status_code, response.data['statut']), (202, 'en_file'))
+        file_generation.submit.assert_called_once()
+
+        # Exécution en cours ailleurs : pas reprise avant le délai
+        GenerationSuggestions.objects.update(statut='en_cours')
+        self.assertIsNone(executer(response.data['id']))
+        GenerationSuggestions.objects.update(date_maj=timezone.now() - timedelta(hours=1))
+
+        call_command('generer_suggestions_classe', '--file', stdout=io.StringIO())
+        call_command('generer_suggestions_classe', '--file', stdout=io.StringIO())
+        generation = GenerationSuggestions.objects.get()
+        self.assertEqual((generation.statut, generation.traites), ('termine', 5))
+        self.assertEqual(SuggestionExercice.objects.count(), 10)
+
+    def test_exclusion_suggestions_recentes(self):
+        """Les exercices suggérés récemment ne sont pas reproposés"""
+        ClasseSuggestionEngine(self.classe.id_classe, nb_suggestions=3).generer()
+        ClasseSuggestionEngine(self.classe.id_classe, nb_suggestions=3).generer()
+
+        for etudiant in self.etudiants:
+            exercices = SuggestionExercice.objects.filter(etudiant=etudiant).values_list(
+                'exercice_id', flat=True
+            )
+            self.assertEqual(len(exercices), len(set(exercices)))
+
+
+class TirageSansRemiseTestCase(SimpleTestCase):
+    def test_index_fige(self):
+        """Un index synthétique figé n'est jamais rechargé depuis la base"""
+        index = EchantillonneurExercices()
+        index.charger([(1, 1, 1), (2, 1, 2)], fige=True)
+        self.assertEqual(index.tirer(5, matiere_id=1, difficulte=2), [2])
+        self.assertEqual(index.caracteristiques(1), (1, 1))
+
+    def test_tirage_distinct_hors_exclusion(self):
+        """Les identifiants tirés sont distincts et jamais exclus"""
+        ids = list(range(1000))
+        exclus = set(range(0, 1000, 2))
+        for _ in range(100):
+            tirage = tirer_sans_remise(ids, 10, exclus)
+            self.assertEqual(len(tirage), 10)
+            self.assertEqual(len(set(tirage)), 10)
+            self.assertFalse(exclus & set(tirage))
+
+    def test_pool_epuise(self):
+        """Un pool presque vide retourne tout ce qui reste"""
+        self.assertCountEqual(tirer_sans_remise([1, 2, 3, 4], 10, {2}), [1, 3, 4])
+        self.assertEqual(tirer_sans_remise([], 3), [])
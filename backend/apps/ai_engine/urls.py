@@ -11,4 +11,10 @@ urlpatterns = [
     path('suggestions/feedback/',
          views.FeedbackSuggestionView.as_view(),
          name='suggestions-feedback'),
+    path('suggestions/classe/<int:classe_id>/generer/',
+         views.GenererSuggestionsClasseView.as_view(),
+         name='suggestions-classe-generer'),
+    path('suggestions/classe/generations/<int:pk>/',
+         views.GenerationSuggestionsView.as_view(),
+         name='suggestions-classe-generation'),
 ]
\ No newline at end of file
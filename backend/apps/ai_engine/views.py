@@ -1,10 +1,16 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q, Avg
-from apps.academic.models import Etudiant, Note, BanqueExercices
-from .models import SuggestionExercice, StatistiqueApprentissage
-from .serializers import SuggestionExerciceSerializer, StatistiqueApprentissageSerializer
+from django.db.models import Q
+from apps.academic.models import Etudiant, BanqueExercices, Classe
+from apps.academic.aggregations import calculer_priorite_lineaire
+from apps.academic.synthese import resume_etudiant
+from .generation import mettre_en_file
+from .sampling import echantillonneur
+from .models import GenerationSuggestions, SuggestionExercice, StatistiqueApprentissage
+from .serializers import (
+    GenerationSuggestionsSerializer, SuggestionExerciceSerializer, StatistiqueApprentissageSerializer
+)
 
 
 class SuggestionsPourEtudiantView(APIView):
@@ -29,26 +35,9 @@ class SuggestionsPourEtudiantView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Récupérer toutes les notes de l'étudiant
-        notes = Note.objects.filter(student=etudiant)
-
-        # Analyser les performances par matière
-        performances = {}
-        for note in notes:
-            matiere_id = note.matiere.id_matiere
-            if matiere_id not in performances:
-                performances[matiere_id] = {
-                    'nom': note.matiere.nom_matière,
-                    'notes': [],
-                    'moyenne': 0,
-                    'coefficient': note.matiere.coefficient
-                }
-            performances[matiere_id]['notes'].append(float(note.valeur_note))
-
-        # Calculer les moyennes par matière
-        for matiere_id, data in performances.items():
-            if data['notes']:
-                data['moyenne'] = sum(data['notes']) / len(data['notes'])
+        # Performances par matière lues dans la synthèse matérialisée
+        resume = resume_etudiant(etudiant.id_student)
+        performances = resume.par_matiere
 
         # Identifier les matières faibles (note < 10)
         matieres_faibles = []
@@ -117,7 +106,13 @@ class SuggestionsPourEtudiantView(APIView):
 
         # Si pas assez de suggestions, ajouter des exercices aléatoires
         if len(suggestions) < nb_suggestions:
-            exercices_aleatoires = BanqueExercices.objects.all().order_by('?')[:nb_suggestions - len(suggestions)]
+            exercice_ids = echantillonneur.tirer(
+                nb_suggestions - len(suggestions),
+                a_exclure={s['id_exercice'] for s in suggestions}
+            )
+            exercices_aleatoires = BanqueExercices.objects.filter(
+                id_exercice__in=exercice_ids
+            ).select_related('subject')
             for exercice in exercices_aleatoires:
                 suggestion = {
                     'id_exercice': exercice.id_exercice,
@@ -131,7 +126,7 @@ class SuggestionsPourEtudiantView(APIView):
                 suggestions.append(suggestion)
 
         # Préparer l'analyse
-        moyenne_generale = notes.aggregate(Avg('valeur_note'))['valeur_note__avg']
+        moyenne_generale = resume.moyenne_generale
 
         analyse = {
             'moyenne_generale': round(moyenne_generale, 1) if moyenne_generale else None,
@@ -189,9 +184,10 @@ class AnalyseCompleteView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        notes = Note.objects.filter(student=etudiant)
+        # Performances par matière lues dans la synthèse matérialisée
+        resume = resume_etudiant(etudiant.id_student, calcul_priorite=calculer_priorite_lineaire)
 
-        if not notes.exists():
+        if not resume.nb_notes:
             return Response({
                 'moyenne_generale': None,
                 'performance_par_matiere': {},
@@ -205,29 +201,16 @@ class AnalyseCompleteView(APIView):
                 }
             })
 
-        # Calcul des performances par matière
-        performance_par_matiere = {}
-        for note in notes:
-            matiere_id = note.matiere.id_matiere
-            if matiere_id not in performance_par_matiere:
-                performance_par_matiere[matiere_id] = {
-                    'nom': note.matiere.nom_matière,
-                    'notes': [],
-                    'coefficient': note.matiere.coefficient
-                }
-            performance_par_matiere[matiere_id]['notes'].append(float(note.valeur_note))
-
-        for matiere_id, data in performance_par_matiere.items():
-            if data['notes']:
-                moyenne = sum(data['notes']) / len(data['notes'])
-                priorite = int((10 - moyenne) * data['coefficient'] * 5)
-                performance_par_matiere[matiere_id] = {
-                    'nom': data['nom'],
-                    'moyenne': round(moyenne, 2),
-                    'nb_notes': len(data['notes']),
-                    'coefficient': data['coefficient'],
-                    'priorite': max(0, min(100, priorite))
-                }
+        performance_par_matiere = {
+            matiere_id: {
+                'nom': data['nom'],
+                'moyenne': round(data['moyenne'], 2),
+                'nb_notes': data['nb_notes'],
+                'coefficient': data['coefficient'],
+                'priorite': data['priorite']
+            }
+            for matiere_id, data in resume.par_matiere.items()
+        }
 
         # Matières à risque
         matieres_risque = [
@@ -243,7 +226,7 @@ class AnalyseCompleteView(APIView):
 
         # Progression
         progression = 'stable'
-        moyenne_generale = notes.aggregate(Avg('valeur_note'))['valeur_note__avg']
+        moyenne_generale = resume.moyenne_generale
         niveau_global = self._determiner_niveau(moyenne_generale)
 
         return Response({
@@ -299,4 +282,42 @@ class FeedbackSuggestionView(APIView):
         return Response({
             'success': True,
             'message': 'Feedback enregistré'
-        })
\ No newline at end of file
+        })
+
+
+class GenererSuggestionsClasseView(APIView):
+    """
+    Lancer la génération des suggestions de tous les étudiants d'une classe (admin).
+
+    La génération est mise en file (apps.ai_engine.generation) : la réponse
+    (202) porte son id, et sa progression se lit sur
+    suggestions/classe/generations/<id>/.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, classe_id):
+        try:
+            nb_suggestions = int(request.data.get('nb', 5))
+        except (TypeError, ValueError):
+            nb_suggestions = 0
+        if nb_suggestions < 1:
+            return Response(
+                {'error': 'Le paramètre nb doit être un entier supérieur ou égal à 1'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not Classe.objects.filter(id_classe=classe_id).exists():
+            return Response(
+                {'error': 'Classe non trouvée'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        generation = mettre_en_file(classe_id, nb_suggestions)
+        return Response(GenerationSuggestionsSerializer(generation).data, status=status.HTTP_202_ACCEPTED)
+
+
+class GenerationSuggestionsView(generics.RetrieveAPIView):
+    """Progression et résultat d'une génération de suggestions (admin)"""
+    queryset = GenerationSuggestions.objects.all()
+    serializer_class = GenerationSuggestionsSerializer
+    permission_classes = [permissions.IsAdminUser]
@@ -20,14 +20,13 @@ class ConversationAdmin(admin.ModelAdmin):
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ('id', 'conversation', 'sender', 'created_at', 'is_read')
-    list_filter = ('is_read', 'created_at')
+    list_display = ('id', 'conversation', 'sender', 'created_at')
+    list_filter = ('created_at',)
     search_fields = ('content',)
-    raw_id_fields = ('conversation', 'sender', 'read_by')
+    raw_id_fields = ('conversation', 'sender', 'blob')
     readonly_fields = ('created_at',)
 
 @admin.register(Participant)
 class ParticipantAdmin(admin.ModelAdmin):
-    list_display = ('id', 'conversation', 'user', 'is_typing', 'joined_at', 'last_read')
-    list_filter = ('is_typing',)
+    list_display = ('id', 'conversation', 'user', 'joined_at', 'last_read', 'last_read_message_id', 'unread_count')
     raw_id_fields = ('conversation', 'user')
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+Tickets d'accès au flux d'événements (ChatStreamView).
+
+EventSource ne permet pas d'envoyer l'en-tête Authorization : le client
+échange son jeton JWT contre un ticket signé (POST stream/ticket/), passé en
+?ticket= à l'ouverture du flux. Le ticket ne vaut que pour le flux et expire
+après CHAT_TICKET_DUREE secondes ; le navigateur le réutilise à chaque
+reconnexion automatique, puis le client en demande un nouveau.
+"""
+from django.conf import settings
+from django.core.signing import BadSignature, TimestampSigner
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from apps.accounts.models import User
+
+SEL = 'apps.chat.flux'
+
+
+def duree_ticket():
+    return getattr(settings, 'CHAT_TICKET_DUREE', 600)
+
+
+def emettre_ticket(user):
+    return TimestampSigner(salt=SEL).sign(str(user.pk))
+
+
+class TicketFluxAuthentication(BaseAuthentication):
+    """Authentifie une requête par ?ticket= ; sans ticket, passe la main aux autres classes"""
+
+    def authenticate(self, request):
+        ticket = request.query_params.get('ticket')
+        if not ticket:
+            return None
+        try:
+            user_id = TimestampSigner(salt=SEL).unsign(ticket, max_age=duree_ticket())
+            user = User.objects.get(pk=user_id, is_active=True)
+        except (BadSignature, User.DoesNotExist):
+            raise AuthenticationFailed('Ticket de flux expiré ou invalide')
+        return user, None
+
+    def authenticate_header(self, request):
+        return 'Ticket'
@@ -0,0 +1,107 @@
+"""
+Pub/sub des événements de chat (nouveaux messages, lectures, frappe).
+
+Le backend est choisi par le réglage CHAT_BROKER (chemin d'une classe) ;
+BrokerLocal, en mémoire, convient à un seul processus et aux tests. Un
+backend partagé (Redis...) doit exposer publier() et abonner().
+"""
+import queue
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+def canal_conversation(conversation_id):
+    return f'conversation:{conversation_id}'
+
+
+class Abonnement:
+    """File d'événements d'un abonné ; à fermer après usage (context manager)"""
+
+    def __init__(self, broker, canaux, taille_max=100):
+        self.broker = broker
+        self.canaux = set(canaux)
+        self.file = queue.Queue(maxsize=taille_max)
+
+    def recevoir(self, evenement):
+        try:
+            self.file.put_nowait(evenement)
+        except queue.Full:
+            # Client trop lent : on sacrifie le plus ancien événement
+            try:
+                self.file.get_nowait()
+            except queue.Empty:
+                pass
+            self.file.put_nowait(evenement)
+
+    def attendre(self, timeout):
+        """Événements disponibles, en attendant au plus `timeout` secondes le premier"""
+        try:
+            evenements = [self.file.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                evenements.append(self.file.get_nowait())
+            except queue.Empty:
+                return evenements
+
+    def fermer(self):
+        self.broker.desabonner(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+
+class BrokerLocal:
+    """Broker en mémoire du processus courant"""
+
+    def __init__(self):
+        self._abonnes = {}
+        self._verrou = threading.Lock()
+
+    def abonner(self, canaux):
+        abonnement = Abonnement(self, canaux)
+        with self._verrou:
+            for canal in abonnement.canaux:
+                self._abonnes.setdefault(canal, set()).add(abonnement)
+        return abonnement
+
+    def desabonner(self, abonnement):
+        with self._verrou:
+            for canal in abonnement.canaux:
+                abonnes = self._abonnes.get(canal)
+                if abonnes:
+                    abonnes.discard(abonnement)
+                    if not abonnes:
+                        del self._abonnes[canal]
+
+    def publier(self, canal, evenement):
+        with self._verrou:
+            abonnes = list(self._abonnes.get(canal, ()))
+        for abonnement in abonnes:
+            abonnement.recevoir(evenement)
+        return len(abonnes)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, 'CHAT_BROKER', 'apps.chat.broker.BrokerLocal'))()
+    return _broker
+
+
+def publier(conversation_id, type_evenement, donnees):
+    """Publie un événement d'une conversation une fois la transaction validée"""
+    evenement = {'type': type_evenement, 'conversation': conversation_id, 'data': donnees}
+    transaction.on_commit(
+        lambda: get_broker().publier(canal_conversation(conversation_id), evenement)
+    )
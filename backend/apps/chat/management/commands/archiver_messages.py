@@ -0,0 +1,30 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.chat.retention import archiver, duree_retention
+
+
+class Command(BaseCommand):
+    help = "Déplace les messages plus anciens que N jours vers la table d'archive, par tranches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, help='Durée de rétention en jours (CHAT_RETENTION_JOURS par défaut)')
+        parser.add_argument('--taille-lot', type=int, default=5000, help='Taille des tranches de clé primaire')
+
+    def handle(self, *args, **options):
+        jours = options['jours'] if options['jours'] is not None else duree_retention()
+        if jours < 0:
+            raise CommandError("--jours doit être positif")
+
+        avant = timezone.now() - timedelta(days=jours)
+        debut = time.monotonic()
+        archives = archiver(avant, taille_lot=options['taille_lot'], progression=self._afficher_progression)
+        duree = time.monotonic() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"{archives} messages antérieurs au {avant:%Y-%m-%d %H:%M} archivés en {duree:.2f}s"
+        ))
+
+    def _afficher_progression(self, archives, id_courant, id_max):
+        self.stdout.write(f"  {archives} archivés (id {id_courant}/{id_max})")
@@ -0,0 +1,34 @@
+"""
+Cache des membres d'une conversation pour les contrôles d'accès.
+
+L'ensemble des user_id d'une conversation (table Participant) est gardé
+dans le cache Django ; il est invalidé à chaque changement d'appartenance
+(signaux Participant, et explicitement après un bulk_create).
+"""
+from django.core.cache import cache
+from .models import Participant
+
+DUREE_CACHE = 300
+
+
+def _cle(conversation_id):
+    return f'chat_membres_{conversation_id}'
+
+
+def membres_conversation(conversation_id):
+    """frozenset des user_id participants (une requête indexée au plus)"""
+    membres = cache.get(_cle(conversation_id))
+    if membres is None:
+        membres = frozenset(
+            Participant.objects.filter(conversation_id=conversation_id).values_list('user_id', flat=True)
+        )
+        cache.set(_cle(conversation_id), membres, timeout=DUREE_CACHE)
+    return membres
+
+
+def est_membre(conversation_id, user_id):
+    return user_id in membres_conversation(conversation_id)
+
+
+def invalider_membres(conversation_id):
+    cache.delete(_cle(conversation_id))
@@ -0,0 +1,61 @@
+# Generated by Django 4.2 on 2026-10-18 10:52
+
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def initialiser_compteurs(apps, schema_editor):
+    """Crée les Participant manquants et calcule les non-lus depuis read_by"""
+    Conversation = apps.get_model('chat', 'Conversation')
+    Message = apps.get_model('chat', 'Message')
+    Participant = apps.get_model('chat', 'Participant')
+
+    existants = set(Participant.objects.values_list('conversation_id', 'user_id'))
+    membres = Conversation.participants.through.objects.values_list('conversation_id', 'user_id')
+    Participant.objects.bulk_create(
+        [Participant(conversation_id=c, user_id=u) for c, u in membres if (c, u) not in existants],
+        batch_size=1000,
+    )
+
+    # non lus = messages de la conversation - envoyés par l'utilisateur - lus par lui (hors les siens)
+    totaux = dict(Message.objects.values('conversation').annotate(n=Count('id')).values_list('conversation', 'n'))
+    envoyes = {
+        (c, u): n for c, u, n in
+        Message.objects.values('conversation', 'sender').annotate(n=Count('id')).values_list('conversation', 'sender', 'n')
+    }
+    lus = {
+        (c, u): n for c, u, n in
+        Message.read_by.through.objects.exclude(message__sender=F('user'))
+        .values('message__conversation', 'user').annotate(n=Count('id'))
+        .values_list('message__conversation', 'user', 'n')
+    }
+
+    participants = []
+    for participant in Participant.objects.all().iterator():
+        cle = (participant.conversation_id, participant.user_id)
+        participant.unread_count = max(
+            0, totaux.get(cle[0], 0) - envoyes.get(cle, 0) - lus.get(cle, 0)
+        )
+        if participant.unread_count:
+            participants.append(participant)
+    Participant.objects.bulk_update(participants, ['unread_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_participant_alter_conversation_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participant',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='participant',
+            index=models.Index(fields=['user', 'unread_count'], name='chat_partic_user_id_1df2fd_idx'),
+        ),
+        migrations.RunPython(initialiser_compteurs, migrations.RunPython.noop),
+    ]
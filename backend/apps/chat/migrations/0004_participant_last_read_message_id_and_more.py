@@ -0,0 +1,63 @@
+# Generated by Django 4.2 on 2026-10-18 10:53
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def calculer_filigranes(apps, schema_editor):
+    """
+    Filigrane initial = plus grand id de message lu (read_by) ou envoyé par le participant.
+
+    Les compteurs de non-lus sont recalculés à partir du filigrane.
+    """
+    Message = apps.get_model('chat', 'Message')
+    Participant = apps.get_model('chat', 'Participant')
+
+    lus = {
+        (c, u): m for c, u, m in
+        Message.read_by.through.objects.values('message__conversation', 'user')
+        .annotate(m=Max('message')).values_list('message__conversation', 'user', 'm')
+    }
+    envoyes = {
+        (c, u): m for c, u, m in
+        Message.objects.values('conversation', 'sender').annotate(m=Max('id'))
+        .values_list('conversation', 'sender', 'm')
+    }
+
+    non_lus = Message.objects.filter(
+        conversation=OuterRef('conversation'),
+        id__gt=OuterRef('last_read_message_id'),
+    ).exclude(sender=OuterRef('user')).order_by().values('conversation').annotate(n=Count('id')).values('n')
+
+    participants = []
+    for participant in Participant.objects.all().iterator():
+        cle = (participant.conversation_id, participant.user_id)
+        participant.last_read_message_id = max(lus.get(cle, 0), envoyes.get(cle, 0))
+        participants.append(participant)
+    Participant.objects.bulk_update(participants, ['last_read_message_id'], batch_size=1000)
+    Participant.objects.update(unread_count=Coalesce(Subquery(non_lus), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_participant_unread_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participant',
+            name='last_read_message_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(calculer_filigranes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='read_by',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 10:58
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_participant_last_read_message_id_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='participant',
+            name='is_typing',
+        ),
+    ]
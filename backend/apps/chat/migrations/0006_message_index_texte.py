@@ -0,0 +1,51 @@
+from django.db import migrations
+
+# Index plein texte sur chat_message.content selon le moteur :
+# FULLTEXT natif sous MySQL, table FTS5 alimentée par triggers sous SQLite.
+SQLITE_CREATION = [
+    "CREATE VIRTUAL TABLE chat_message_fts USING fts5("
+    "content, content='chat_message', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER chat_message_fts_ai AFTER INSERT ON chat_message BEGIN "
+    "INSERT INTO chat_message_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER chat_message_fts_ad AFTER DELETE ON chat_message BEGIN "
+    "INSERT INTO chat_message_fts(chat_message_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER chat_message_fts_au AFTER UPDATE OF content ON chat_message BEGIN "
+    "INSERT INTO chat_message_fts(chat_message_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO chat_message_fts(rowid, content) VALUES (new.id, new.content); END",
+    "INSERT INTO chat_message_fts(chat_message_fts) VALUES ('rebuild')",
+]
+SQLITE_SUPPRESSION = [
+    "DROP TRIGGER IF EXISTS chat_message_fts_ai",
+    "DROP TRIGGER IF EXISTS chat_message_fts_ad",
+    "DROP TRIGGER IF EXISTS chat_message_fts_au",
+    "DROP TABLE IF EXISTS chat_message_fts",
+]
+
+
+def creer_index_texte(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE chat_message ADD FULLTEXT INDEX chat_message_content_ft (content)')
+    elif vendor == 'sqlite':
+        for sql in SQLITE_CREATION:
+            schema_editor.execute(sql)
+
+
+def supprimer_index_texte(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE chat_message DROP INDEX chat_message_content_ft')
+    elif vendor == 'sqlite':
+        for sql in SQLITE_SUPPRESSION:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_remove_participant_is_typing'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index_texte, supprimer_index_texte),
+    ]
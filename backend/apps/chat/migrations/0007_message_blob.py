@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-18 11:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fichiers', '0001_initial'),
+        ('chat', '0006_message_index_texte'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='messages', to='fichiers.blob'),
+        ),
+    ]
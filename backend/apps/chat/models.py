@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from apps.accounts.models import User
+from apps.fichiers.models import Blob
 
 
 class Conversation(models.Model):
@@ -32,10 +33,9 @@ class Message(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     content = models.TextField()
-    file = models.FileField(upload_to='chat_files/', null=True, blank=True)
+    file = models.FileField(upload_to='chat_files/', null=True, blank=True)  # pièces jointes antérieures aux blobs
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, related_name='messages')
     file_name = models.CharField(max_length=255, blank=True)
-    is_read = models.BooleanField(default=False)
-    read_by = models.ManyToManyField(User, related_name='read_messages', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -49,16 +49,48 @@ class Message(models.Model):
         return f"Message de {self.sender.username} à {self.created_at.strftime('%H:%M')}"
 
 
+class MessageArchive(models.Model):
+    """
+    Message déplacé hors de la table chaude par la rétention (apps.chat.retention).
+
+    Garde l'id d'origine : curseurs de pagination et filigranes de lecture
+    restent valables.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages_archives')
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    content = models.TextField()
+    file = models.FileField(upload_to='chat_files/', null=True, blank=True)
+    file_name = models.CharField(max_length=255, blank=True)
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'chat_message_archive'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['conversation', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Message archivé {self.id}"
+
+
 class Participant(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='participant_info')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     last_read = models.DateTimeField(null=True, blank=True)
-    is_typing = models.BooleanField(default=False)
+    # Filigrane de lecture : tous les messages d'id <= last_read_message_id sont lus
+    last_read_message_id = models.BigIntegerField(default=0)
+    unread_count = models.PositiveIntegerField(default=0)  # incrémenté à l'envoi, remis à 0 à la lecture
     joined_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'chat_participant'
         unique_together = ['conversation', 'user']
+        indexes = [
+            models.Index(fields=['user', 'unread_count']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} dans {self.conversation}"
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+Pagination par curseur (keyset) de l'historique des messages.
+
+La position est le couple (created_at, id) du message : chaque page est lue
+sur l'index (conversation, created_at) sans OFFSET, pour un coût constant
+quelle que soit la longueur de la conversation.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+def encoder_curseur(message):
+    valeur = f'{message.created_at.isoformat()}|{message.id}'
+    return base64.urlsafe_b64encode(valeur.encode()).decode()
+
+
+def decoder_curseur(curseur):
+    """(created_at, id) d'un curseur ; ValidationError s'il est invalide"""
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(curseur.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({'error': 'Curseur invalide'})
+
+
+def _suivants(messages, curseur, nombre, avec_curseur=False):
+    created_at, message_id = curseur
+    condition = Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+    if avec_curseur:
+        condition |= Q(id=message_id)
+    return list(messages.order_by().filter(condition).order_by('created_at', 'id')[:nombre])
+
+
+def _precedents(messages, curseur, nombre):
+    messages = messages.order_by()
+    if curseur is not None:
+        created_at, message_id = curseur
+        messages = messages.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+        )
+    return list(messages.order_by('-created_at', '-id')[:nombre])
+
+
+def page_messages(messages, avant=None, apres=None, taille=50, archives=None):
+    """
+    Une page de messages, en ordre chronologique.
+
+    Sans curseur : les plus récents. `avant` : les plus récents antérieurs au
+    curseur (remonter l'historique). `apres` : les plus anciens postérieurs au
+    curseur (rattraper). Retourne (messages, plus_avant, plus_apres).
+
+    `archives` : messages archivés de la conversation, tous antérieurs aux
+    messages de la table chaude. Ils ne sont lus que lorsque la page déborde
+    sur l'historique archivé. En rattrapage, le message du curseur est lu avec
+    la suite : s'il est encore dans la table chaude, l'archive n'a rien après
+    lui et n'est pas interrogée.
+    """
+    if apres is not None:
+        curseur = decoder_curseur(apres)
+        if archives is None:
+            lot = _suivants(messages, curseur, taille + 1)
+        else:
+            chauds = _suivants(messages, curseur, taille + 2, avec_curseur=True)
+            lot = [message for message in chauds if message.id != curseur[1]][:taille + 1]
+            if len(lot) == len(chauds):
+                # Curseur archivé (ou supprimé) : la suite commence peut-être dans l'archive
+                lot = _suivants(archives, curseur, taille + 1) + lot
+        return lot[:taille], True, len(lot) > taille
+
+    curseur = decoder_curseur(avant) if avant is not None else None
+    lot = _precedents(messages, curseur, taille + 1)
+    if archives is not None and len(lot) <= taille:
+        lot += _precedents(archives, curseur, taille + 1 - len(lot))
+    return lot[:taille][::-1], len(lot) > taille, avant is not None
+
+
+class MessageCursorPagination(BasePagination):
+    """Paramètres ?before=<curseur>, ?after=<curseur> et ?limit=<taille>"""
+    page_size = 50
+    max_page_size = 200
+
+    def get_page_size(self, request):
+        try:
+            taille = int(request.query_params.get('limit', self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(taille, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.curseur_apres = request.query_params.get('after')
+        self.page, self.plus_avant, self.plus_apres = page_messages(
+            queryset,
+            avant=request.query_params.get('before'),
+            apres=self.curseur_apres,
+            taille=self.get_page_size(request),
+            # Repli sur l'historique archivé fourni par la vue, s'il y en a un
+            archives=view.get_archives() if hasattr(view, 'get_archives') else None,
+        )
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'before': encoder_curseur(self.page[0]) if self.page else None,
+            # Page vide en rattrapage : le client garde son curseur
+            'after': encoder_curseur(self.page[-1]) if self.page else self.curseur_apres,
+            'has_more_before': self.plus_avant,
+            'has_more_after': self.plus_apres,
+            'results': data,
+        })
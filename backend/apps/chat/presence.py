@@ -0,0 +1,31 @@
+"""
+Statut « en train d'écrire », éphémère et hors base de données.
+
+Stocké dans le cache Django : une clé par (conversation, utilisateur), posée
+avec une expiration de DUREE_FRAPPE secondes. Chaque frappe n'écrit que sa
+propre clé (aucune mise à jour perdue entre deux utilisateurs) ; la lecture
+récupère les clés des membres en un seul get_many.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from .membres import membres_conversation
+
+DUREE_FRAPPE = getattr(settings, 'CHAT_TYPING_TTL', 6)
+
+
+def _cle(conversation_id, user_id):
+    return f'chat_frappe_{conversation_id}_{user_id}'
+
+
+def definir_frappe(conversation_id, user_id, en_train):
+    """Marque (ou retire) un utilisateur comme en train d'écrire"""
+    if en_train:
+        cache.set(_cle(conversation_id, user_id), True, timeout=DUREE_FRAPPE)
+    else:
+        cache.delete(_cle(conversation_id, user_id))
+
+
+def utilisateurs_en_train_d_ecrire(conversation_id):
+    """Identifiants des membres en train d'écrire (une lecture groupée du cache)"""
+    cles = {_cle(conversation_id, user_id): user_id for user_id in membres_conversation(conversation_id)}
+    return sorted(cles[cle] for cle in cache.get_many(cles))
@@ -0,0 +1,108 @@
+"""
+Recherche plein texte dans les messages des conversations d'un utilisateur.
+
+S'appuie sur l'index créé par la migration 0006 : FULLTEXT (MATCH ...
+AGAINST en mode booléen) sous MySQL, FTS5 (bm25) sous SQLite. Les autres
+moteurs retombent sur icontains, sans classement. Sous SQLite, seules les
+CANDIDATS correspondances les plus récentes sont classées.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from .models import Message, Participant
+
+TERMES_MAX = 10
+CANDIDATS = 500
+
+
+def extraire_termes(requete):
+    """Mots de la requête, en minuscules, sans opérateurs"""
+    return re.findall(r'\w+', requete.lower())[:TERMES_MAX]
+
+
+def _rechercher_mysql(messages, termes):
+    # Tous les termes requis, préfixe sur le dernier : +terme ... +dernier*
+    expression = ' '.join([f'+{terme}' for terme in termes[:-1]] + [f'+{termes[-1]}*'])
+    match = f'MATCH ({Message._meta.db_table}.content) AGAINST (%s IN BOOLEAN MODE)'
+    return messages.extra(where=[match], params=[expression]).annotate(
+        score=RawSQL(match, (expression,))
+    ).order_by('-score', '-id')
+
+
+def _rechercher_sqlite(messages, termes, user, limite, decalage):
+    # Classement bm25 parmi les CANDIDATS correspondances les plus récentes :
+    # borne le coût des termes très fréquents
+    # Termes exacts, préfixe sur le dernier seulement (saisie en cours) : les
+    # requêtes préfixe sur chaque terme fusionnent de nombreuses listes
+    expression = ' '.join([f'"{terme}"' for terme in termes[:-1]] + [f'"{termes[-1]}"*'])
+    with connection.cursor() as curseur:
+        curseur.execute(
+            "SELECT rowid, score FROM ("
+            "SELECT f.rowid AS rowid, -bm25(chat_message_fts) AS score "
+            "FROM chat_message_fts f JOIN chat_message m ON m.id = f.rowid "
+            "WHERE chat_message_fts MATCH %s "
+            "AND m.conversation_id IN (SELECT conversation_id FROM chat_participant WHERE user_id = %s) "
+            "ORDER BY f.rowid DESC LIMIT %s"
+            ") ORDER BY score DESC, rowid DESC LIMIT %s OFFSET %s",
+            [expression, user.id, CANDIDATS, limite, decalage],
+        )
+        scores = dict(curseur.fetchall())
+    trouves = messages.in_bulk(list(scores))
+    resultats = []
+    for message_id, score in sorted(scores.items(), key=lambda item: -item[1]):
+        if message_id in trouves:
+            trouves[message_id].score = score
+            resultats.append(trouves[message_id])
+    return resultats
+
+
+def rechercher_messages(user, requete, limite=20, decalage=0):
+    """
+    Messages correspondant à tous les termes, classés par pertinence.
+
+    Retourne (messages, plus) ; chaque message porte un attribut `score`.
+    """
+    termes = extraire_termes(requete)
+    if not termes:
+        return [], False
+
+    messages = Message.objects.filter(
+        conversation_id__in=Participant.objects.filter(user=user).values('conversation_id')
+    ).select_related('sender', 'conversation')
+
+    if connection.vendor == 'sqlite':
+        resultats = _rechercher_sqlite(messages, termes, user, limite + 1, decalage)
+    else:
+        if connection.vendor == 'mysql':
+            messages = _rechercher_mysql(messages, termes)
+        else:
+            for terme in termes:
+                messages = messages.filter(content__icontains=terme)
+            messages = messages.order_by('-id')
+        resultats = list(messages[decalage:decalage + limite + 1])
+        for message in resultats:
+            message.score = getattr(message, 'score', 0)
+
+    return resultats[:limite], len(resultats) > limite
+
+
+def extrait(contenu, termes, largeur=120):
+    """Fragment du message autour du premier terme trouvé, termes entourés de <mark>"""
+    motif = re.compile('|'.join(r'\b' + re.escape(terme) + r'\w*' for terme in termes), re.IGNORECASE)
+    premier = motif.search(contenu)
+    debut = max(0, premier.start() - largeur // 3) if premier else 0
+    fragment = contenu[debut:debut + largeur]
+
+    morceaux = []
+    position = 0
+    for trouve in motif.finditer(fragment):
+        morceaux.append(escape(fragment[position:trouve.start()]))
+        morceaux.append(f'<mark>{escape(trouve.group())}</mark>')
+        position = trouve.end()
+    morceaux.append(escape(fragment[position:]))
+
+    prefixe = '…' if debut > 0 else ''
+    suffixe = '…' if debut + largeur < len(contenu) else ''
+    return prefixe + ''.join(morceaux) + suffixe
@@ -0,0 +1,47 @@
+"""
+Rétention des messages : les messages anciens passent dans MessageArchive.
+
+Le déplacement se fait par tranches de clé primaire, chacune copiée puis
+supprimée dans sa propre transaction. La table chaude ne garde que le trafic
+récent ; l'historique archivé reste lisible via page_messages(archives=...).
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from .models import Message, MessageArchive
+
+CHAMPS = ['id', 'conversation_id', 'sender_id', 'content', 'file', 'file_name', 'blob_id', 'created_at']
+
+
+def duree_retention():
+    """Âge (en jours) au-delà duquel les messages sont archivés"""
+    return getattr(settings, 'CHAT_RETENTION_JOURS', 180)
+
+
+def archiver(avant, taille_lot=5000, progression=None):
+    """
+    Déplace les messages créés avant `avant` vers MessageArchive.
+
+    `progression(archives, id_courant, id_max)` est appelé après chaque
+    tranche. Retourne le nombre de messages archivés.
+    """
+    anciens = Message.objects.filter(created_at__lt=avant).order_by()
+    bornes = anciens.aggregate(id_min=Min('id'), id_max=Max('id'))
+    if bornes['id_min'] is None:
+        return 0
+
+    archives = 0
+    debut = bornes['id_min']
+    while debut <= bornes['id_max']:
+        tranche = anciens.filter(id__gte=debut, id__lt=debut + taille_lot)
+        with transaction.atomic():
+            # ignore_conflicts : une tranche interrompue peut être rejouée
+            MessageArchive.objects.bulk_create(
+                [MessageArchive(**valeurs) for valeurs in tranche.values(*CHAMPS)],
+                ignore_conflicts=True,
+            )
+            archives += tranche.delete()[0]
+        debut += taille_lot
+        if progression:
+            progression(archives, min(debut, bornes['id_max']), bornes['id_max'])
+    return archives
@@ -1,25 +1,135 @@
+from django.conf import settings
 from rest_framework import serializers
-from django.db.models import Q
-from .models import Conversation, Message, Participant
+from apps.fichiers.liens import url_blob
+from apps.fichiers.stockage import enregistrer
+from .models import Conversation, Message, MessageArchive, Participant
+from .pagination import MessageCursorPagination, encoder_curseur, page_messages
+from .presence import utilisateurs_en_train_d_ecrire
+from .recherche import extrait
 from apps.accounts.serializers import UserSerializer
 
 
 class ParticipantSerializer(serializers.ModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
+    is_typing = serializers.SerializerMethodField()
 
     class Meta:
         model = Participant
         fields = ['id', 'user', 'user_details', 'last_read', 'is_typing', 'joined_at']
 
+    def get_is_typing(self, obj):
+        return obj.user_id in frappes_conversation(self.context, obj.conversation_id)
+
+
+def frappes_conversation(context, conversation_id):
+    """Membres en train d'écrire, lus une fois par conversation et gardés dans le contexte du serializer"""
+    frappes = context.setdefault('frappes', {})
+    if conversation_id not in frappes:
+        frappes[conversation_id] = set(utilisateurs_en_train_d_ecrire(conversation_id))
+    return frappes[conversation_id]
+
+
+def filigranes_conversation(context, conversation_id):
+    """
+    {user_id: last_read_message_id} des participants, mis en cache dans le
+    contexte du serializer (une requête par conversation)
+    """
+    cache = context.setdefault('filigranes', {})
+    if conversation_id not in cache:
+        cache[conversation_id] = dict(
+            Participant.objects.filter(conversation_id=conversation_id)
+            .values_list('user_id', 'last_read_message_id')
+        )
+    return cache[conversation_id]
+
+
+def precharger_filigranes(conversation_ids, context):
+    """Filigranes de plusieurs conversations en une requête"""
+    cache = context.setdefault('filigranes', {})
+    for conversation_id in conversation_ids:
+        cache[conversation_id] = {}
+    for conversation_id, user_id, filigrane in Participant.objects.filter(
+        conversation_id__in=conversation_ids
+    ).values_list('conversation_id', 'user_id', 'last_read_message_id'):
+        cache[conversation_id][user_id] = filigrane
+
+
+def precharger_conversations(conversations, context):
+    """
+    Charge en deux requêtes les filigranes et les derniers messages d'une page
+    de conversations annotées (last_message_id), pour ConversationSerializer.
+    Une troisième lit l'archive si une conversation n'a plus que des messages archivés.
+    """
+    precharger_filigranes([conversation.id for conversation in conversations], context)
+    ids = {c.last_message_id for c in conversations if c.last_message_id}
+    derniers = Message.objects.select_related('sender').in_bulk(ids)
+    if len(derniers) < len(ids):
+        derniers.update(MessageArchive.objects.select_related('sender').in_bulk(ids - set(derniers)))
+    context['derniers_messages'] = derniers
+
 
 class MessageSerializer(serializers.ModelSerializer):
     sender_details = UserSerializer(source='sender', read_only=True)
+    is_read = serializers.SerializerMethodField()
+    read_by = serializers.SerializerMethodField()
+    # Pièce jointe envoyée : stockée par contenu (apps.fichiers), une seule fois
+    file = serializers.FileField(write_only=True, required=False)
+    file_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Message
         fields = ['id', 'conversation', 'sender', 'sender_details', 'content',
-                  'file', 'file_name', 'is_read', 'read_by', 'created_at']
-        read_only_fields = ['id', 'created_at']
+                  'file', 'file_name', 'file_url', 'blob', 'is_read', 'read_by', 'created_at']
+        # Conversation et expéditeur sont fixés par la vue
+        read_only_fields = ['id', 'conversation', 'sender', 'blob', 'created_at']
+
+    def validate_file(self, value):
+        taille_max = getattr(settings, 'BLOBS_TAILLE_MAX', 100 * 1024 * 1024)
+        if value.size > taille_max:
+            raise serializers.ValidationError(
+                f"Fichier trop volumineux. Maximum: {taille_max // (1024 * 1024)}MB"
+            )
+        return value
+
+    def create(self, validated_data):
+        fichier = validated_data.pop('file', None)
+        if fichier is not None:
+            validated_data['blob'] = enregistrer(fichier)
+            validated_data['file_name'] = validated_data.get('file_name') or fichier.name
+        return super().create(validated_data)
+
+    def get_file_url(self, obj):
+        if obj.blob_id:
+            return url_blob(obj.blob_id, self.context.get('request'), obj.file_name)
+        return obj.file.url if obj.file else None
+
+    def get_read_by(self, obj):
+        """Accusés de lecture : participants dont le filigrane atteint ce message"""
+        filigranes = filigranes_conversation(self.context, obj.conversation_id)
+        return [user_id for user_id, filigrane in filigranes.items() if filigrane >= obj.id]
+
+    def get_is_read(self, obj):
+        """Lu par l'utilisateur courant (ou, sans requête, par un autre que l'expéditeur)"""
+        filigranes = filigranes_conversation(self.context, obj.conversation_id)
+        request = self.context.get('request')
+        if request is not None and request.user.is_authenticated and request.user.id != obj.sender_id:
+            return filigranes.get(request.user.id, 0) >= obj.id
+        return any(
+            filigrane >= obj.id for user_id, filigrane in filigranes.items() if user_id != obj.sender_id
+        )
+
+
+class ResultatRechercheSerializer(MessageSerializer):
+    """Message trouvé par la recherche, avec son score et un extrait surligné"""
+    conversation_name = serializers.CharField(source='conversation.name', read_only=True)
+    score = serializers.FloatField(read_only=True)
+    snippet = serializers.SerializerMethodField()
+
+    class Meta(MessageSerializer.Meta):
+        fields = MessageSerializer.Meta.fields + ['conversation_name', 'score', 'snippet']
+
+    def get_snippet(self, obj):
+        return extrait(obj.content, self.context.get('termes', []))
 
 
 class ConversationSerializer(serializers.ModelSerializer):
@@ -31,24 +141,52 @@ class ConversationSerializer(serializers.ModelSerializer):
         model = Conversation
         fields = ['id', 'name', 'type', 'participants', 'participants_details',
                   'created_by', 'created_at', 'updated_at', 'last_message', 'unread_count']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        # Les participants sont fournis via participant_ids à la création
+        read_only_fields = ['id', 'participants', 'created_by', 'created_at', 'updated_at']
 
     def get_last_message(self, obj):
-        last_msg = obj.messages.order_by('-created_at').first()
+        derniers = self.context.get('derniers_messages')
+        if derniers is not None and hasattr(obj, 'last_message_id'):
+            last_msg = derniers.get(obj.last_message_id)
+        else:
+            last_msg = (
+                obj.messages.order_by('-created_at').first()
+                or obj.messages_archives.order_by('-created_at').first()
+            )
         if last_msg:
-            return MessageSerializer(last_msg).data
+            return MessageSerializer(last_msg, context=self.context).data
         return None
 
     def get_unread_count(self, obj):
+        if hasattr(obj, 'unread_count'):
+            return obj.unread_count or 0  # annoté depuis le compteur du participant
         user = self.context.get('request').user
-        return obj.messages.filter(
-            ~Q(read_by=user),
-            ~Q(sender=user)
-        ).count()
+        filigrane = filigranes_conversation(self.context, obj.id).get(user.id, 0)
+        return obj.messages.filter(id__gt=filigrane).exclude(sender=user).count()
 
 
 class ConversationDetailSerializer(ConversationSerializer):
-    messages = MessageSerializer(source='messages', many=True, read_only=True)
+    """Conversation avec la dernière page de messages (la suite via ?before= sur /messages/)"""
+    messages = serializers.SerializerMethodField()
+    messages_before = serializers.SerializerMethodField()
 
     class Meta(ConversationSerializer.Meta):
-        fields = ConversationSerializer.Meta.fields + ['messages']
\ No newline at end of file
+        fields = ConversationSerializer.Meta.fields + ['messages', 'messages_before']
+
+    def _derniere_page(self, obj):
+        if not hasattr(obj, '_derniere_page'):
+            obj._derniere_page = page_messages(
+                obj.messages.select_related('sender'),
+                taille=MessageCursorPagination.page_size,
+                archives=obj.messages_archives.select_related('sender'),
+            )
+        return obj._derniere_page
+
+    def get_messages(self, obj):
+        messages, _, _ = self._derniere_page(obj)
+        return MessageSerializer(messages, many=True, context=self.context).data
+
+    def get_messages_before(self, obj):
+        """Curseur des messages plus anciens, ou None si tout est chargé"""
+        messages, plus_avant, _ = self._derniere_page(obj)
+        return encoder_curseur(messages[0]) if plus_avant else None
\ No newline at end of file
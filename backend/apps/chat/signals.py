@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .membres import invalider_membres
+from .models import Participant
+
+
+@receiver([post_save, post_delete], sender=Participant)
+def invalider_cache_membres(sender, instance, **kwargs):
+    """Un participant a été ajouté ou retiré : le cache des membres est périmé"""
+    invalider_membres(instance.conversation_id)
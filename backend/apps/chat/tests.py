@@ -1,3 +1,294 @@
-from django.test import TestCase
+import io
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .broker import canal_conversation, get_broker
+from .models import Conversation, Message, MessageArchive, Participant
+from .presence import DUREE_FRAPPE, utilisateurs_en_train_d_ecrire
+from .serializers import ParticipantSerializer
+
+User = get_user_model()
+
+
+class ChatTestCase(TestCase):
+    def setUp(self):
+        """Une conversation de groupe à trois participants"""
+        cache.clear()
+        self.client = APIClient()
+        self.alice, self.bob, self.carol = [
+            User.objects.create_user(username=nom, password='x', role='etudiant')
+            for nom in ('alice', 'bob', 'carol')
+        ]
+        self.conversation = Conversation.objects.create(name='Groupe', type='group', created_by=self.alice)
+        for user in (self.alice, self.bob, self.carol):
+            self.conversation.participants.add(user)
+            Participant.objects.create(conversation=self.conversation, user=user)
+
+    def envoyer(self, user, contenu='Bonjour'):
+        self.client.force_authenticate(user=user)
+        return self.client.post(
+            f'/api/chat/conversations/{self.conversation.id}/messages/',
+            {'content': contenu}
+        )
+
+    def non_lus(self, user):
+        self.client.force_authenticate(user=user)
+        return self.client.get('/api/chat/unread-count/').data['unread_count']
+
+    def test_compteurs_non_lus(self):
+        self.envoyer(self.alice)
+        self.envoyer(self.alice)
+        self.envoyer(self.bob)
+
+        self.assertEqual(self.non_lus(self.alice), 1)
+        self.assertEqual(self.non_lus(self.carol), 3)
+
+        self.client.force_authenticate(user=self.carol)
+        self.client.post(f'/api/chat/conversations/{self.conversation.id}/mark-read/')
+        self.assertEqual(self.non_lus(self.carol), 0)
+        # Répondre vaut lecture de ce qui précède
+        self.assertEqual(self.non_lus(self.bob), 0)
+
+        # Un filigrane déjà plus avancé (lecture concurrente) ne recule pas
+        participant = Participant.objects.filter(conversation=self.conversation, user=self.bob)
+        participant.update(last_read_message_id=10 ** 9)
+        self.envoyer(self.bob)
+        self.assertEqual(participant.get().last_read_message_id, 10 ** 9)
+
+    def test_filigrane_de_lecture(self):
+        self.envoyer(self.alice, 'un')
+        self.envoyer(self.bob, 'deux')
+
+        self.client.force_authenticate(user=self.carol)
+        with self.assertNumQueries(2):
+            # Conversation et dernier message, puis un seul UPDATE du participant
+            self.client.post(f'/api/chat/conversations/{self.conversation.id}/mark-read/')
+
+        messages = self.client.get(f'/api/chat/conversations/{self.conversation.id}/messages/').data['results']
+        self.assertTrue(all(m['is_read'] for m in messages))
+        self.assertEqual(sorted(messages[0]['read_by']), [self.alice.id, self.bob.id, self.carol.id])
+        self.assertEqual(sorted(messages[1]['read_by']), [self.bob.id, self.carol.id])
+
+        self.client.force_authenticate(user=self.alice)
+        messages = self.client.get(f'/api/chat/conversations/{self.conversation.id}/messages/').data['results']
+        self.assertEqual([m['is_read'] for m in messages], [True, False])
+
+    def test_liste_conversations_requetes_constantes(self):
+        """Le nombre de requêtes ne dépend pas du nombre de conversations"""
+        for i in range(5):
+            conversation = Conversation.objects.create(name=f'C{i}', type='group', created_by=self.alice)
+            conversation.participants.add(self.alice, self.bob)
+            Participant.objects.bulk_create([
+                Participant(conversation=conversation, user=self.alice, unread_count=i),
+                Participant(conversation=conversation, user=self.bob),
+            ])
+            conversation.messages.create(sender=self.bob, content=f'message {i}')
+
+        self.client.force_authenticate(user=self.alice)
+        # Comptage, page annotée, participants, filigranes, derniers messages
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/chat/conversations/')
+
+        resultats = {c['name']: c for c in response.data['results']}
+        self.assertEqual(len(resultats), 6)
+        self.assertEqual(resultats['C3']['unread_count'], 3)
+        self.assertEqual(resultats['C3']['last_message']['content'], 'message 3')
+        self.assertEqual(len(resultats['C3']['participants_details']), 2)
+        self.assertIsNone(resultats['Groupe']['last_message'])
+
+    def test_pagination_par_curseur(self):
+        Message.objects.bulk_create([
+            Message(conversation=self.conversation, sender=self.alice, content=str(i)) for i in range(7)
+        ])
+        url = f'/api/chat/conversations/{self.conversation.id}/messages/'
+        self.client.force_authenticate(user=self.bob)
+
+        page = self.client.get(url, {'limit': 3}).data
+        self.assertEqual([m['content'] for m in page['results']], ['4', '5', '6'])
+        self.assertTrue(page['has_more_before'])
+
+        plus_anciens = self.client.get(url, {'limit': 3, 'before': page['before']}).data
+        self.assertEqual([m['content'] for m in plus_anciens['results']], ['1', '2', '3'])
+
+        self.envoyer(self.carol, '7')
+        self.client.force_authenticate(user=self.bob)
+        nouveaux = self.client.get(url, {'after': page['after']}).data
+        self.assertEqual([m['content'] for m in nouveaux['results']], ['7'])
+        self.assertFalse(nouveaux['has_more_after'])
+
+        detail = self.client.get(f'/api/chat/conversations/{self.conversation.id}/').data
+        self.assertEqual(len(detail['messages']), 8)
+        self.assertIsNone(detail['messages_before'])
+
+        self.assertEqual(self.client.get(url, {'before': 'invalide'}).status_code, 400)
+
+    def test_historique_archive(self):
+        ancien = timezone.now() - timedelta(days=400)
+        Message.objects.bulk_create([
+            Message(conversation=self.conversation, sender=self.alice, content=str(i)) for i in range(7)
+        ])
+        anciens = Message.objects.order_by('id').values_list('id', flat=True)[:5]
+        Message.objects.filter(id__in=list(anciens)).update(created_at=ancien)
+
+        call_command('archiver_messages', '--jours=30', '--taille-lot=2', stdout=io.StringIO())
+        self.assertEqual(Message.objects.count(), 2)
+        self.assertEqual(MessageArchive.objects.count(), 5)
+
+        # L'historique archivé se lit par les mêmes curseurs que la table chaude
+        url = f'/api/chat/conversations/{self.conversation.id}/messages/'
+        self.client.force_authenticate(user=self.bob)
+        page = self.client.get(url, {'limit': 3}).data
+        self.assertEqual([m['content'] for m in page['results']], ['4', '5', '6'])
+        plus_anciens = self.client.get(url, {'limit': 3, 'before': page['before']}).data
+        self.assertEqual([m['content'] for m in plus_anciens['results']], ['1', '2', '3'])
+        self.assertTrue(plus_anciens['has_more_before'])
+        # Rattrapage à cheval sur l'archive et la table chaude
+        suite = self.client.get(url, {'limit': 3, 'after': plus_anciens['before']}).data
+        self.assertEqual([m['content'] for m in suite['results']], ['2', '3', '4'])
+        self.assertTrue(suite['has_more_after'])
+
+        # Curseur encore dans la table chaude : l'archive n'est pas lue
+        with CaptureQueriesContext(connection) as requetes:
+            nouveaux = self.client.get(url, {'after': page['after']}).data
+        self.assertEqual(nouveaux['results'], [])
+        self.assertFalse(any('chat_message_archive' in q['sql'] for q in requetes.captured_queries))
+
+        detail = self.client.get(f'/api/chat/conversations/{self.conversation.id}/').data
+        self.assertEqual(len(detail['messages']), 7)
+
+        # Conversation entièrement archivée : le dernier message vient de l'archive
+        call_command('archiver_messages', '--jours=0', stdout=io.StringIO())
+        conversations = self.client.get('/api/chat/conversations/').data['results']
+        self.assertEqual(conversations[0]['last_message']['content'], '6')
+
+    def test_flux_evenements(self):
+        """Long-polling : un message envoyé dans une conversation réveille ses participants"""
+        def envoyer_plus_tard():
+            time.sleep(0.2)
+            get_broker().publier(canal_conversation(self.conversation.id), {'type': 'typing'})
+
+        self.client.force_authenticate(user=self.bob)
+        threading.Thread(target=envoyer_plus_tard).start()
+        response = self.client.get('/api/chat/stream/', {'mode': 'poll', 'timeout': 5})
+        self.assertEqual(response.data['events'], [{'type': 'typing'}])
+
+        # Attente négative ramenée à zéro ; valeurs non finies refusées
+        response = self.client.get('/api/chat/stream/', {'mode': 'poll', 'timeout': -5})
+        self.assertEqual((response.status_code, response.data['events']), (200, []))
+        for invalide in ('nan', 'inf', 'abc'):
+            response = self.client.get('/api/chat/stream/', {'mode': 'poll', 'timeout': invalide})
+            self.assertEqual(response.status_code, 400)
+
+        with get_broker().abonner([canal_conversation(self.conversation.id)]) as abonnement:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.envoyer(self.alice, 'Salut')
+            # Publication après validation de la transaction
+            evenement, = abonnement.attendre(0)
+        self.assertEqual((evenement['type'], evenement['data']['content']), ('message', 'Salut'))
+
+        self.client.force_authenticate(user=self.bob)
+        response = self.client.get('/api/chat/stream/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(next(response.streaming_content), b'retry: 1000\n\n')
+        response.close()
+
+    def test_ticket_du_flux(self):
+        """EventSource, sans en-tête Authorization, ouvre le flux avec un ticket signé"""
+        self.client.force_authenticate(user=self.bob)
+        ticket = self.client.post('/api/chat/stream/ticket/').data['ticket']
+
+        anonyme = APIClient()
+        self.assertEqual(anonyme.get('/api/chat/stream/', {'mode': 'poll', 'timeout': 0}).status_code, 401)
+        self.assertEqual(
+            anonyme.get('/api/chat/stream/', {'mode': 'poll', 'timeout': 0, 'ticket': ticket + 'x'}).status_code, 401
+        )
+        response = anonyme.get('/api/chat/stream/', {'ticket': ticket}, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        with override_settings(CHAT_TICKET_DUREE=-1):
+            self.assertEqual(anonyme.get('/api/chat/stream/', {'ticket': ticket}).status_code, 401)
+        # Le ticket ne vaut que pour le flux
+        self.assertEqual(anonyme.get('/api/chat/conversations/', {'ticket': ticket}).status_code, 401)
+
+    def test_statut_de_frappe_ephemere(self):
+        url = f'/api/chat/conversations/{self.conversation.id}/typing/'
+        self.client.force_authenticate(user=self.alice)
+        with self.assertNumQueries(1):
+            # Vérification d'appartenance uniquement, aucune écriture en base
+            self.client.post(url, {'is_typing': True})
+        self.client.force_authenticate(user=self.bob)
+        self.client.post(url, {'is_typing': True})
+        self.assertEqual(self.client.get(url).data['typing'], [self.alice.id, self.bob.id])
+
+        self.client.post(url, {'is_typing': False})
+        self.assertEqual(self.client.get(url).data['typing'], [self.alice.id])
+
+        # Expiration sans nouvelle frappe (horloge du cache avancée)
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=time.time() + DUREE_FRAPPE + 1):
+            self.assertEqual(utilisateurs_en_train_d_ecrire(self.conversation.id), [])
+
+        # Participants sérialisés : une seule lecture du cache pour la conversation
+        context = {}
+        participants = Participant.objects.filter(conversation=self.conversation).select_related('user')
+        with mock.patch('apps.chat.serializers.utilisateurs_en_train_d_ecrire', return_value=[self.alice.id]) as lecture:
+            donnees = ParticipantSerializer(participants, many=True, context=context).data
+        self.assertEqual(lecture.call_count, 1)
+        self.assertEqual([p['user'] for p in donnees if p['is_typing']], [self.alice.id])
+
+    def test_creation_groupee_et_appartenance(self):
+        self.client.force_authenticate(user=self.alice)
+        response = self.client.post('/api/chat/conversations/create/', {
+            'name': 'Projet', 'type': 'group', 'participant_ids': [self.bob.id, 9999]
+        }, format='json')
+        conversation_id = response.data['id']
+        self.assertEqual(
+            set(Participant.objects.filter(conversation_id=conversation_id).values_list('user_id', flat=True)),
+            {self.alice.id, self.bob.id}
+        )
+
+        url = f'/api/chat/conversations/{conversation_id}/messages/'
+        self.client.force_authenticate(user=self.carol)
+        self.assertEqual(self.client.post(url, {'content': 'intrus'}).status_code, 403)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        # Ajout d'un membre : le cache est invalidé par le signal
+        Participant.objects.create(conversation_id=conversation_id, user=self.carol)
+        self.assertEqual(self.client.post(url, {'content': 'bienvenue'}).status_code, 201)
+
+        # Appartenance en cache : insertion, compteurs, date de conversation
+        with self.assertNumQueries(3):
+            self.client.post(url, {'content': 'encore'})
+
+    def test_recherche_messages(self):
+        autre = Conversation.objects.create(name='Privée', created_by=self.carol)
+        Participant.objects.create(conversation=autre, user=self.carol)
+        Message.objects.bulk_create([
+            Message(conversation=self.conversation, sender=self.alice, content='Révision de maths demain'),
+            Message(conversation=self.conversation, sender=self.bob, content='Les maths, les maths, encore les maths <b>'),
+            Message(conversation=self.conversation, sender=self.bob, content='Rien à voir'),
+            Message(conversation=autre, sender=self.carol, content='maths secrètes'),
+        ])
+
+        self.client.force_authenticate(user=self.alice)
+        data = self.client.get('/api/chat/messages/search/', {'q': 'math'}).data
+        self.assertEqual(len(data['results']), 2)
+        # Le plus pertinent d'abord, extrait échappé et surligné
+        self.assertTrue(data['results'][0]['content'].startswith('Les maths'))
+        self.assertIn('<mark>maths</mark>', data['results'][0]['snippet'])
+        self.assertIn('&lt;b&gt;', data['results'][0]['snippet'])
+
+        data = self.client.get('/api/chat/messages/search/', {'q': 'maths demain', 'limit': 1}).data
+        self.assertEqual([m['content'] for m in data['results']], ['Révision de maths demain'])
+        self.assertFalse(data['has_more'])
+
+        self.assertEqual(self.client.get('/api/chat/messages/search/').status_code, 400)
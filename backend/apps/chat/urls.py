@@ -9,4 +9,7 @@ urlpatterns = [
     path('conversations/<int:conversation_id>/mark-read/', views.MarkAsReadView.as_view(), name='mark-read'),
     path('conversations/<int:conversation_id>/typing/', views.TypingStatusView.as_view(), name='typing-status'),
     path('unread-count/', views.UnreadCountView.as_view(), name='unread-count'),
+    path('stream/', views.ChatStreamView.as_view(), name='chat-stream'),
+    path('stream/ticket/', views.ChatStreamTicketView.as_view(), name='chat-stream-ticket'),
+    path('messages/search/', views.MessageSearchView.as_view(), name='message-search'),
 ]
\ No newline at end of file
@@ -1,10 +1,34 @@
-from rest_framework import generics, permissions, status
+import json
+import math
+import time
+
+from rest_framework import generics, permissions, serializers, status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.renderers import BaseRenderer
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
-from django.db.models import Q
+from django.db.models import (
+    BigIntegerField, Case, F, OuterRef, PositiveIntegerField, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from .models import Conversation, Message, Participant
-from .serializers import ConversationSerializer, ConversationDetailSerializer, MessageSerializer
+from apps.accounts.models import User
+from apps.fichiers.views import HachageUploadMixin
+from .authentication import TicketFluxAuthentication, duree_ticket, emettre_ticket
+from .broker import canal_conversation, get_broker, publier
+from .membres import est_membre, invalider_membres
+from .models import Conversation, Message, MessageArchive, Participant
+from .pagination import MessageCursorPagination
+from .presence import definir_frappe, utilisateurs_en_train_d_ecrire
+from .recherche import extraire_termes, rechercher_messages
+from .serializers import (
+    ConversationSerializer, ConversationDetailSerializer, MessageSerializer, ResultatRechercheSerializer,
+    precharger_conversations, precharger_filigranes
+)
 
 
 class ConversationListView(generics.ListAPIView):
@@ -13,15 +37,36 @@ class ConversationListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
+        user = self.request.user
+        dernier_message = Message.objects.filter(conversation=OuterRef('pk')).order_by('-id')
+        # Conversation entièrement archivée : dernier message de l'archive (même espace d'ids)
+        dernier_archive = MessageArchive.objects.filter(conversation=OuterRef('pk')).order_by('-id')
+        compteur = Participant.objects.filter(conversation=OuterRef('pk'), user=user)
+
         return Conversation.objects.filter(
-            participants=self.request.user
-        ).order_by('-updated_at')
+            participants=user
+        ).annotate(
+            last_message_id=Coalesce(
+                Subquery(dernier_message.values('id')[:1]),
+                Subquery(dernier_archive.values('id')[:1]),
+            ),
+            unread_count=Subquery(compteur.values('unread_count')[:1]),
+        ).prefetch_related('participants').order_by('-updated_at')
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
 
+    def get_serializer(self, *args, **kwargs):
+        # Page courante : derniers messages et filigranes chargés en bloc
+        if kwargs.get('many') and args:
+            conversations = list(args[0])
+            kwargs['context'] = self.get_serializer_context()
+            precharger_conversations(conversations, kwargs['context'])
+            args = (conversations,)
+        return super().get_serializer(*args, **kwargs)
+
 
 class ConversationCreateView(generics.CreateAPIView):
     """Créer une nouvelle conversation"""
@@ -29,20 +74,25 @@ class ConversationCreateView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
-        conversation = serializer.save(created_by=self.request.user)
-        conversation.participants.add(self.request.user)
-
-        # Ajouter les autres participants
+        # Participants demandés qui existent, plus le créateur (une requête)
         participant_ids = self.request.data.get('participant_ids', [])
-        for pid in participant_ids:
-            conversation.participants.add(pid)
-
-        # Créer les participants dans la table Participant
-        for user in conversation.participants.all():
-            Participant.objects.get_or_create(
-                conversation=conversation,
-                user=user
+        user_ids = {self.request.user.id}
+        user_ids.update(
+            User.objects.filter(id__in=[pid for pid in participant_ids if str(pid).isdigit()])
+            .values_list('id', flat=True)
+        )
+
+        # Insertions groupées dans une seule transaction
+        with transaction.atomic():
+            conversation = serializer.save(created_by=self.request.user)
+            conversation.participants.add(*user_ids)
+            Participant.objects.bulk_create(
+                [Participant(conversation=conversation, user_id=user_id)
+                 for user_id in conversation.participants.values_list('id', flat=True)],
+                ignore_conflicts=True
             )
+            # bulk_create n'émet pas de signaux
+            transaction.on_commit(lambda: invalider_membres(conversation.id))
 
 
 class ConversationDetailView(generics.RetrieveAPIView):
@@ -59,34 +109,67 @@ class ConversationDetailView(generics.RetrieveAPIView):
         return context
 
 
-class MessageListCreateView(generics.ListCreateAPIView):
-    """Liste et création des messages d'une conversation"""
+class MessageListCreateView(HachageUploadMixin, generics.ListCreateAPIView):
+    """
+    Liste et création des messages d'une conversation.
+
+    Pagination par curseur : ?before= pour remonter l'historique, ?after=
+    pour récupérer les nouveaux messages.
+    """
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MessageCursorPagination
+
+    def verifier_membre(self):
+        # Appartenance lue dans le cache des membres : O(1) quelle que soit la taille du groupe
+        if not est_membre(self.kwargs['conversation_id'], self.request.user.id):
+            raise PermissionDenied("Vous ne participez pas à cette conversation")
 
     def get_queryset(self):
+        self.verifier_membre()
         conversation_id = self.kwargs['conversation_id']
-        return Message.objects.filter(conversation_id=conversation_id).order_by('created_at')
+        return Message.objects.filter(conversation_id=conversation_id).select_related('sender')
+
+    def get_archives(self):
+        """Messages archivés par la rétention, lus quand une page remonte au-delà de la table chaude"""
+        return MessageArchive.objects.filter(
+            conversation_id=self.kwargs['conversation_id']
+        ).select_related('sender')
 
     def perform_create(self, serializer):
+        self.verifier_membre()
         conversation_id = self.kwargs['conversation_id']
-        conversation = Conversation.objects.get(id=conversation_id)
-
-        # Vérifier que l'utilisateur participe à la conversation
-        if self.request.user not in conversation.participants.all():
-            raise PermissionError("Vous ne participez pas à cette conversation")
 
         message = serializer.save(
-            conversation=conversation,
+            conversation_id=conversation_id,
             sender=self.request.user
         )
 
-        # Marquer comme lu pour l'expéditeur
-        message.read_by.add(self.request.user)
+        # En une requête : l'expéditeur a tout lu jusqu'à son message (répondre
+        # vaut lecture), les autres participants ont un non-lu de plus. Greatest :
+        # un envoi concurrent plus ancien ne fait jamais reculer le filigrane
+        Participant.objects.filter(conversation_id=conversation_id).update(
+            last_read_message_id=Case(
+                When(user=self.request.user, then=Greatest(
+                    F('last_read_message_id'), Value(message.id), output_field=BigIntegerField()
+                )),
+                default=F('last_read_message_id'),
+                output_field=BigIntegerField(),
+            ),
+            unread_count=Case(
+                When(user=self.request.user, then=Value(0)),
+                default=F('unread_count') + 1,
+                output_field=PositiveIntegerField(),
+            ),
+        )
 
         # Mettre à jour la date de la conversation
-        conversation.updated_at = timezone.now()
-        conversation.save()
+        Conversation.objects.filter(id=conversation_id).update(updated_at=timezone.now())
+
+        # Message tout neuf : seul l'expéditeur l'a lu, inutile de relire les filigranes
+        serializer.context.setdefault('filigranes', {})[conversation_id] = {self.request.user.id: message.id}
+
+        publier(conversation_id, 'message', serializer.data)
 
 
 class MarkAsReadView(APIView):
@@ -94,8 +177,14 @@ class MarkAsReadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, conversation_id):
+        # Dernier message lu avec la conversation : sert au filigrane et à sa publication
+        dernier_message = Message.objects.filter(
+            conversation=OuterRef('pk')
+        ).order_by('-id').values('id')[:1]
         try:
-            conversation = Conversation.objects.get(
+            conversation = Conversation.objects.annotate(
+                dernier_message_id=Coalesce(Subquery(dernier_message), Value(0))
+            ).get(
                 id=conversation_id,
                 participants=request.user
             )
@@ -105,46 +194,52 @@ class MarkAsReadView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Marquer tous les messages non lus comme lus
-        messages = Message.objects.filter(
-            conversation=conversation
-        ).exclude(
-            sender=request.user
-        ).exclude(
-            read_by=request.user
-        )
-
-        for message in messages:
-            message.read_by.add(request.user)
-
-        # Mettre à jour last_read pour le participant
+        # Avancer le filigrane jusqu'au dernier message (une seule requête UPDATE)
         Participant.objects.filter(
             conversation=conversation,
             user=request.user
-        ).update(last_read=timezone.now())
+        ).update(
+            last_read=timezone.now(),
+            last_read_message_id=Greatest(
+                F('last_read_message_id'),
+                Value(conversation.dernier_message_id),
+                output_field=BigIntegerField()
+            ),
+            unread_count=0
+        )
+
+        # Filigrane au moins égal au dernier message : les clients gardent le maximum reçu
+        publier(conversation.id, 'read', {
+            'user': request.user.id, 'last_read_message_id': conversation.dernier_message_id
+        })
 
         return Response({'message': 'Messages marqués comme lus'})
 
 
 class TypingStatusView(APIView):
-    """Mettre à jour le statut de frappe"""
+    """Statut de frappe : éphémère, stocké dans le cache avec expiration"""
     permission_classes = [permissions.IsAuthenticated]
 
-    def post(self, request, conversation_id):
-        try:
-            participant = Participant.objects.get(
-                conversation_id=conversation_id,
-                user=request.user
+    def get(self, request, conversation_id):
+        if not est_membre(conversation_id, request.user.id):
+            return Response(
+                {'error': 'Participant non trouvé'},
+                status=status.HTTP_404_NOT_FOUND
             )
-        except Participant.DoesNotExist:
+
+        return Response({'typing': utilisateurs_en_train_d_ecrire(conversation_id)})
+
+    def post(self, request, conversation_id):
+        if not est_membre(conversation_id, request.user.id):
             return Response(
                 {'error': 'Participant non trouvé'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        is_typing = request.data.get('is_typing', False)
-        participant.is_typing = is_typing
-        participant.save()
+        is_typing = request.data.get('is_typing', False) in serializers.BooleanField.TRUE_VALUES
+        definir_frappe(conversation_id, request.user.id, is_typing)
+
+        publier(conversation_id, 'typing', {'user': request.user.id, 'is_typing': is_typing})
 
         return Response({'status': 'ok'})
 
@@ -154,14 +249,128 @@ class UnreadCountView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        conversations = Conversation.objects.filter(participants=request.user)
-        total_unread = 0
+        # Somme des compteurs par participant : une requête indexée sur (user, unread_count)
+        total_unread = Participant.objects.filter(
+            user=request.user,
+            unread_count__gt=0
+        ).aggregate(total=Sum('unread_count'))['total'] or 0
+
+        return Response({'unread_count': total_unread})
+
 
-        for conv in conversations:
-            unread = conv.messages.filter(
-                ~Q(read_by=request.user),
-                ~Q(sender=request.user)
-            ).count()
-            total_unread += unread
+class EventStreamRenderer(BaseRenderer):
+    """Accepte Accept: text/event-stream (erreurs rendues en JSON dans le flux)"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder)
+
+
+class ChatStreamView(APIView):
+    """
+    Flux des événements (messages, lectures, frappe) des conversations de l'utilisateur.
+
+    Server-Sent Events par défaut ; ?mode=poll pour du long-polling JSON
+    (?timeout= en secondes). Le flux SSE se termine après `duree_flux`
+    secondes et le client se reconnecte, pour ne pas monopoliser un worker.
+    EventSource s'authentifie par ?ticket= (ChatStreamTicketView). Chaque
+    flux ouvert occupe un thread : le serveur tourne avec des workers gthread.
+    """
+    authentication_classes = [TicketFluxAuthentication] + api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [EventStreamRenderer]
+    duree_flux = 55
+    intervalle_ping = 15
+    attente_max = 25
+
+    def get(self, request):
+        try:
+            attente = float(request.query_params.get('timeout', self.attente_max))
+        except ValueError:
+            attente = math.nan
+        if not math.isfinite(attente):
+            return Response(
+                {'error': 'Le paramètre timeout doit être un nombre'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        attente = max(0.0, min(attente, self.attente_max))
+
+        conversation_ids = Participant.objects.filter(
+            user=request.user
+        ).values_list('conversation_id', flat=True)
+        abonnement = get_broker().abonner([canal_conversation(c) for c in conversation_ids])
+
+        if request.query_params.get('mode') == 'poll':
+            with abonnement:
+                return Response({'events': abonnement.attendre(attente)})
+
+        response = StreamingHttpResponse(self._flux(abonnement), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # pas de mise en tampon par nginx
+        return response
+
+    def _flux(self, abonnement):
+        fin = time.monotonic() + self.duree_flux
+        try:
+            yield 'retry: 1000\n\n'
+            while True:
+                reste = fin - time.monotonic()
+                if reste <= 0:
+                    return
+                evenements = abonnement.attendre(min(self.intervalle_ping, reste))
+                if not evenements:
+                    yield ': ping\n\n'
+                for evenement in evenements:
+                    donnees = json.dumps(evenement, cls=DjangoJSONEncoder)
+                    yield f"event: {evenement['type']}\ndata: {donnees}\n\n"
+        finally:
+            abonnement.fermer()
+
+
+class ChatStreamTicketView(APIView):
+    """Ticket d'ouverture du flux d'événements, pour EventSource (apps.chat.authentication)"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        return Response({'ticket': emettre_ticket(request.user), 'expires_in': duree_ticket()})
+
+
+class MessageSearchView(APIView):
+    """
+    Recherche plein texte dans les conversations de l'utilisateur.
+
+    ?q= (requis), ?page= et ?limit= ; résultats classés par pertinence avec
+    un extrait où les termes sont entourés de <mark>.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    limite_max = 50
+
+    def get(self, request):
+        requete = request.query_params.get('q', '').strip()
+        termes = extraire_termes(requete)
+        if not termes:
+            return Response(
+                {'error': 'Le paramètre q est requis'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            limite = max(1, min(int(request.query_params.get('limit', 20)), self.limite_max))
+        except ValueError:
+            return Response(
+                {'error': 'page et limit doivent être des entiers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        return Response({'unread_count': total_unread})
\ No newline at end of file
+        messages, plus = rechercher_messages(request.user, requete, limite=limite, decalage=(page - 1) * limite)
+
+        context = {'request': request, 'termes': termes}
+        precharger_filigranes({message.conversation_id for message in messages}, context)
+        serializer = ResultatRechercheSerializer(messages, many=True, context=context)
+        return Response({
+            'query': requete,
+            'page': page,
+            'has_more': plus,
+            'results': serializer.data,
+        })
@@ -0,0 +1,64 @@
+"""
+Liens de téléchargement signés.
+
+Un navigateur n'envoie pas l'en-tête Authorization quand il suit un lien
+(window.open, href) : les URL de fichiers exposées par l'API portent donc une
+signature et une expiration (?exp=), vérifiées par BlobView sans autre
+authentification. L'expiration est arrondie à une tranche de BLOBS_URL_DUREE
+secondes : l'URL d'un fichier reste identique pendant toute la tranche, et le
+cache du navigateur (indexé par URL) la réutilise. Un lien reste valable
+entre une et deux durées.
+"""
+import time
+from urllib.parse import urlencode, urlparse
+
+from django.conf import settings
+from django.core.signing import BadSignature, Signer
+from django.urls import Resolver404, resolve, reverse
+
+SEL = 'apps.fichiers.liens'
+
+
+def _signataire():
+    return Signer(salt=SEL)
+
+
+def duree():
+    return getattr(settings, 'BLOBS_URL_DUREE', 24 * 3600)
+
+
+def expiration(maintenant=None):
+    """Fin de validité des liens émis maintenant : fin de la tranche suivante"""
+    maintenant = time.time() if maintenant is None else maintenant
+    return (int(maintenant) // duree() + 2) * duree()
+
+
+def url_blob(sha256, request=None, nom=None):
+    """URL signée d'un blob, stable sur une tranche de BLOBS_URL_DUREE, absolue quand la requête est connue"""
+    exp = expiration()
+    parametres = {
+        'exp': exp,
+        'signature': _signataire().sign(f'{sha256}:{exp}').rsplit(':', 1)[1],
+    }
+    if nom:
+        parametres['name'] = nom
+    chemin = f"{reverse('blob-detail', args=[sha256])}?{urlencode(parametres)}"
+    return request.build_absolute_uri(chemin) if request is not None else chemin
+
+
+def signature_valide(sha256, signature, exp):
+    try:
+        exp = int(exp)
+        _signataire().unsign(f'{sha256}:{exp}:{signature}')
+    except (BadSignature, TypeError, ValueError):
+        return False
+    return exp > time.time()
+
+
+def sha256_de_url(url):
+    """SHA-256 désigné par une URL de blob (signée ou non), sinon None"""
+    try:
+        correspondance = resolve(urlparse(url or '').path)
+    except Resolver404:
+        return None
+    return correspondance.kwargs.get('sha256') if correspondance.url_name == 'blob-detail' else None
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from apps.chat.models import Message
+from apps.fichiers.stockage import enregistrer
+
+
+class Command(BaseCommand):
+    help = "Transfère les pièces jointes de chat (chat_files/) vers le stockage par contenu"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--supprimer', action='store_true', help="Supprimer l'ancien fichier après transfert")
+
+    def handle(self, *args, **options):
+        transferes = doublons = manquants = 0
+        messages = Message.objects.filter(blob__isnull=True).exclude(file='').exclude(file__isnull=True)
+
+        for message in messages.only('id', 'file').iterator(chunk_size=500):
+            try:
+                with message.file.open('rb') as fichier:
+                    blob = enregistrer(fichier)
+            except FileNotFoundError:
+                manquants += 1
+                continue
+
+            # Contenu déjà référencé par un autre message : l'ancienne copie était un doublon
+            deja_connu = Message.objects.filter(blob=blob).exists()
+            Message.objects.filter(id=message.id).update(blob=blob)
+            if options['supprimer']:
+                message.file.delete(save=False)
+                Message.objects.filter(id=message.id).update(file='')
+            transferes += 1
+            doublons += deja_connu
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{transferes} pièces jointes transférées ({doublons} contenus déjà stockés), "
+            f"{manquants} fichiers introuvables"
+        ))
@@ -0,0 +1,20 @@
+from django.db import models
+from django.urls import reverse
+
+
+class Blob(models.Model):
+    """Contenu de fichier stocké une seule fois, identifié par son SHA-256"""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField()
+    content_type = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'fichiers_blob'
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} octets)"
+
+    @property
+    def url(self):
+        return reverse('blob-detail', args=[self.sha256])
@@ -0,0 +1,15 @@
+from rest_framework import serializers
+from .liens import url_blob
+from .models import Blob
+
+
+class BlobSerializer(serializers.ModelSerializer):
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Blob
+        fields = ['sha256', 'size', 'content_type', 'url', 'created_at']
+        read_only_fields = fields
+
+    def get_url(self, obj):
+        return url_blob(obj.sha256, self.context.get('request'))
@@ -0,0 +1,127 @@
+"""
+Stockage adressé par contenu : chaque fichier est rangé sous son SHA-256.
+
+Le hachage est calculé pendant la réception de l'upload (HachageUploadHandler)
+ou, à défaut, pendant la copie par morceaux vers un fichier temporaire. Le
+fichier est ensuite renommé à son emplacement définitif s'il n'y est pas
+déjà : un contenu envoyé plusieurs fois n'occupe le disque qu'une fois.
+"""
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from .models import Blob
+
+TAILLE_MORCEAU = 64 * 1024
+
+
+class HachageUploadHandler(TemporaryFileUploadHandler):
+    """Upload écrit sur disque par morceaux, haché en SHA-256 au fil de l'eau"""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hachage = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hachage.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        fichier = super().file_complete(file_size)
+        fichier.sha256 = self.hachage.hexdigest()
+        return fichier
+
+
+def dossier_blobs():
+    return Path(getattr(settings, 'BLOBS_ROOT', None) or Path(settings.MEDIA_ROOT) / 'blobs')
+
+
+def chemin_blob(sha256):
+    """Emplacement d'un blob, réparti sur deux niveaux de sous-dossiers"""
+    return dossier_blobs() / sha256[:2] / sha256[2:4] / sha256
+
+
+def _morceaux(fichier):
+    if hasattr(fichier, 'chunks'):
+        yield from fichier.chunks(TAILLE_MORCEAU)
+        return
+    while True:
+        morceau = fichier.read(TAILLE_MORCEAU)
+        if not morceau:
+            return
+        yield morceau
+
+
+def _ecrire(fichier):
+    """Copie le fichier par morceaux dans le dossier des blobs ; retourne (temporaire, sha256, taille)"""
+    temporaires = dossier_blobs() / 'tmp'
+    temporaires.mkdir(parents=True, exist_ok=True)
+    hachage = hashlib.sha256()
+    taille = 0
+    descripteur, chemin = tempfile.mkstemp(dir=temporaires)
+    try:
+        with os.fdopen(descripteur, 'wb') as sortie:
+            for morceau in _morceaux(fichier):
+                hachage.update(morceau)
+                sortie.write(morceau)
+                taille += len(morceau)
+    except BaseException:
+        os.unlink(chemin)
+        raise
+    return chemin, hachage.hexdigest(), taille
+
+
+def _deplacer(source, destination):
+    """Renomme atomiquement source en destination, en copiant d'abord si le disque diffère"""
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(source, destination)
+    except OSError:
+        temporaires = dossier_blobs() / 'tmp'
+        temporaires.mkdir(parents=True, exist_ok=True)
+        descripteur, copie = tempfile.mkstemp(dir=temporaires)
+        os.close(descripteur)
+        shutil.copyfile(source, copie)
+        os.replace(copie, destination)
+
+
+def enregistrer(fichier, content_type=''):
+    """
+    Stocke un fichier (upload Django ou objet fichier) et retourne son Blob.
+
+    Un contenu déjà présent n'est pas réécrit : seul le Blob existant est
+    retourné.
+    """
+    sha256 = getattr(fichier, 'sha256', None)
+    if sha256 and hasattr(fichier, 'temporary_file_path'):
+        # Déjà haché à la réception : le fichier temporaire de l'upload,
+        # supprimé par Django à la fin de la requête, est déplacé tel quel
+        source, taille, temporaire = fichier.temporary_file_path(), fichier.size, False
+    else:
+        source, sha256, taille = _ecrire(fichier)
+        temporaire = True
+
+    destination = chemin_blob(sha256)
+    if not destination.exists():
+        # Deux uploads simultanés du même contenu écrivent le même fichier final
+        _deplacer(source, destination)
+    elif temporaire:
+        os.unlink(source)
+
+    nom = getattr(fichier, 'name', '') or ''
+    content_type = (
+        content_type
+        or getattr(fichier, 'content_type', None)
+        or mimetypes.guess_type(nom)[0]
+        or 'application/octet-stream'
+    )
+    blob, _ = Blob.objects.get_or_create(
+        sha256=sha256,
+        defaults={'size': taille, 'content_type': content_type[:100]},
+    )
+    return blob
@@ -0,0 +1,150 @@
+import hashlib
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from apps.academic.models import Administrateur, Matiere, Ressource
+from apps.chat.models import Conversation, Message, Participant
+from .liens import expiration
+from .models import Blob
+from .stockage import chemin_blob, dossier_blobs
+
+User = get_user_model()
+
+CONTENU = b'%PDF-1.4 cours de mathematiques ' * 100
+
+
+class BlobTestCase(TestCase):
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        reglages = override_settings(BLOBS_ROOT=dossier.name)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='alice', password='x', role='etudiant')
+        self.client.force_authenticate(user=self.user)
+        self.sha256 = hashlib.sha256(CONTENU).hexdigest()
+
+    def envoyer(self, nom='cours.pdf', contenu=CONTENU, content_type='application/pdf'):
+        return self.client.post(
+            '/api/fichiers/',
+            {'file': SimpleUploadedFile(nom, contenu, content_type=content_type)},
+            format='multipart'
+        )
+
+    def test_contenu_stocke_une_fois(self):
+        premier = self.envoyer()
+        second = self.envoyer('copie.pdf')
+
+        self.assertEqual(premier.status_code, 201)
+        self.assertEqual(premier.data['sha256'], self.sha256)
+        self.assertEqual(second.data['sha256'], self.sha256)
+        self.assertEqual(Blob.objects.count(), 1)
+        self.assertEqual(chemin_blob(self.sha256).read_bytes(), CONTENU)
+        fichiers = [chemin for chemin in dossier_blobs().rglob('*') if chemin.is_file()]
+        self.assertEqual(len(fichiers), 1)
+
+    def test_etag_et_plages(self):
+        url = self.envoyer().data['url']
+
+        # Lien signé et absolu : suivi par le navigateur sans en-tête Authorization
+        self.assertTrue(url.startswith(f'http://testserver/api/fichiers/{self.sha256}/?exp='))
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENU)
+        self.assertEqual(response['ETag'], f'"{self.sha256}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertNotIn('attachment', response.get('Content-Disposition', ''))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{self.sha256}"')
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=5-14')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), CONTENU[5:15])
+        self.assertEqual(response['Content-Range'], f'bytes 5-14/{len(CONTENU)}')
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), CONTENU[-4:])
+
+        response = self.client.get(url, HTTP_RANGE=f'bytes={len(CONTENU)}-')
+        self.assertEqual(response.status_code, 416)
+
+        # If-Range périmé : le fichier entier est renvoyé
+        response = self.client.get(url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"autre"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_lien_stable_puis_expire(self):
+        """Même URL sur toute une tranche (cache navigateur réutilisé), refusée après expiration"""
+        url = self.envoyer().data['url']
+        self.assertEqual(self.envoyer('copie.pdf').data['url'], url)
+        exp = expiration()
+        self.assertIn(f'exp={exp}', url)
+
+        self.assertEqual(APIClient().get(url.replace(f'exp={exp}', f'exp={exp + 1}')).status_code, 403)
+        with mock.patch('apps.fichiers.liens.time.time', return_value=exp):
+            self.assertEqual(APIClient().get(url).status_code, 403)
+        self.assertEqual(APIClient().get(url).status_code, 200)
+
+    def test_acces(self):
+        chemin = f'/api/fichiers/{self.sha256}/'
+        self.envoyer()
+        self.assertEqual(self.client.get(chemin, {'signature': 'falsifiee'}).status_code, 403)
+        self.assertEqual(APIClient().get(chemin).status_code, 401)
+        # Fichier lié à aucun contenu visible par l'utilisateur
+        self.assertEqual(self.client.get(chemin).status_code, 404)
+
+        # Contenu actif servi en téléchargement, jamais affiché
+        url = self.envoyer('page.html', b'<script>alert(1)</script>', 'text/html').data['url']
+        self.assertTrue(self.client.get(url)['Content-Disposition'].startswith('attachment'))
+
+    def test_piece_jointe_message(self):
+        bob = User.objects.create_user(username='bob', password='x', role='etudiant')
+        conversation = Conversation.objects.create(type='private', created_by=self.user)
+        for user in (self.user, bob):
+            conversation.participants.add(user)
+            Participant.objects.create(conversation=conversation, user=user)
+
+        for _ in range(2):
+            response = self.client.post(
+                f'/api/chat/conversations/{conversation.id}/messages/',
+                {'content': 'Le cours', 'file': SimpleUploadedFile('cours.pdf', CONTENU)},
+                format='multipart'
+            )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.data['file_name'], 'cours.pdf')
+            self.assertTrue(response.data['file_url'].startswith(f'http://testserver/api/fichiers/{self.sha256}/?'))
+
+        self.assertEqual(Message.objects.filter(blob_id=self.sha256).count(), 2)
+        self.assertEqual(Blob.objects.count(), 1)
+
+        # Avec un jeton : seuls les participants de la conversation y accèdent
+        self.client.force_authenticate(user=bob)
+        self.assertEqual(self.client.get(f'/api/fichiers/{self.sha256}/').status_code, 200)
+        carol = User.objects.create_user(username='carol', password='x', role='etudiant')
+        self.client.force_authenticate(user=carol)
+        self.assertEqual(self.client.get(f'/api/fichiers/{self.sha256}/').status_code, 404)
+
+    def test_ressource(self):
+        admin = Administrateur.objects.create(nom='Admin', prenom='Test', email='admin@test.com', mot_de_passe='x')
+        maths = Matiere.objects.create(nom_matière='Maths', coefficient=4)
+        response = self.client.post('/api/academic/ressources/', {
+            'matiere': maths.pk, 'titre': 'Cours', 'Type_ressource': 'pdf', 'cree_par_admin': admin.pk,
+            'fichier': SimpleUploadedFile('cours.pdf', CONTENU, content_type='application/pdf'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('signature=', response.data['fichier_url'])
+        self.assertEqual(self.client.get(f'/api/fichiers/{self.sha256}/').status_code, 200)
+
+        # Le formulaire renvoie le lien signé reçu : le fichier stocké est conservé
+        ressource = Ressource.objects.get()
+        self.client.patch(
+            f'/api/academic/ressources/{ressource.pk}/', {'fichier_url': response.data['fichier_url']}, format='json'
+        )
+        ressource.refresh_from_db()
+        self.assertEqual((ressource.blob_id, ressource.fichier_url), (self.sha256, f'/api/fichiers/{self.sha256}/'))
@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.BlobUploadView.as_view(), name='blob-upload'),
+    path('<str:sha256>/', views.BlobView.as_view(), name='blob-detail'),
+]
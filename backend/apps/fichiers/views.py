@@ -0,0 +1,168 @@
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from rest_framework import permissions, status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from apps.chat.models import MessageArchive
+from .liens import signature_valide
+from .models import Blob
+from .serializers import BlobSerializer
+from .stockage import TAILLE_MORCEAU, HachageUploadHandler, chemin_blob, enregistrer
+
+PLAGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Types affichés dans le navigateur ; les autres (HTML, SVG, scripts...) sont téléchargés
+AFFICHABLES = {
+    'application/pdf', 'text/plain', 'image/png', 'image/jpeg', 'image/gif', 'image/webp',
+    'audio/mpeg', 'audio/ogg', 'audio/wav', 'video/mp4', 'video/webm', 'video/ogg',
+}
+
+
+def plage_demandee(entete, taille):
+    """
+    Plage (debut, fin) incluse demandée par un en-tête Range.
+
+    None si l'en-tête est absent, invalide ou multi-plages (le fichier entier
+    est alors servi), False si la plage est hors du fichier.
+    """
+    correspondance = PLAGE.match((entete or '').strip())
+    if not correspondance or correspondance.groups() == ('', ''):
+        return None
+    debut, fin = correspondance.groups()
+    if debut == '':
+        # bytes=-N : les N derniers octets
+        suffixe = int(fin)
+        return (max(taille - suffixe, 0), taille - 1) if suffixe and taille else False
+    debut = int(debut)
+    if fin and int(fin) < debut:
+        return None
+    if debut >= taille:
+        return False
+    return debut, (min(int(fin), taille - 1) if fin else taille - 1)
+
+
+def peut_lire(user, blob):
+    """Blob lié à une ressource, un exercice ou un message d'une conversation de l'utilisateur"""
+    return (
+        blob.ressources.exists()
+        or blob.exercices.exists()
+        or blob.messages.filter(conversation__participants=user).exists()
+        or MessageArchive.objects.filter(blob=blob, conversation__participants=user).exists()
+    )
+
+
+class HachageUploadMixin:
+    """Uploads de la vue écrits sur disque et hachés à la réception (les autres vues gardent les handlers par défaut)"""
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers.insert(0, HachageUploadHandler(request))
+        return super().initialize_request(request, *args, **kwargs)
+
+
+def _lire(fichier, longueur):
+    with fichier:
+        while longueur > 0:
+            morceau = fichier.read(min(TAILLE_MORCEAU, longueur))
+            if not morceau:
+                return
+            longueur -= len(morceau)
+            yield morceau
+
+
+class BlobUploadView(HachageUploadMixin, APIView):
+    """Envoi d'un fichier ; un contenu déjà connu n'est pas stocké une seconde fois"""
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        fichier = request.FILES.get('file')
+        if fichier is None:
+            return Response({'error': 'Aucun fichier fourni'}, status=status.HTTP_400_BAD_REQUEST)
+
+        taille_max = getattr(settings, 'BLOBS_TAILLE_MAX', 100 * 1024 * 1024)
+        if fichier.size > taille_max:
+            return Response(
+                {'error': f'Fichier trop volumineux (maximum {taille_max // (1024 * 1024)}MB)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        blob = enregistrer(fichier)
+        return Response(BlobSerializer(blob, context={'request': request}).data, status=status.HTTP_201_CREATED)
+
+
+class BlobView(APIView):
+    """
+    Téléchargement d'un fichier par son SHA-256.
+
+    Accès par lien signé (?exp=&signature=, apps.fichiers.liens) ou, avec un
+    jeton, si l'utilisateur voit un message, une ressource ou un exercice lié
+    au fichier. Le contenu d'une adresse ne change jamais : ETag fort (le
+    hachage) et cache client d'un an. Les requêtes Range à plage unique
+    reçoivent une réponse 206 ; ?name= fixe le nom proposé au téléchargement.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Le fichier est servi quel que soit l'en-tête Accept ; les erreurs restent en JSON
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, sha256):
+        signature = request.query_params.get('signature')
+        if signature and not signature_valide(sha256, signature, request.query_params.get('exp')):
+            return Response({'error': 'Lien expiré ou invalide'}, status=status.HTTP_403_FORBIDDEN)
+        if not signature and not request.user.is_authenticated:
+            self.permission_denied(request)
+
+        blob = Blob.objects.filter(sha256=sha256).first()
+        if blob is None or (not signature and not peut_lire(request.user, blob)):
+            return Response({'error': 'Fichier non trouvé'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            fichier = open(chemin_blob(blob.sha256), 'rb')
+        except FileNotFoundError:
+            return Response({'error': 'Fichier non trouvé'}, status=status.HTTP_404_NOT_FOUND)
+
+        etag = f'"{blob.sha256}"'
+        si_different = request.headers.get('If-None-Match')
+        if si_different and (
+            si_different.strip() == '*'
+            or etag in [valeur.strip().removeprefix('W/') for valeur in si_different.split(',')]
+        ):
+            fichier.close()
+            return self._entetes(HttpResponse(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+        plage = None
+        if request.headers.get('If-Range', etag) == etag:
+            plage = plage_demandee(request.headers.get('Range'), blob.size)
+
+        if plage is False:
+            fichier.close()
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{blob.size}'
+            return self._entetes(response, etag)
+
+        if plage is None:
+            response = FileResponse(fichier, content_type=blob.content_type)
+        else:
+            debut, fin = plage
+            fichier.seek(debut)
+            response = StreamingHttpResponse(
+                _lire(fichier, fin - debut + 1),
+                status=status.HTTP_206_PARTIAL_CONTENT,
+                content_type=blob.content_type,
+            )
+            response['Content-Range'] = f'bytes {debut}-{fin}/{blob.size}'
+            response['Content-Length'] = fin - debut + 1
+
+        nom = request.query_params.get('name')
+        if nom or blob.content_type not in AFFICHABLES:
+            response['Content-Disposition'] = content_disposition_header(True, nom or blob.sha256)
+        return self._entetes(response, etag)
+
+    def _entetes(self, response, etag):
+        response['ETag'] = etag
+        response['Accept-Ranges'] = 'bytes'
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response
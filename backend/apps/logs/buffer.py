@@ -0,0 +1,144 @@
+"""
+Ingestion tamponnée des logs.
+
+Les logs sont mis en file en mémoire et écrits par lots (bulk_create) par un
+thread de fond, lorsque le lot est plein ou que l'intervalle est écoulé.
+La file est bornée : quand elle est pleine, les logs sont abandonnés et
+comptés (back-pressure). Les niveaux critiques sont écrits immédiatement.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from .models import Log
+
+logger = logging.getLogger(__name__)
+
+# Écrits de façon synchrone, jamais abandonnés
+NIVEAUX_SYNCHRONES = {'error'}
+TYPES_SYNCHRONES = {'security'}
+# Un avertissement au premier abandon, puis tous les ALERTE_ABANDONS
+ALERTE_ABANDONS = 1000
+
+
+class TamponLogs:
+    """
+    File bornée de Log non sauvegardés, vidée par un thread de fond.
+
+    `synchrone=True` désactive le tampon (save() direct) ; `demarrer=False`
+    n'active pas le thread, la file est alors vidée à la main avec vider().
+    """
+
+    def __init__(self, taille_max=10000, taille_lot=200, intervalle=2.0, synchrone=False, demarrer=True):
+        self.file = queue.Queue(maxsize=taille_max)
+        self.taille_lot = taille_lot
+        self.intervalle = intervalle
+        self.synchrone = synchrone
+        self.demarrer = demarrer
+        self.nb_abandons = 0
+        self.nb_ecrits = 0
+        self.nb_echecs = 0
+        self._verrou = threading.Lock()
+        self._thread = None
+
+    def ajouter(self, log):
+        """
+        Enregistre un Log : en file si possible, immédiatement s'il est critique.
+
+        Retourne False si la file est pleine et que le log a été abandonné.
+        """
+        if self.synchrone or log.level in NIVEAUX_SYNCHRONES or log.type in TYPES_SYNCHRONES:
+            log.save()
+            return True
+
+        self._assurer_thread()
+        try:
+            self.file.put_nowait(log)
+        except queue.Full:
+            with self._verrou:
+                self.nb_abandons += 1
+                abandons = self.nb_abandons
+            if abandons == 1 or abandons % ALERTE_ABANDONS == 0:
+                logger.warning("File de logs pleine : %d logs abandonnés depuis le démarrage", abandons)
+            return False
+        return True
+
+    def vider(self):
+        """Écrit tout le contenu de la file dans le thread courant ; retourne le nombre écrit"""
+        total = 0
+        while True:
+            lot = self._prendre(self.taille_lot)
+            if not lot:
+                return total
+            total += self._ecrire(lot)
+
+    def statistiques(self):
+        return {
+            'en_attente': self.file.qsize(),
+            'ecrits': self.nb_ecrits,
+            'abandonnes': self.nb_abandons,
+            'echecs': self.nb_echecs,
+        }
+
+    def _prendre(self, nombre, attente=None):
+        """Retire jusqu'à `nombre` logs ; attend au plus `attente` secondes le premier"""
+        lot = []
+        try:
+            lot.append(self.file.get(timeout=attente) if attente else self.file.get_nowait())
+            while len(lot) < nombre:
+                lot.append(self.file.get_nowait())
+        except queue.Empty:
+            pass
+        return lot
+
+    def _ecrire(self, lot):
+        try:
+            Log.objects.bulk_create(lot, batch_size=self.taille_lot)
+        except Exception:
+            logger.exception("Échec d'écriture de %d logs", len(lot))
+            with self._verrou:
+                self.nb_echecs += len(lot)
+            return 0
+        with self._verrou:
+            self.nb_ecrits += len(lot)
+        return len(lot)
+
+    def _assurer_thread(self):
+        if not self.demarrer or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._verrou:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._boucle, name='logs-tampon', daemon=True)
+                self._thread.start()
+
+    def _boucle(self):
+        """Vide la file par lots : dès qu'un lot est plein, sinon toutes les `intervalle` secondes"""
+        while True:
+            echeance = time.monotonic() + self.intervalle
+            lot = []
+            while len(lot) < self.taille_lot:
+                reste = echeance - time.monotonic()
+                if reste <= 0:
+                    break
+                lot.extend(self._prendre(self.taille_lot - len(lot), attente=reste))
+            if lot:
+                close_old_connections()
+                self._ecrire(lot)
+
+
+def _creer_tampon():
+    config = getattr(settings, 'LOGS_TAMPON', {})
+    return TamponLogs(
+        taille_max=config.get('TAILLE_MAX', 10000),
+        taille_lot=config.get('TAILLE_LOT', 200),
+        intervalle=config.get('INTERVALLE', 2.0),
+        synchrone=not config.get('ACTIF', True),
+    )
+
+
+tampon = _creer_tampon()
+atexit.register(tampon.vider)
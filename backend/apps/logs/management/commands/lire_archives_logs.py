@@ -0,0 +1,28 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from apps.logs.retention import lire_archives
+
+
+class Command(BaseCommand):
+    help = "Affiche les logs archivés (JSONL) filtrés par date, niveau, type ou texte"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--debut', type=date.fromisoformat, help='Premier jour (AAAA-MM-JJ)')
+        parser.add_argument('--fin', type=date.fromisoformat, help='Dernier jour (AAAA-MM-JJ)')
+        parser.add_argument('--level', help='Niveau (info, warning, error...)')
+        parser.add_argument('--type', help='Type (auth, api, security...)')
+        parser.add_argument('--recherche', help='Texte contenu dans le message')
+        parser.add_argument('--dossier', help="Dossier d'archives (LOGS_ARCHIVE_DIR par défaut)")
+
+    def handle(self, *args, **options):
+        for log in lire_archives(
+            debut=options['debut'],
+            fin=options['fin'],
+            level=options['level'],
+            type=options['type'],
+            recherche=options['recherche'],
+            dossier=options['dossier'],
+        ):
+            self.stdout.write(json.dumps(log, ensure_ascii=False))
@@ -0,0 +1,37 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.logs.retention import purger
+
+
+class Command(BaseCommand):
+    help = "Supprime les logs plus anciens que N jours par tranches, avec archivage optionnel"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=30, help='Durée de rétention en jours')
+        parser.add_argument('--archiver', action='store_true', help='Archiver en JSONL compressé avant suppression')
+        parser.add_argument('--dossier', help="Dossier d'archives (LOGS_ARCHIVE_DIR par défaut)")
+        parser.add_argument('--taille-lot', type=int, default=5000, help='Taille des tranches de clé primaire')
+
+    def handle(self, *args, **options):
+        if options['jours'] < 0:
+            raise CommandError("--jours doit être positif")
+
+        avant = timezone.now() - timedelta(days=options['jours'])
+        debut = time.monotonic()
+        supprimes = purger(
+            avant,
+            taille_lot=options['taille_lot'],
+            archiver=options['archiver'],
+            dossier=options['dossier'],
+            progression=self._afficher_progression,
+        )
+        duree = time.monotonic() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"{supprimes} logs antérieurs au {avant:%Y-%m-%d %H:%M} supprimés en {duree:.2f}s"
+        ))
+
+    def _afficher_progression(self, supprimes, id_courant, id_max):
+        self.stdout.write(f"  {supprimes} supprimés (id {id_courant}/{id_max})")
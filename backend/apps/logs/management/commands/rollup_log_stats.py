@@ -0,0 +1,35 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.logs.services import agreger_jour, jours_a_agreger
+
+
+class Command(BaseCommand):
+    help = "Agrège les logs des jours clos dans LogStats (hier et la veille par défaut, idempotent)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Jour à agréger (AAAA-MM-JJ)')
+        parser.add_argument('--debut', type=date.fromisoformat, help='Premier jour de la plage à agréger')
+        parser.add_argument('--fin', type=date.fromisoformat, help='Dernier jour de la plage (hier par défaut)')
+
+    def handle(self, *args, **options):
+        hier = timezone.localdate() - timedelta(days=1)
+        if options['debut']:
+            fin = options['fin'] or hier
+            if options['debut'] > fin:
+                raise CommandError("--debut doit précéder --fin")
+            jours = [options['debut'] + timedelta(days=i) for i in range((fin - options['debut']).days + 1)]
+        elif options['date']:
+            jours = [options['date']]
+        else:
+            # La veille est recalculée : logs écrits par le tampon après minuit
+            jours = jours_a_agreger()
+
+        for jour in jours:
+            debut = time.monotonic()
+            compteurs = agreger_jour(jour)
+            self.stdout.write(self.style.SUCCESS(
+                f"{jour} : {compteurs['total_count']} logs agrégés en {time.monotonic() - debut:.2f}s"
+            ))
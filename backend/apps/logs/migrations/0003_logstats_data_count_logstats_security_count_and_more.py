@@ -0,0 +1,53 @@
+# Generated by Django 4.2 on 2026-10-18 10:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('logs', '0002_logstats_alter_log_level_alter_log_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logstats',
+            name='data_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='logstats',
+            name='security_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='logstats',
+            name='system_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='logstats',
+            name='user_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='log',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='logs_logs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='LogDailyUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='logs_daily', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'logs_daily_user',
+                'unique_together': {('date', 'user')},
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from apps.accounts.models import User
 
 
@@ -30,7 +31,8 @@ class Log(models.Model):
     path = models.CharField(max_length=500, blank=True)
     method = models.CharField(max_length=10, blank=True)
     status_code = models.IntegerField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Horodaté à la réception, pas à l'écriture différée par le tampon
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         db_table = 'logs_log'
@@ -55,7 +57,11 @@ class LogStats(models.Model):
     error_count = models.IntegerField(default=0)
     debug_count = models.IntegerField(default=0)
     auth_count = models.IntegerField(default=0)
+    user_count = models.IntegerField(default=0)
+    system_count = models.IntegerField(default=0)
+    data_count = models.IntegerField(default=0)
     api_count = models.IntegerField(default=0)
+    security_count = models.IntegerField(default=0)
     unique_users = models.IntegerField(default=0)
 
     class Meta:
@@ -63,4 +69,17 @@ class LogStats(models.Model):
         ordering = ['-date']
 
     def __str__(self):
-        return f"Stats du {self.date}"
\ No newline at end of file
+        return f"Stats du {self.date}"
+
+
+class LogDailyUser(models.Model):
+    """Utilisateurs distincts par jour, pour compter les utilisateurs uniques d'une période"""
+    date = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='logs_daily')
+
+    class Meta:
+        db_table = 'logs_daily_user'
+        unique_together = ['date', 'user']
+
+    def __str__(self):
+        return f"{self.user_id} actif le {self.date}"
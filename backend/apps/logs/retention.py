@@ -0,0 +1,111 @@
+"""
+Rétention des logs : purge par tranches de clé primaire, avec archivage.
+
+Chaque tranche [id, id + taille_lot[ est supprimée dans sa propre
+transaction, ce qui borne la mémoire et la durée des verrous quel que soit le
+volume à purger. Son archive (JSONL compressé, un fichier par jour et par
+tranche, nommé par le premier id) est écrite dans un fichier temporaire,
+renommé seulement une fois la suppression validée : une tranche annulée puis
+rejouée n'est jamais archivée deux fois.
+"""
+import gzip
+import json
+import os
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from .models import Log
+
+PREFIXE = 'logs-'
+EXTENSION = '.jsonl.gz'
+
+
+def dossier_archives():
+    return Path(getattr(settings, 'LOGS_ARCHIVE_DIR', settings.BASE_DIR / 'archives' / 'logs'))
+
+
+def _fichier(dossier, jour, premier_id):
+    return Path(dossier) / f'{PREFIXE}{jour.isoformat()}_{premier_id:012d}{EXTENSION}'
+
+
+def _preparer_archives(lignes, dossier):
+    """Écrit les lignes dans des fichiers temporaires, un par jour (local) de création ; retourne [(temporaire, final)]"""
+    par_jour = {}
+    for ligne in lignes:
+        jour = timezone.localtime(ligne['created_at']).date()
+        par_jour.setdefault(jour, []).append(ligne)
+
+    Path(dossier).mkdir(parents=True, exist_ok=True)
+    fichiers = []
+    for jour, lignes_jour in par_jour.items():
+        final = _fichier(dossier, jour, min(ligne['id'] for ligne in lignes_jour))
+        temporaire = final.with_name(f'.{final.name}.tmp')  # ignoré par lire_archives
+        fichiers.append((temporaire, final))
+        with gzip.open(temporaire, 'wt', encoding='utf-8') as fichier:
+            for ligne in lignes_jour:
+                fichier.write(json.dumps(ligne, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+    return fichiers
+
+
+def purger(avant, taille_lot=5000, archiver=False, dossier=None, progression=None):
+    """
+    Supprime les logs créés avant `avant` par tranches de clé primaire.
+
+    Si `archiver` est vrai, chaque tranche supprimée est archivée dans
+    `dossier`. `progression(supprimes, id_courant, id_max)` est appelé
+    après chaque tranche. Retourne le nombre de logs supprimés.
+    """
+    dossier = dossier or dossier_archives()
+    expires = Log.objects.filter(created_at__lt=avant).order_by()
+    bornes = expires.aggregate(id_min=Min('id'), id_max=Max('id'))
+    if bornes['id_min'] is None:
+        return 0
+
+    supprimes = 0
+    debut = bornes['id_min']
+    while debut <= bornes['id_max']:
+        tranche = expires.filter(id__gte=debut, id__lt=debut + taille_lot)
+        fichiers = []
+        try:
+            with transaction.atomic():
+                if archiver:
+                    fichiers = _preparer_archives(list(tranche.order_by('id').values()), dossier)
+                supprimes += tranche.delete()[0]
+        except BaseException:
+            for temporaire, _ in fichiers:
+                temporaire.unlink(missing_ok=True)
+            raise
+        # Suppression validée : les archives de la tranche deviennent visibles
+        for temporaire, final in fichiers:
+            os.replace(temporaire, final)
+        debut += taille_lot
+        if progression:
+            progression(supprimes, min(debut, bornes['id_max']), bornes['id_max'])
+    return supprimes
+
+
+def lire_archives(debut=None, fin=None, level=None, type=None, recherche=None, dossier=None):
+    """
+    Parcourt les logs archivés entre deux dates (incluses), avec filtres simples.
+
+    Produit des dictionnaires (champs de Log, created_at en ISO 8601).
+    """
+    for chemin in sorted(Path(dossier or dossier_archives()).glob(f'{PREFIXE}*{EXTENSION}')):
+        jour = date.fromisoformat(chemin.name[len(PREFIXE):len(PREFIXE) + 10])
+        if (debut and jour < debut) or (fin and jour > fin):
+            continue
+        with gzip.open(chemin, 'rt', encoding='utf-8') as fichier:
+            for ligne in fichier:
+                log = json.loads(ligne)
+                if level and log['level'] != level:
+                    continue
+                if type and log['type'] != type:
+                    continue
+                if recherche and recherche.lower() not in log['message'].lower():
+                    continue
+                yield log
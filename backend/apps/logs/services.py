@@ -0,0 +1,138 @@
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import Log, LogStats, LogDailyUser
+
+NIVEAUX = [niveau for niveau, _ in Log.LEVEL_CHOICES]
+TYPES = [type_log for type_log, _ in Log.TYPE_CHOICES]
+COMPTEURS = [f'{valeur}_count' for valeur in NIVEAUX + TYPES]
+# Jours clos encore relus dans les logs : le tampon (apps.logs.buffer) peut y
+# écrire après minuit, et rollup_log_stats les recalcule le lendemain
+JOURS_GRACE = 1
+
+
+def debut_journee(jour):
+    """Minuit (heure locale) du jour donné, en datetime aware"""
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+
+def logs_du_jour(jour):
+    """Logs d'un jour via un intervalle sur created_at (utilise l'index, contrairement à __date)"""
+    return Log.objects.filter(
+        created_at__gte=debut_journee(jour),
+        created_at__lt=debut_journee(jour + timedelta(days=1)),
+    )
+
+
+def compter(logs):
+    """Total et compteurs par niveau et par type en une seule requête"""
+    agregats = {'total_count': Count('id')}
+    agregats.update({f'{niveau}_count': Count('id', filter=Q(level=niveau)) for niveau in NIVEAUX})
+    agregats.update({f'{type_log}_count': Count('id', filter=Q(type=type_log)) for type_log in TYPES})
+    return logs.order_by().aggregate(**agregats)
+
+
+def agreger_jour(jour):
+    """
+    Calcule et enregistre le LogStats d'un jour clos (idempotent, rejouable).
+
+    Les utilisateurs actifs du jour sont aussi stockés dans LogDailyUser pour
+    compter les utilisateurs uniques d'une période sans relire les logs. Les
+    écritures sont des upserts : deux exécutions simultanées ne se gênent pas.
+    Appelé uniquement par la commande rollup_log_stats, jamais par une requête.
+    """
+    logs = logs_du_jour(jour)
+    compteurs = compter(logs)
+    user_ids = set(
+        logs.exclude(user__isnull=True).order_by().values_list('user', flat=True).distinct()
+    )
+
+    with transaction.atomic():
+        LogStats.objects.bulk_create(
+            [LogStats(date=jour, unique_users=len(user_ids), **compteurs)],
+            update_conflicts=True,
+            unique_fields=['date'] if connection.features.supports_update_conflicts_with_target else None,
+            update_fields=['total_count', 'unique_users'] + COMPTEURS,
+        )
+        LogDailyUser.objects.bulk_create(
+            [LogDailyUser(date=jour, user_id=user_id) for user_id in user_ids],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+    return compteurs
+
+
+def jours_a_agreger(aujourd_hui=None):
+    """Jours recalculés par défaut : hier et les JOURS_GRACE jours précédents"""
+    hier = (aujourd_hui or timezone.localdate()) - timedelta(days=1)
+    return [hier - timedelta(days=i) for i in range(JOURS_GRACE, -1, -1)]
+
+
+def _intervalles(jours):
+    """Jours triés regroupés en intervalles contigus [(debut, fin), ...]"""
+    intervalles = []
+    for jour in jours:
+        if intervalles and intervalles[-1][1] + timedelta(days=1) == jour:
+            intervalles[-1][1] = jour
+        else:
+            intervalles.append([jour, jour])
+    return intervalles
+
+
+def stats_periode(debut, fin):
+    """
+    Statistiques des logs sur [debut, fin] (dates locales incluses), en lecture seule.
+
+    Les jours consolidés (clos depuis plus de JOURS_GRACE jours) sont lus dans
+    LogStats ; les jours récents, que le tampon peut encore compléter, et les
+    jours pas encore agrégés sont comptés sur la table des logs, une requête
+    par intervalle contigu.
+    """
+    aujourd_hui = timezone.localdate()
+    fin = min(fin, aujourd_hui)
+    fin_consolidee = min(fin, aujourd_hui - timedelta(days=1 + JOURS_GRACE))
+
+    totaux = dict.fromkeys(['total_count'] + COMPTEURS, 0)
+    user_ids = set()
+    en_direct = []
+
+    if debut <= fin_consolidee:
+        agreges = LogStats.objects.filter(date__range=(debut, fin_consolidee)).values('date', *totaux)
+        presents = set()
+        for ligne in agreges:
+            presents.add(ligne.pop('date'))
+            for champ, valeur in ligne.items():
+                totaux[champ] += valeur
+        if presents:
+            user_ids.update(
+                LogDailyUser.objects.filter(date__in=presents)
+                .order_by().values_list('user', flat=True).distinct()
+            )
+        en_direct = [
+            debut + timedelta(days=i)
+            for i in range((fin_consolidee - debut).days + 1)
+            if debut + timedelta(days=i) not in presents
+        ]
+
+    premier_recent = max(debut, fin_consolidee + timedelta(days=1))
+    en_direct += [premier_recent + timedelta(days=i) for i in range((fin - premier_recent).days + 1)]
+
+    for premier, dernier in _intervalles(en_direct):
+        logs = Log.objects.filter(
+            created_at__gte=debut_journee(premier),
+            created_at__lt=debut_journee(dernier + timedelta(days=1)),
+        )
+        for champ, valeur in compter(logs).items():
+            totaux[champ] += valeur
+        user_ids.update(
+            logs.exclude(user__isnull=True).order_by().values_list('user', flat=True).distinct()
+        )
+
+    return {
+        'total': totaux['total_count'],
+        'by_level': {niveau: totaux[f'{niveau}_count'] for niveau in NIVEAUX},
+        'by_type': {type_log: totaux[f'{type_log}_count'] for type_log in TYPES},
+        'unique_users': len(user_ids),
+    }
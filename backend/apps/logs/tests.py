@@ -1,3 +1,131 @@
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.db.models import QuerySet
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .buffer import TamponLogs
+from .models import Log, LogStats
+from .retention import lire_archives, purger
+from .services import debut_journee
+
+User = get_user_model()
+
+
+class LogStatsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='admin', password='x', role='admin', is_staff=True)
+        self.client.force_authenticate(user=self.admin)
+        self.aujourd_hui = timezone.localdate()
+
+        for jours, level, log_type in ((0, 'error', 'api'), (0, 'info', 'auth'), (3, 'info', 'security')):
+            log = Log.objects.create(user=self.admin, level=level, type=log_type, message='test')
+            Log.objects.filter(pk=log.pk).update(
+                created_at=debut_journee(self.aujourd_hui - timedelta(days=jours)) + timedelta(hours=12)
+            )
+
+    def test_stats_semaine(self):
+        """Jours clos agrégés par la commande dans LogStats, puis lus sans relire les logs"""
+        response = self.client.get('/api/logs/logs/stats/?period=week')
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['by_level']['info'], 2)
+        self.assertEqual(response.data['by_type']['security'], 1)
+        self.assertEqual(response.data['unique_users'], 1)
+        # Une requête GET n'écrit jamais les agrégats
+        self.assertEqual(LogStats.objects.count(), 0)
+
+        debut = (self.aujourd_hui - timedelta(days=7)).isoformat()
+        for _ in range(2):
+            call_command('rollup_log_stats', '--debut', debut, stdout=io.StringIO())
+        self.assertEqual(LogStats.objects.count(), 7)
+
+        # LogStats, utilisateurs des jours consolidés, hier et aujourd'hui sur les logs (2)
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/logs/logs/stats/?period=week')
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['unique_users'], 1)
+
+        # Log de la veille écrit après minuit (tampon) : compté, puis intégré au prochain rollup
+        log = Log.objects.create(user=self.admin, level='info', type='api', message='tardif')
+        Log.objects.filter(pk=log.pk).update(created_at=debut_journee(self.aujourd_hui) - timedelta(minutes=1))
+        self.assertEqual(self.client.get('/api/logs/logs/stats/?period=week').data['total'], 4)
+        call_command('rollup_log_stats', stdout=io.StringIO())
+        self.assertEqual(LogStats.objects.get(date=self.aujourd_hui - timedelta(days=1)).total_count, 1)
+
+    def test_stats_jour(self):
+        response = self.client.get('/api/logs/logs/stats/?period=day')
+        self.assertEqual(response.data['total'], 2)
+        self.assertEqual(response.data['by_level']['error'], 1)
+        self.assertEqual(set(response.data['buffer']), {'en_attente', 'ecrits', 'abandonnes', 'echecs'})
+
+
+class TamponLogsTestCase(TestCase):
+    def test_file_bornee_et_ecriture_par_lots(self):
+        tampon = TamponLogs(taille_max=2, taille_lot=10, demarrer=False)
+        self.assertTrue(tampon.ajouter(Log(level='info', message='a')))
+        self.assertTrue(tampon.ajouter(Log(level='info', message='b')))
+        with self.assertLogs('apps.logs.buffer', 'WARNING'):
+            self.assertFalse(tampon.ajouter(Log(level='info', message='c')))
+        self.assertEqual(Log.objects.count(), 0)
+
+        # Les erreurs ne passent pas par la file
+        self.assertTrue(tampon.ajouter(Log(level='error', message='d')))
+        self.assertEqual(Log.objects.count(), 1)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(tampon.vider(), 2)
+        self.assertEqual(Log.objects.count(), 3)
+        self.assertEqual(tampon.statistiques()['abandonnes'], 1)
+
+
+class RetentionTestCase(TestCase):
+    def test_purge_par_tranches_avec_archive(self):
+        maintenant = timezone.now()
+        for i in range(5):
+            log = Log.objects.create(level='warning' if i % 2 else 'info', message=f'ancien {i}')
+            Log.objects.filter(pk=log.pk).update(created_at=maintenant - timedelta(days=40 + i))
+        Log.objects.create(message='récent')
+
+        with tempfile.TemporaryDirectory() as dossier:
+            supprimes = purger(maintenant - timedelta(days=30), taille_lot=2, archiver=True, dossier=dossier)
+            self.assertEqual(supprimes, 5)
+            self.assertEqual(list(Log.objects.values_list('message', flat=True)), ['récent'])
+
+            archives = list(lire_archives(dossier=dossier))
+            self.assertEqual(len(archives), 5)
+            self.assertEqual(len(list(lire_archives(level='warning', dossier=dossier))), 2)
+            plus_ancien = timezone.localdate() - timedelta(days=44)
+            self.assertEqual(len(list(lire_archives(fin=plus_ancien, dossier=dossier))), 1)
+
+    def test_tranche_annulee_non_archivee(self):
+        maintenant = timezone.now()
+        for i in range(4):
+            log = Log.objects.create(message=f'ancien {i}')
+            Log.objects.filter(pk=log.pk).update(created_at=maintenant - timedelta(days=40))
+        supprimer = QuerySet.delete
+        appels = []
+
+        def supprimer_puis_echouer(queryset):
+            appels.append(queryset)
+            if len(appels) == 2:
+                raise DatabaseError('connexion perdue')
+            return supprimer(queryset)
+
+        with tempfile.TemporaryDirectory() as dossier:
+            with mock.patch.object(QuerySet, 'delete', supprimer_puis_echouer), self.assertRaises(DatabaseError):
+                purger(maintenant - timedelta(days=30), taille_lot=2, archiver=True, dossier=dossier)
+            self.assertEqual(len(list(lire_archives(dossier=dossier))), 2)
 
-# Create your tests here.
+            # Reprise : la tranche annulée est archivée une seule fois
+            purger(maintenant - timedelta(days=30), taille_lot=2, archiver=True, dossier=dossier)
+            messages = [log['message'] for log in lire_archives(dossier=dossier)]
+            self.assertEqual(sorted(messages), [f'ancien {i}' for i in range(4)])
+            self.assertEqual(len(os.listdir(dossier)), 2)
@@ -1,11 +1,14 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Count, Q
+from django.db.models import Q
 from django.utils import timezone
 from datetime import timedelta
 from .models import Log, LogStats
 from .serializers import LogSerializer, LogStatsSerializer
+from .buffer import tampon
+from .retention import purger
+from .services import stats_periode
 
 
 class LogListView(generics.ListAPIView):
@@ -63,46 +66,26 @@ class LogStatsView(APIView):
     def get(self, request):
         period = request.query_params.get('period', 'day')  # day, week, month
 
+        aujourd_hui = timezone.localdate()
+
         if period == 'day':
-            start_date = timezone.now().date()
-            end_date = start_date + timedelta(days=1)
+            start_date = aujourd_hui
         elif period == 'week':
-            start_date = timezone.now().date() - timedelta(days=7)
-            end_date = timezone.now().date() + timedelta(days=1)
+            start_date = aujourd_hui - timedelta(days=7)
         elif period == 'month':
-            start_date = timezone.now().date() - timedelta(days=30)
-            end_date = timezone.now().date() + timedelta(days=1)
+            start_date = aujourd_hui - timedelta(days=30)
         else:
-            start_date = timezone.now().date() - timedelta(days=1)
-            end_date = timezone.now().date() + timedelta(days=1)
-
-        logs = Log.objects.filter(
-            created_at__date__gte=start_date,
-            created_at__date__lt=end_date
-        )
-
-        stats = {
-            'total': logs.count(),
-            'by_level': {
-                'info': logs.filter(level='info').count(),
-                'success': logs.filter(level='success').count(),
-                'warning': logs.filter(level='warning').count(),
-                'error': logs.filter(level='error').count(),
-                'debug': logs.filter(level='debug').count(),
-            },
-            'by_type': {
-                'auth': logs.filter(type='auth').count(),
-                'user': logs.filter(type='user').count(),
-                'system': logs.filter(type='system').count(),
-                'data': logs.filter(type='data').count(),
-                'api': logs.filter(type='api').count(),
-                'security': logs.filter(type='security').count(),
-            },
-            'unique_users': logs.values('user').distinct().count(),
+            start_date = aujourd_hui - timedelta(days=1)
+
+        # Lecture seule : jours consolidés lus dans LogStats, jours récents comptés sur les logs
+        stats = stats_periode(start_date, aujourd_hui)
+        stats.update({
             'period': period,
             'start_date': start_date,
-            'end_date': end_date - timedelta(days=1),
-        }
+            'end_date': aujourd_hui,
+            # File d'ingestion du processus qui répond (logs en attente, abandonnés, en échec)
+            'buffer': tampon.statistiques(),
+        })
 
         return Response(stats)
 
@@ -112,14 +95,23 @@ class LogCleanupView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def delete(self, request):
-        days = int(request.query_params.get('days', 30))
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            return Response(
+                {'error': 'Le paramètre days doit être un entier'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        archiver = request.query_params.get('archive', 'false').lower() == 'true'
         cutoff_date = timezone.now() - timedelta(days=days)
 
-        deleted_count = Log.objects.filter(created_at__lt=cutoff_date).delete()[0]
+        # Suppression par tranches de clé primaire (mémoire et verrous bornés)
+        deleted_count = purger(cutoff_date, archiver=archiver)
 
         return Response({
             'message': f'{deleted_count} logs supprimés',
-            'deleted_count': deleted_count
+            'deleted_count': deleted_count,
+            'archived': archiver
         })
 
 
@@ -141,6 +133,11 @@ class LogCreateView(APIView):
 
         serializer = LogSerializer(data=data)
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            # Mise en file : écrit par lots en arrière-plan (sauf error/security)
+            if not tampon.ajouter(Log(**serializer.validated_data)):
+                return Response(
+                    {'error': 'File de logs saturée, log abandonné'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
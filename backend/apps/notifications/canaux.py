@@ -0,0 +1,84 @@
+"""
+Canaux de livraison des notifications (apps.notifications.livraison).
+
+Un canal reçoit une liste de digests, un par destinataire :
+{'destinataire': User, 'notifications': [Notification, ...]}, et les envoie
+en une fois. Il peut retourner les ids des destinataires refusés ; une
+exception signale une panne du canal pour tout le lot. Les canaux actifs sont
+listés dans NOTIFICATIONS_CANAUX.
+"""
+import json
+import logging
+import smtplib
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+
+def sujet(digest):
+    notifications = digest['notifications']
+    if len(notifications) == 1:
+        return notifications[0].titre
+    return f"{len(notifications)} nouvelles notifications"
+
+
+def texte(digest):
+    return '\n\n'.join(
+        f"{notification.titre}\n{notification.message}" for notification in digest['notifications']
+    )
+
+
+class CanalConsole:
+    """Écrit les digests sur la sortie standard (développement)"""
+
+    def __init__(self, flux=None):
+        self.flux = flux or sys.stdout
+
+    def envoyer(self, digests):
+        for digest in digests:
+            self.flux.write(f"[{digest['destinataire'].username}] {sujet(digest)}\n{texte(digest)}\n\n")
+
+
+class CanalFichier:
+    """Ajoute les digests à un fichier JSONL (tests, audit)"""
+
+    def __init__(self, chemin=None):
+        self.chemin = Path(chemin or getattr(
+            settings, 'NOTIFICATIONS_FICHIER', settings.BASE_DIR / 'archives' / 'notifications.jsonl'
+        ))
+
+    def envoyer(self, digests):
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.chemin, 'a', encoding='utf-8') as fichier:
+            for digest in digests:
+                fichier.write(json.dumps({
+                    'destinataire': digest['destinataire'].id,
+                    'sujet': sujet(digest),
+                    'notifications': [n.id_notification for n in digest['notifications']],
+                    'date': digest['notifications'][-1].date_creation,
+                }, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+
+
+class CanalEmail:
+    """Un email par digest, tous envoyés sur une seule connexion (EMAIL_BACKEND, SMTP en production)"""
+
+    def envoyer(self, digests):
+        refuses = []
+        connexion = get_connection(fail_silently=False)
+        with connexion:
+            for digest in digests:
+                destinataire = digest['destinataire']
+                if not destinataire.email:
+                    continue
+                try:
+                    connexion.send_messages([EmailMessage(sujet(digest), texte(digest), to=[destinataire.email])])
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as erreur:
+                    # Refus propre au message : les autres digests partent quand même
+                    logger.warning("Email refusé pour %s : %s", destinataire.email, erreur)
+                    refuses.append(destinataire.id)
+        return refuses
@@ -0,0 +1,79 @@
+"""
+Compteur de notifications non lues par utilisateur, tenu dans le cache.
+
+Le badge ne lit que le cache : la table n'est comptée (sur l'index
+destinataire, est_lu) que lorsque la clé est absente. Créations et lectures
+ajustent le compteur par incr/decr atomiques, une fois la transaction validée.
+
+Le compteur n'est tenu que dans un cache partagé entre processus (Redis,
+memcached...) : avec un cache local à chaque processus, les workers
+divergeraient, et le badge est alors compté en base à chaque lecture.
+NOTIFICATIONS_COMPTEURS_EN_CACHE force l'un ou l'autre mode.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from .models import Notification
+
+DUREE = 24 * 3600  # recompté au plus une fois par jour : corrige une éventuelle dérive
+DUREE_PERIME = 60
+
+
+def en_cache():
+    reglage = getattr(settings, 'NOTIFICATIONS_COMPTEURS_EN_CACHE', None)
+    if reglage is not None:
+        return reglage
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def cle(user_id):
+    return f'notifications_non_lues_{user_id}'
+
+
+def cle_perime(user_id):
+    return f'notifications_non_lues_{user_id}_perime'
+
+
+def _compter(user_id):
+    return Notification.objects.filter(destinataire_id=user_id, est_lu=False).count()
+
+
+def non_lues(user_id):
+    if not en_cache():
+        return _compter(user_id)
+    valeur = cache.get(cle(user_id))
+    if valeur is None:
+        cache.delete(cle_perime(user_id))
+        valeur = _compter(user_id)
+        if cache.add(cle(user_id), valeur, DUREE) and cache.get(cle_perime(user_id)):
+            # Un ajustement a échoué pendant le comptage : valeur peut-être déjà périmée
+            cache.delete(cle(user_id))
+    return valeur
+
+
+def _ajuster(user_id, delta):
+    try:
+        if delta >= 0:
+            cache.incr(cle(user_id), delta)
+        elif cache.decr(cle(user_id), -delta) < 0:
+            cache.delete(cle(user_id))
+    except ValueError:
+        # Clé absente : recomptée à la prochaine lecture, y compris si un comptage est en cours
+        cache.set(cle_perime(user_id), True, DUREE_PERIME)
+
+
+def ajouter(user_ids):
+    """Une notification non lue de plus par occurrence de user_id"""
+    nombres = Counter(user_ids)
+    if nombres and en_cache():
+        transaction.on_commit(lambda: [_ajuster(user_id, n) for user_id, n in nombres.items()])
+
+
+def retirer(user_id, nombre=1):
+    """`nombre` notifications de l'utilisateur viennent d'être lues"""
+    if nombre and en_cache():
+        transaction.on_commit(lambda: _ajuster(user_id, -nombre))
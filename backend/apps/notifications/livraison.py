@@ -0,0 +1,189 @@
+"""
+Livraison des notifications non envoyées (est_envoye=False).
+
+Un lot est d'abord réservé dans une transaction courte : SELECT ... FOR UPDATE
+SKIP LOCKED, puis un UPDATE qui pose reserve_par/reserve_le, validé aussitôt.
+Plusieurs workers traitent ainsi des lots disjoints, et aucun verrou n'est
+tenu pendant l'envoi. Les notifications d'un même destinataire sont
+regroupées en un digest, transmis à chaque canal hors transaction.
+
+Chaque canal livré est noté dans canaux_livres : une notification reprise ne
+repasse que par les canaux qui ont échoué. Un canal peut refuser certains
+destinataires (adresse rejetée...) : leurs notifications sont reprises après
+NOTIFICATIONS_DELAI_REPRISE secondes, puis mises de côté au bout de
+NOTIFICATIONS_ECHECS_MAX refus, sans bloquer le reste de la file. Une
+réservation abandonnée (worker arrêté) expire après le même délai ; les
+écritures de fin de lot sont filtrées sur le jeton de réservation, et un
+worker en retard ne touche pas aux lignes reprises par un autre.
+"""
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from apps.accounts.models import User
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+def canaux_configures():
+    return [
+        import_string(chemin)()
+        for chemin in getattr(settings, 'NOTIFICATIONS_CANAUX', ['apps.notifications.canaux.CanalConsole'])
+    ]
+
+
+def nom_canal(canal):
+    return getattr(canal, 'nom', type(canal).__name__)
+
+
+def regrouper(notifications):
+    """Un digest par destinataire, notifications dans l'ordre de création"""
+    destinataires = User.objects.only('id', 'username', 'email').in_bulk(
+        {notification.destinataire_id for notification in notifications}
+    )
+    digests = {}
+    for notification in notifications:
+        digest = digests.setdefault(notification.destinataire_id, {
+            'destinataire': destinataires[notification.destinataire_id],
+            'notifications': [],
+        })
+        digest['notifications'].append(notification)
+    return list(digests.values())
+
+
+class Livreur:
+    """Worker de livraison ; plusieurs instances (processus) peuvent tourner en parallèle"""
+
+    def __init__(self, canaux=None, taille_lot=200):
+        self.canaux = canaux if canaux is not None else canaux_configures()
+        self.taille_lot = taille_lot
+        self.delai = timedelta(seconds=getattr(settings, 'NOTIFICATIONS_DELAI_REPRISE', 300))
+        self.echecs_max = getattr(settings, 'NOTIFICATIONS_ECHECS_MAX', 5)
+        self.nb_envoyees = 0
+        self.nb_digests = 0
+        self.nb_lots = 0
+        self.nb_echecs = 0
+        self.duree = 0.0
+
+    def reserver(self):
+        """Réserve un lot et valide la réservation ; retourne les notifications réservées"""
+        maintenant = timezone.now()
+        jeton = uuid.uuid4().hex
+        with transaction.atomic():
+            lot = list(
+                Notification.objects.filter(est_envoye=False, nb_echecs__lt=self.echecs_max)
+                .filter(Q(reserve_le__isnull=True) | Q(reserve_le__lt=maintenant - self.delai))
+                .select_for_update(skip_locked=True)
+                .order_by('id_notification')[:self.taille_lot]
+            )
+            if lot:
+                Notification.objects.filter(
+                    id_notification__in=[notification.id_notification for notification in lot]
+                ).update(reserve_par=jeton, reserve_le=maintenant)
+        for notification in lot:
+            notification.reserve_par = jeton
+        return lot
+
+    def livrer(self, digests):
+        """Passe les digests à chaque canal ; retourne les ids des destinataires refusés"""
+        refuses = set()
+        for canal in self.canaux:
+            nom = nom_canal(canal)
+            a_envoyer = []
+            for digest in digests:
+                restantes = [n for n in digest['notifications'] if nom not in n.canaux_livres]
+                if restantes:
+                    a_envoyer.append({'destinataire': digest['destinataire'], 'notifications': restantes})
+            if not a_envoyer:
+                continue
+            try:
+                refuses_canal = set(canal.envoyer(a_envoyer) or ())
+            except Exception:
+                # Canal en panne : tout le lot sera repris par ce canal, sans compter de refus
+                logger.exception("Échec du canal %s pour un lot de notifications", nom)
+                continue
+            refuses |= refuses_canal
+            for digest in a_envoyer:
+                if digest['destinataire'].id not in refuses_canal:
+                    for notification in digest['notifications']:
+                        notification.canaux_livres = notification.canaux_livres + [nom]
+        return refuses
+
+    def traiter_lot(self):
+        """Réserve, livre et marque un lot ; retourne le nombre de notifications traitées"""
+        debut = time.monotonic()
+        lot = self.reserver()
+        if not lot:
+            return 0
+        digests = regrouper(lot)
+        refuses = self.livrer(digests)
+
+        noms = {nom_canal(canal) for canal in self.canaux}
+        jeton = lot[0].reserve_par
+        livrees = [n for n in lot if noms <= set(n.canaux_livres)]
+        en_attente = [n for n in lot if not noms <= set(n.canaux_livres)]
+        Notification.objects.filter(
+            id_notification__in=[notification.id_notification for notification in livrees],
+            reserve_par=jeton,  # pas une réservation expirée puis reprise
+        ).update(est_envoye=True, reserve_par='', reserve_le=None)
+        if en_attente:
+            self.liberer(en_attente, jeton, refuses)
+
+        # Débit mesuré sur les lots traités uniquement (attentes et lots vides exclus)
+        self.duree += time.monotonic() - debut
+        self.nb_envoyees += len(livrees)
+        self.nb_echecs += len(en_attente)
+        self.nb_digests += len(digests)
+        self.nb_lots += 1
+        return len(lot)
+
+    def liberer(self, en_attente, jeton, refuses):
+        """
+        Rend les notifications non livrées à la file, en notant canaux livrés
+        et refus. Seules les lignes encore réservées par `jeton` sont écrites :
+        une réservation expirée pendant l'envoi appartient à un autre worker.
+        """
+        with transaction.atomic():
+            # Verrou : la réservation ne peut plus être reprise avant l'écriture
+            encore_reservees = set(
+                Notification.objects.select_for_update().filter(
+                    id_notification__in=[notification.id_notification for notification in en_attente],
+                    reserve_par=jeton,
+                ).values_list('id_notification', flat=True)
+            )
+            en_attente = [n for n in en_attente if n.id_notification in encore_reservees]
+            # reserve_le est conservé : la reprise attend le délai
+            for notification in en_attente:
+                notification.reserve_par = ''
+                if notification.destinataire_id in refuses:
+                    notification.nb_echecs += 1
+                    if notification.nb_echecs >= self.echecs_max:
+                        logger.warning(
+                            "Notification %s mise de côté après %s refus", notification.pk, notification.nb_echecs
+                        )
+            Notification.objects.bulk_update(en_attente, ['reserve_par', 'canaux_livres', 'nb_echecs'])
+
+    def vider(self):
+        """Traite tant qu'il reste des notifications à livrer ; retourne leur nombre"""
+        total = 0
+        while True:
+            traitees = self.traiter_lot()
+            if not traitees:
+                return total
+            total += traitees
+
+    def statistiques(self):
+        return {
+            'envoyees': self.nb_envoyees,
+            'digests': self.nb_digests,
+            'lots': self.nb_lots,
+            'echecs': self.nb_echecs,
+            'debit': round(self.nb_envoyees / self.duree, 1) if self.duree else 0.0,  # notifications/s
+        }
@@ -0,0 +1,58 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from apps.notifications.livraison import Livreur
+from apps.notifications.services import NotificationService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute les diffusions restées en file, puis livre les notifications non envoyées "
+        "par lots, regroupées en un digest par utilisateur"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=200, help='Notifications réservées par lot')
+        parser.add_argument('--boucle', action='store_true', help='Tourner en continu (worker)')
+        parser.add_argument('--intervalle', type=float, default=5.0, help="Attente en secondes quand la file est vide")
+
+    def handle(self, *args, **options):
+        if options['taille_lot'] < 1:
+            raise CommandError("--taille-lot doit être positif")
+
+        livreur = Livreur(taille_lot=options['taille_lot'])
+        if not options['boucle']:
+            self._diffuser()
+            livreur.vider()
+            self._afficher(livreur)
+            return
+
+        while True:
+            close_old_connections()
+            try:
+                traitees = self._diffuser() + livreur.traiter_lot()
+            except Exception:
+                # Base indisponible : la réservation expire et le lot sera repris (détail dans les logs)
+                logger.exception("Échec du traitement d'un lot de notifications")
+                traitees = 0
+            if traitees:
+                self._afficher(livreur)
+            else:
+                time.sleep(options['intervalle'])
+
+    def _diffuser(self):
+        executees = NotificationService.traiter_diffusions()
+        if executees:
+            self.stdout.write(f"{executees} diffusions en file exécutées")
+        return executees
+
+    def _afficher(self, livreur):
+        stats = livreur.statistiques()
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['envoyees']} notifications livrées en {stats['digests']} digests "
+            f"({stats['lots']} lots, {stats['echecs']} échecs, {stats['debit']} notifications/s)"
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_index_boite_reception'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='nombre',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='object_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
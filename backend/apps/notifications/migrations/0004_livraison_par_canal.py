@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_regroupement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='canaux_livres',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='nb_echecs',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='reserve_le',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='reserve_par',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['est_envoye', 'id_notification'], name='notif_a_livrer_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_livraison_par_canal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='debut_regroupement',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_debut_regroupement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Diffusion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parametres', models.JSONField()),
+                ('nombre', models.PositiveIntegerField(blank=True, null=True)),
+                ('nb_echecs', models.PositiveSmallIntegerField(default=0)),
+                ('dernier_echec', models.DateTimeField(blank=True, null=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('traitee_le', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='diffusion',
+            index=models.Index(fields=['traitee_le', 'id'], name='diffusion_en_file_idx'),
+        ),
+    ]
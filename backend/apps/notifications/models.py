@@ -23,11 +23,52 @@ class Notification(models.Model):
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True)
     object_id = models.PositiveIntegerField(null=True)
     related_object = GenericForeignKey('content_type', 'object_id')
+    # Notifications regroupées (apps.notifications.regroupement) : total et objets liés
+    nombre = models.PositiveIntegerField(default=1)
+    object_ids = models.JSONField(default=list, blank=True)
+    debut_regroupement = models.DateTimeField(null=True, blank=True)  # création du groupe, point de départ de la fenêtre
 
     est_lu = models.BooleanField(default=False)
     est_envoye = models.BooleanField(default=False)
+    # Livraison (apps.notifications.livraison) : réservation, canaux déjà livrés, refus du destinataire
+    reserve_par = models.CharField(max_length=32, blank=True, default='')
+    reserve_le = models.DateTimeField(null=True, blank=True)
+    canaux_livres = models.JSONField(default=list, blank=True)
+    nb_echecs = models.PositiveSmallIntegerField(default=0)
     date_creation = models.DateTimeField(auto_now_add=True)
     date_lecture = models.DateTimeField(null=True)
 
+    class Meta:
+        indexes = [
+            # Boîte de réception et non lues d'un utilisateur, plus récentes d'abord
+            models.Index(fields=['destinataire', 'est_lu', '-date_creation'], name='notif_non_lues_idx'),
+            models.Index(fields=['destinataire', '-date_creation'], name='notif_boite_idx'),
+            # File de livraison, parcourue par id croissant
+            models.Index(fields=['est_envoye', 'id_notification'], name='notif_a_livrer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_display()} - {self.titre}"
+
+
+class Diffusion(models.Model):
+    """
+    Diffusion mise en file (NotificationService.diffuser_en_file).
+
+    Écrite dans la transaction de la requête : une diffusion acceptée (202)
+    survit à un redémarrage et reste en file jusqu'à traitee_le.
+    """
+    parametres = models.JSONField()  # arguments de NotificationService.diffuser
+    nombre = models.PositiveIntegerField(null=True, blank=True)  # notifications créées
+    nb_echecs = models.PositiveSmallIntegerField(default=0)
+    dernier_echec = models.DateTimeField(null=True, blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    traitee_le = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['traitee_le', 'id'], name='diffusion_en_file_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.get_type_display()} - {self.titre}"
\ No newline at end of file
+        return f"Diffusion « {self.parametres.get('titre')} »"
@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class NotificationCursorPagination(CursorPagination):
+    """
+    Pagination par curseur (keyset) de la boîte de réception : chaque page
+    est lue sur l'index (destinataire, est_lu, -date_creation) sans OFFSET.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    ordering = ('-date_creation', '-id_notification')
@@ -0,0 +1,98 @@
+"""
+Regroupement des notifications répétitives.
+
+Pour les types listés dans NOTIFICATIONS_REGROUPEMENT ({type: fenêtre en
+secondes}), une nouvelle notification fusionne avec la dernière notification
+non lue du même type et du même destinataire dont le groupe a commencé dans
+la fenêtre : son compteur augmente et l'id de l'objet lié s'ajoute à
+object_ids (les OBJETS_MAX derniers sont gardés). La fenêtre part de la
+création du groupe (debut_regroupement), pas de la dernière fusion : un flux
+continu ouvre un nouveau groupe à chaque fenêtre. Un lot s'écrit en un
+bulk_update et un bulk_create, après un SELECT ... FOR UPDATE des groupes
+ouverts.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from . import compteurs
+from .models import Notification
+
+TITRES = {
+    'suggestion': "{nombre} nouveaux exercices suggérés",
+    'validation': "{nombre} notes validées",
+}
+OBJETS_MAX = 50
+CHAMPS_FUSION = ['nombre', 'object_ids', 'object_id', 'content_type', 'titre', 'message', 'date_creation', 'est_envoye',
+                 'canaux_livres', 'nb_echecs']
+
+
+def fenetres():
+    return getattr(settings, 'NOTIFICATIONS_REGROUPEMENT', {})
+
+
+def _fusionner(cible, notification, maintenant):
+    """Ajoute `notification` à `cible`, qui devient la notification agrégée"""
+    cible.nombre += notification.nombre
+    cible.object_ids = (cible.object_ids + notification.object_ids)[-OBJETS_MAX:]
+    cible.object_id = notification.object_id
+    cible.content_type = notification.content_type
+    cible.titre = TITRES.get(cible.type, "{nombre} notifications").format(nombre=cible.nombre)
+    cible.message = notification.message
+    cible.date_creation = maintenant  # remonte en tête de la boîte ; la fenêtre reste celle du groupe
+    cible.est_envoye = False  # le digest suivant annonce le nouveau total
+    cible.canaux_livres = []
+    cible.nb_echecs = 0
+
+
+def enregistrer(notifications, taille_lot=500):
+    """
+    Enregistre des notifications non sauvegardées en les regroupant.
+
+    Retourne les notifications créées ou mises à jour.
+    """
+    regles = fenetres()
+    maintenant = timezone.now()
+    a_creer, groupes = [], {}
+    for notification in notifications:
+        if not notification.object_ids and notification.object_id is not None:
+            notification.object_ids = [notification.object_id]
+        if notification.type not in regles:
+            a_creer.append(notification)
+            continue
+        notification.debut_regroupement = maintenant
+        cle = (notification.destinataire_id, notification.type)
+        if cle in groupes:
+            _fusionner(groupes[cle], notification, maintenant)
+        else:
+            groupes[cle] = notification
+
+    a_mettre_a_jour = []
+    # Sans savepoint : aucune requête de plus quand l'appelant est déjà en transaction
+    with transaction.atomic(savepoint=False):
+        if groupes:
+            # Verrou : deux écritures simultanées ne perdent pas d'objets liés
+            candidates = Notification.objects.select_for_update().filter(
+                destinataire_id__in={user_id for user_id, _ in groupes},
+                type__in={type_notification for _, type_notification in groupes},
+                est_lu=False,
+                reserve_par='',  # une notification en cours de livraison n'absorbe rien
+                debut_regroupement__gte=maintenant - timedelta(seconds=max(regles.values())),
+            ).order_by('debut_regroupement')
+            existantes = {}
+            for existante in candidates:
+                if existante.debut_regroupement >= maintenant - timedelta(seconds=regles[existante.type]):
+                    existantes[(existante.destinataire_id, existante.type)] = existante  # la plus récente
+
+            for cle, notification in groupes.items():
+                if cle in existantes:
+                    _fusionner(existantes[cle], notification, maintenant)
+                    a_mettre_a_jour.append(existantes[cle])
+                else:
+                    a_creer.append(notification)
+            Notification.objects.bulk_update(a_mettre_a_jour, CHAMPS_FUSION, batch_size=taille_lot)
+
+        crees = Notification.objects.bulk_create(a_creer, batch_size=taille_lot)
+        compteurs.ajouter(notification.destinataire_id for notification in crees)
+    return crees + a_mettre_a_jour
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.utils import timezone
 from .models import Notification
+from apps.accounts.models import User
 from apps.accounts.serializers import UserSerializer
 
 
@@ -12,7 +13,23 @@ class NotificationSerializer(serializers.ModelSerializer):
         model = Notification
         fields = [
             'id_notification', 'destinataire', 'destinataire_details',
-            'type', 'type_display', 'titre', 'message',
+            'type', 'type_display', 'titre', 'message', 'nombre', 'object_ids',
             'est_lu', 'est_envoye', 'date_creation', 'date_lecture'
         ]
-        read_only_fields = ['id_notification', 'date_creation', 'date_lecture']
\ No newline at end of file
+        read_only_fields = ['id_notification', 'nombre', 'object_ids', 'date_creation', 'date_lecture']
+
+
+class DiffusionSerializer(serializers.Serializer):
+    """Annonce à diffuser à une classe, un rôle et/ou une liste d'utilisateurs"""
+    type = serializers.ChoiceField(choices=Notification.TYPES, default='info')
+    titre = serializers.CharField(max_length=200)
+    message = serializers.CharField()
+    classe = serializers.IntegerField(required=False)
+    role = serializers.ChoiceField(choices=User.ROLE_CHOICES, required=False)
+    users = serializers.ListField(child=serializers.IntegerField(), required=False)
+    asynchrone = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if 'classe' not in data and not data.get('role') and not data.get('users'):
+            raise serializers.ValidationError("Précisez une classe, un rôle ou des utilisateurs")
+        return data
@@ -1,55 +1,235 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
-from .models import Notification
-from apps.academic.models import Etudiant
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from . import compteurs, regroupement
+from .models import Diffusion, Notification
+from apps.accounts.models import User
+from apps.academic.models import Note
 from apps.ai_engine.models import SuggestionExercice
 
+logger = logging.getLogger(__name__)
+
+# Diffusions mises en file : exécutées une à une hors de la requête ; une ligne
+# Diffusion garde chacune jusqu'à son exécution (reprise par traiter_diffusions)
+_file_diffusion = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notifications-diffusion')
+
 
 class NotificationService:
+    """
+    Les notifications sont construites à partir d'objets préchargés
+    (select_related) : le destinataire vient de Etudiant.user_id et le
+    ContentType du cache de ContentTypeManager. Suggestions et validations
+    sont enregistrées par regroupement.enregistrer() : une notification
+    coûte un INSERT (plus la recherche d'une notification à compléter si
+    son type est regroupé), un lot une écriture par tranche.
+    """
+
+    @staticmethod
+    def construire_suggestion(suggestion):
+        """Notification non sauvegardée d'une suggestion (etudiant et exercice préchargés)"""
+        return Notification(
+            destinataire_id=suggestion.etudiant.user_id,
+            type='suggestion',
+            titre=f"Nouvel exercice suggéré : {suggestion.exercice.titre}",
+            message=suggestion.raison,
+            content_type=ContentType.objects.get_for_model(SuggestionExercice),
+            object_id=suggestion.id_suggestion
+        )
+
+    @staticmethod
+    def construire_note_validee(note):
+        """Notification non sauvegardée d'une note validée (student et matiere préchargés)"""
+        return Notification(
+            destinataire_id=note.student.user_id,
+            type='validation',
+            titre=f"Note validée : {note.matiere.nom_matière}",
+            message=f"Vous avez obtenu {note.valeur_note}/20 en {note.matiere.nom_matière} ({note.get_type_evaluation_display()})",
+            content_type=ContentType.objects.get_for_model(Note),
+            object_id=note.id_note
+        )
 
     @staticmethod
     def notifier_suggestion(suggestion):
         """Notifier un étudiant d'une nouvelle suggestion d'exercice"""
-        etudiant = suggestion.etudiant
-        from apps.accounts.models import User
-        user = User.objects.filter(email=etudiant.email).first()
-
-        if user:
-            content_type = ContentType.objects.get_for_model(suggestion)
-
-            Notification.objects.create(
-                destinataire=user,
-                type='suggestion',
-                titre=f"Nouvel exercice suggéré : {suggestion.exercice.titre}",
-                message=suggestion.raison,
-                content_type=content_type,
-                object_id=suggestion.id_suggestion
-            )
+        return regroupement.enregistrer([NotificationService.construire_suggestion(suggestion)])[0]
 
     @staticmethod
     def notifier_note_validee(note):
         """Notifier un étudiant quand une note est validée"""
-        etudiant = note.student
-        from apps.accounts.models import User
-        user = User.objects.filter(email=etudiant.email).first()
-
-        if user:
-            content_type = ContentType.objects.get_for_model(note)
-
-            Notification.objects.create(
-                destinataire=user,
-                type='validation',
-                titre=f"Note validée : {note.matiere.nom_matière}",
-                message=f"Vous avez obtenu {note.valeur_note}/20 en {note.matiere.nom_matière} ({note.get_type_evaluation_display()})",
-                content_type=content_type,
-                object_id=note.id_note
-            )
+        return regroupement.enregistrer([NotificationService.construire_note_validee(note)])[0]
+
+    @staticmethod
+    def notifier_suggestions(suggestions, taille_lot=500):
+        """Notifie un lot de suggestions (objets préchargés ou ids)"""
+        suggestions = _charger(suggestions, SuggestionExercice.objects.select_related('etudiant', 'exercice'))
+        return regroupement.enregistrer(
+            [NotificationService.construire_suggestion(suggestion) for suggestion in suggestions], taille_lot
+        )
+
+    @staticmethod
+    def notifier_notes_validees(notes, taille_lot=500):
+        """Notifie un lot de notes validées (objets préchargés ou ids)"""
+        notes = _charger(notes, Note.objects.select_related('student', 'matiere'))
+        return regroupement.enregistrer(
+            [NotificationService.construire_note_validee(note) for note in notes], taille_lot
+        )
 
     @staticmethod
     def get_notifications_non_lues(user):
         """Récupère les notifications non lues d'un utilisateur"""
         return Notification.objects.filter(destinataire=user, est_lu=False)
 
+    @staticmethod
+    def marquer_comme_lu(user, notification_id):
+        """Marque une notification comme lue ; retourne False si elle l'était déjà"""
+        marquee = Notification.objects.filter(
+            pk=notification_id, destinataire=user, est_lu=False
+        ).update(est_lu=True, date_lecture=timezone.now())
+        compteurs.retirer(user.id, marquee)
+        return bool(marquee)
+
     @staticmethod
     def marquer_tout_comme_lu(user):
-        """Marque toutes les notifications d'un utilisateur comme lues"""
-        Notification.objects.filter(destinataire=user, est_lu=False).update(est_lu=True)
\ No newline at end of file
+        """Marque toutes les notifications d'un utilisateur comme lues ; retourne leur nombre"""
+        marquees = Notification.objects.filter(
+            destinataire=user, est_lu=False
+        ).update(est_lu=True, date_lecture=timezone.now())
+        compteurs.retirer(user.id, marquees)
+        return marquees
+
+    @staticmethod
+    def destinataires(classe_id=None, role=None, user_ids=None):
+        """Ids des utilisateurs actifs visés (classe, rôle et/ou liste), en une requête"""
+        filtre = Q()
+        if classe_id is not None:
+            filtre |= Q(etudiant__classe_id=classe_id)
+        if role:
+            filtre |= Q(role=role)
+        if user_ids:
+            filtre |= Q(id__in=user_ids)
+        if not filtre:
+            return User.objects.none().values_list('id', flat=True)
+        return User.objects.filter(filtre, is_active=True).values_list('id', flat=True).distinct().order_by('id')
+
+    @staticmethod
+    def diffuser(type, titre, message, classe_id=None, role=None, user_ids=None,
+                 content_type=None, object_id=None, taille_lot=1000):
+        """
+        Crée la même notification pour tous les destinataires visés.
+
+        Les destinataires sont résolus en une requête et les notifications
+        écrites par bulk_create de `taille_lot`. Retourne le nombre de
+        notifications créées.
+        """
+        ids = list(NotificationService.destinataires(classe_id, role, user_ids))
+        with transaction.atomic():
+            for debut in range(0, len(ids), taille_lot):
+                Notification.objects.bulk_create([
+                    Notification(
+                        destinataire_id=user_id,
+                        type=type,
+                        titre=titre,
+                        message=message,
+                        content_type=content_type,
+                        object_id=object_id,
+                    )
+                    for user_id in ids[debut:debut + taille_lot]
+                ])
+            compteurs.ajouter(ids)
+        return len(ids)
+
+    @staticmethod
+    def diffuser_en_file(**parametres):
+        """
+        Met une diffusion en file, exécutée en arrière-plan après la transaction.
+
+        La diffusion est d'abord enregistrée (ligne Diffusion) dans la
+        transaction de l'appelant : si le processus s'arrête avant de
+        l'exécuter, livrer_notifications la reprend. Avec
+        NOTIFICATIONS_DIFFUSION_ASYNC = False, la diffusion est faite
+        immédiatement (tests, commandes).
+        """
+        if not getattr(settings, 'NOTIFICATIONS_DIFFUSION_ASYNC', True):
+            return NotificationService.diffuser(**parametres)
+        if parametres.get('content_type') is not None:
+            parametres['content_type'] = parametres['content_type'].pk  # JSON
+        diffusion = Diffusion.objects.create(parametres=parametres)
+        transaction.on_commit(lambda: _file_diffusion.submit(_diffuser_en_tache, diffusion.pk))
+        return diffusion
+
+    @staticmethod
+    def executer_diffusion(diffusion_id):
+        """
+        Exécute une diffusion en file, sauf si elle est déjà traitée ou en
+        cours ailleurs. Les notifications et traitee_le sont écrits dans la
+        même transaction : une diffusion n'est jamais faite deux fois.
+        Retourne le nombre de notifications créées, ou None.
+        """
+        try:
+            with transaction.atomic():
+                diffusion = Diffusion.objects.select_for_update(skip_locked=True).filter(
+                    pk=diffusion_id, traitee_le__isnull=True
+                ).first()
+                if diffusion is None:
+                    return None
+                parametres = dict(diffusion.parametres)
+                if parametres.get('content_type') is not None:
+                    parametres['content_type'] = ContentType.objects.get_for_id(parametres['content_type'])
+                diffusion.nombre = NotificationService.diffuser(**parametres)
+                diffusion.traitee_le = timezone.now()
+                diffusion.save(update_fields=['nombre', 'traitee_le'])
+        except Exception:
+            Diffusion.objects.filter(pk=diffusion_id).update(
+                nb_echecs=F('nb_echecs') + 1, dernier_echec=timezone.now()
+            )
+            raise
+        return diffusion.nombre
+
+    @staticmethod
+    def traiter_diffusions():
+        """
+        Exécute les diffusions restées en file (processus arrêté, échec).
+        Une diffusion en échec est reprise après NOTIFICATIONS_DELAI_REPRISE
+        secondes, puis abandonnée après NOTIFICATIONS_ECHECS_MAX échecs.
+        Retourne le nombre de diffusions exécutées.
+        """
+        reprise = timezone.now() - timedelta(seconds=getattr(settings, 'NOTIFICATIONS_DELAI_REPRISE', 300))
+        en_file = Diffusion.objects.filter(
+            Q(dernier_echec__isnull=True) | Q(dernier_echec__lt=reprise),
+            traitee_le__isnull=True,
+            nb_echecs__lt=getattr(settings, 'NOTIFICATIONS_ECHECS_MAX', 5),
+        ).order_by('id').values_list('id', flat=True)
+        executees = 0
+        for diffusion_id in list(en_file):
+            try:
+                if NotificationService.executer_diffusion(diffusion_id) is not None:
+                    executees += 1
+            except Exception:
+                logger.exception("Échec de la diffusion %s", diffusion_id)
+        return executees
+
+
+def _charger(objets, queryset):
+    """Objets tels quels, ou chargés en une requête s'il s'agit d'ids"""
+    objets = list(objets)
+    if objets and all(isinstance(objet, int) for objet in objets):
+        return list(queryset.filter(pk__in=objets))
+    return objets
+
+
+def _diffuser_en_tache(diffusion_id):
+    close_old_connections()
+    try:
+        nombre = NotificationService.executer_diffusion(diffusion_id)
+        if nombre is not None:
+            logger.info("Diffusion %s : %d notifications", diffusion_id, nombre)
+    except Exception:
+        logger.exception("Échec de la diffusion %s ; elle reste en file", diffusion_id)
+    finally:
+        close_old_connections()
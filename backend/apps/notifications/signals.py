@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from . import compteurs
+from .models import Notification
+
+
+@receiver(post_save, sender=Notification)
+def compter_notification(sender, instance, created, **kwargs):
+    """Les créations groupées (bulk_create) appellent compteurs.ajouter() elles-mêmes"""
+    if created and not instance.est_lu:
+        compteurs.ajouter([instance.destinataire_id])
@@ -1,3 +1,368 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.academic.models import Administrateur, Classe, Etudiant, Matiere, Note, Professeur
+from . import compteurs
+from .canaux import CanalEmail, CanalFichier
+from .livraison import Livreur
+from .models import Diffusion, Notification
+from .services import NotificationService
+
+User = get_user_model()
+
+
+class DiffusionTestCase(TestCase):
+    def setUp(self):
+        """Une classe de trois étudiants, un étudiant d'une autre classe et le professeur de la première"""
+        self.client = APIClient()
+        self.classe = Classe.objects.create(nom_class='L1 A', niveau='L1')
+        autre_classe = Classe.objects.create(nom_class='L1 B', niveau='L1')
+        self.etudiants = []
+        for i, classe in enumerate([self.classe] * 3 + [autre_classe]):
+            user = User.objects.create_user(username=f'etu{i}', password='x', role='etudiant')
+            Etudiant.objects.create(
+                matricule=f'M{i}', nom='Nom', prenom='Test', email=f'etu{i}@test.com',
+                date_inscription='2024-09-01', classe=classe, user=user
+            )
+            self.etudiants.append(user)
+        self.professeur = User.objects.create_user(
+            username='prof', password='x', role='professeur', email='prof@test.com'
+        )
+        Professeur.objects.create(nom_prof='Prof', prenom_prof='Test', email='prof@test.com').classes.add(self.classe)
+
+    def test_diffusion_par_lots(self):
+        with self.assertNumQueries(5):
+            # Destinataires, puis deux INSERT groupés dans une transaction
+            nombre = NotificationService.diffuser(
+                'info', 'Examen', 'Examen lundi', classe_id=self.classe.id_classe,
+                user_ids=[self.professeur.id], taille_lot=2
+            )
+
+        self.assertEqual(nombre, 4)
+        self.assertEqual(
+            set(Notification.objects.values_list('destinataire', flat=True)),
+            {user.id for user in self.etudiants[:3]} | {self.professeur.id}
+        )
+
+    @override_settings(NOTIFICATIONS_DIFFUSION_ASYNC=False)
+    def test_diffusion_api(self):
+        self.client.force_authenticate(user=self.etudiants[0])
+        response = self.client.post('/api/notifications/diffuser/', {'titre': 'x', 'message': 'x', 'role': 'etudiant'})
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_authenticate(user=self.professeur)
+        response = self.client.post('/api/notifications/diffuser/', {'titre': 'x', 'message': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+        # Un professeur ne vise que ses classes et leurs étudiants
+        autre_classe = Etudiant.objects.get(user=self.etudiants[3]).classe_id
+        for cible in ({'role': 'etudiant'}, {'classe': autre_classe}, {'users': [self.etudiants[3].id]}):
+            response = self.client.post('/api/notifications/diffuser/', {'titre': 'x', 'message': 'x', **cible})
+            self.assertEqual(response.status_code, 403)
+        response = self.client.post(
+            '/api/notifications/diffuser/',
+            {'titre': 'Devoir', 'message': 'À rendre', 'classe': self.classe.id_classe, 'asynchrone': True},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Notification.objects.filter(titre='Devoir').count(), 3)
+
+        self.client.force_authenticate(user=User.objects.create_user(username='admin', password='x', role='admin'))
+        response = self.client.post(
+            '/api/notifications/diffuser/', {'titre': 'Rentrée', 'message': 'Bienvenue', 'role': 'etudiant'}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Notification.objects.filter(titre='Rentrée').count(), 4)
+
+    @override_settings(NOTIFICATIONS_DIFFUSION_ASYNC=True, NOTIFICATIONS_CANAUX=[])
+    def test_diffusion_en_file_reprise(self):
+        """Une diffusion acceptée mais perdue par le processus est reprise par le worker, une seule fois"""
+        self.client.force_authenticate(user=self.professeur)
+        with mock.patch('apps.notifications.services._file_diffusion') as file_diffusion, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/notifications/diffuser/',
+                {'titre': 'Devoir', 'message': 'À rendre', 'classe': self.classe.id_classe, 'asynchrone': True},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 202)
+        file_diffusion.submit.assert_called_once()
+        diffusion = Diffusion.objects.get()
+        self.assertIsNone(diffusion.traitee_le)
+
+        # Échec : la diffusion reste en file et attend le délai de reprise
+        with mock.patch.object(NotificationService, 'diffuser', side_effect=RuntimeError), \
+                self.assertLogs('apps.notifications.services', 'ERROR'):
+            self.assertEqual(NotificationService.traiter_diffusions(), 0)
+        self.assertEqual(NotificationService.traiter_diffusions(), 0)
+        Diffusion.objects.update(dernier_echec=timezone.now() - timedelta(hours=1))
+
+        call_command('livrer_notifications', stdout=io.StringIO())
+        call_command('livrer_notifications', stdout=io.StringIO())
+        diffusion.refresh_from_db()
+        self.assertEqual((diffusion.nombre, diffusion.nb_echecs), (3, 1))
+        self.assertEqual(Notification.objects.filter(titre='Devoir').count(), 3)
+
+
+class NotificationServiceTestCase(TestCase):
+    def setUp(self):
+        admin = Administrateur.objects.create(nom='Admin', prenom='Test', email='admin@test.com', mot_de_passe='x')
+        maths = Matiere.objects.create(nom_matière='Maths', coefficient=4)
+        self.notes = []
+        for i in range(3):
+            user = User.objects.create_user(username=f'etu{i}', password='x', role='etudiant')
+            etudiant = Etudiant.objects.create(
+                matricule=f'M{i}', nom='Nom', prenom='Test', email=f'autre{i}@test.com',
+                date_inscription='2024-09-01', user=user
+            )
+            self.notes.append(Note.objects.create(
+                student=etudiant, matiere=maths, admin=admin, type_evaluation='devoir',
+                valeur_note=12, date_note='2024-10-01', valide=True
+            ))
+        ContentType.objects.get_for_model(Note)  # cache de ContentTypeManager
+
+    def test_une_requete_par_notification(self):
+        note = Note.objects.select_related('student', 'matiere').get(id_note=self.notes[0].id_note)
+        with self.assertNumQueries(2):
+            # Groupe ouvert verrouillé (SELECT FOR UPDATE), puis un INSERT
+            notification = NotificationService.notifier_note_validee(note)
+        # Destinataire via Etudiant.user, même si l'email de l'étudiant diffère
+        self.assertEqual(notification.destinataire_id, note.student.user_id)
+        self.assertEqual(notification.titre, 'Note validée : Maths')
+
+    def test_lot_par_ids(self):
+        with self.assertNumQueries(3):
+            # Chargement des notes, groupes ouverts et un INSERT groupé
+            NotificationService.notifier_notes_validees([note.id_note for note in self.notes])
+        self.assertEqual(Notification.objects.filter(type='validation').count(), 3)
+
+
+@override_settings(NOTIFICATIONS_COMPTEURS_EN_CACHE=True)
+class BoiteReceptionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='alice', password='x', role='etudiant')
+        self.client.force_authenticate(user=self.user)
+
+    def badge(self):
+        return self.client.get('/api/notifications/non_lues/count/').data['unread_count']
+
+    def notifier(self, nombre):
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationService.diffuser('info', 'Info', 'Message', user_ids=[self.user.id])
+            for _ in range(nombre - 1):
+                Notification.objects.create(destinataire=self.user, type='info', titre='Info', message='Message')
+
+    def test_compteur_en_cache(self):
+        self.assertEqual(self.badge(), 0)
+        self.notifier(3)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.badge(), 3)
+
+        notification = Notification.objects.filter(destinataire=self.user).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/notifications/{notification.pk}/marquer_lu/')
+            self.client.post(f'/api/notifications/{notification.pk}/marquer_lu/')
+        self.assertEqual(self.badge(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/notifications/marquer_tout_lu/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.badge(), 0)
+
+        self.assertEqual(self.client.post('/api/notifications/999/marquer_lu/').status_code, 404)
+
+    def test_ajustement_pendant_le_comptage(self):
+        ajouter_au_cache = cache.add
+
+        def add_concurrent(*args, **kwargs):
+            # Une notification validée entre le COUNT et l'écriture du compteur
+            Notification.objects.create(destinataire=self.user, type='info', titre='Info', message='Message')
+            compteurs._ajuster(self.user.id, 1)
+            return ajouter_au_cache(*args, **kwargs)
+
+        with mock.patch.object(cache, 'add', add_concurrent):
+            self.assertEqual(self.badge(), 0)
+        self.assertEqual(self.badge(), 1)
+
+    @override_settings(NOTIFICATIONS_COMPTEURS_EN_CACHE=None)
+    def test_cache_local_au_processus(self):
+        # Cache local (LocMem) : le badge est compté en base à chaque lecture
+        self.notifier(2)
+        with self.assertNumQueries(1):
+            self.assertEqual(compteurs.non_lues(self.user.id), 2)
+        self.assertIsNone(cache.get(compteurs.cle(self.user.id)))
+
+    def test_pagination_par_curseur(self):
+        self.notifier(5)
+        page = self.client.get('/api/notifications/', {'page_size': 3}).data
+        self.assertEqual(len(page['results']), 3)
+        suite = self.client.get(page['next']).data
+        self.assertEqual(len(suite['results']), 2)
+        self.assertIsNone(suite['next'])
+
+
+class LivraisonTestCase(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@test.com', password='x')
+        self.bob = User.objects.create_user(username='bob', email='bob@test.com', password='x')
+        for user, nombre in ((self.alice, 3), (self.bob, 1)):
+            for i in range(nombre):
+                Notification.objects.create(destinataire=user, type='info', titre=f'Info {i}', message='Message')
+
+    def test_digests_par_utilisateur(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        chemin = Path(dossier.name) / 'notifications.jsonl'
+        livreur = Livreur(canaux=[CanalFichier(chemin), CanalEmail()], taille_lot=10)
+
+        with self.assertNumQueries(6):
+            # Réservation (savepoint, SELECT FOR UPDATE, UPDATE, libération), destinataires, UPDATE groupé
+            self.assertEqual(livreur.traiter_lot(), 4)
+
+        digests = [json.loads(ligne) for ligne in chemin.read_text(encoding='utf-8').splitlines()]
+        self.assertEqual({d['destinataire']: len(d['notifications']) for d in digests}, {self.alice.id: 3, self.bob.id: 1})
+        self.assertEqual(sorted(message.subject for message in mail.outbox), ['3 nouvelles notifications', 'Info 0'])
+        self.assertFalse(Notification.objects.filter(est_envoye=False).exists())
+        self.assertEqual(livreur.traiter_lot(), 0)
+        self.assertEqual(livreur.statistiques()['envoyees'], 4)
+
+    def test_echec_de_canal(self):
+        class CanalEnPanne:
+            def envoyer(self, digests):
+                raise ConnectionError
+
+        with self.assertLogs('apps.notifications.livraison', 'ERROR'):
+            self.assertEqual(Livreur(canaux=[CanalEnPanne()]).traiter_lot(), 4)
+        # Rien n'est marqué envoyé ni compté comme refus ; la reprise attend le délai
+        self.assertEqual(Notification.objects.filter(est_envoye=False, nb_echecs=0, reserve_par='').count(), 4)
+        self.assertEqual(Livreur(canaux=[CanalEnPanne()]).traiter_lot(), 0)
+
+    @override_settings(NOTIFICATIONS_ECHECS_MAX=2)
+    def test_livraison_par_canal(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        chemin = Path(dossier.name) / 'notifications.jsonl'
+        bob = self.bob
+
+        class CanalRefus:
+            """Refuse bob, livre les autres"""
+            recus = []
+
+            def envoyer(self, digests):
+                self.recus.extend(digest['destinataire'].id for digest in digests)
+                return [bob.id]
+
+        livreur = Livreur(canaux=[CanalFichier(chemin), CanalRefus()])
+        with self.assertLogs('apps.notifications.livraison', 'WARNING'):
+            for _ in range(2):
+                livreur.traiter_lot()
+                Notification.objects.update(reserve_le=None)  # délai de reprise écoulé
+
+        # Alice est livrée ; bob n'a reçu le fichier qu'une fois et ses notifications sont mises de côté
+        self.assertEqual(
+            list(Notification.objects.filter(est_envoye=False).values_list('destinataire', 'nb_echecs')),
+            [(bob.id, 2)]
+        )
+        self.assertEqual(len(chemin.read_text(encoding='utf-8').splitlines()), 2)
+        self.assertEqual(CanalRefus.recus, [self.alice.id, bob.id, bob.id])
+        self.assertEqual(livreur.traiter_lot(), 0)
+
+    def test_reservation_reprise_pendant_l_envoi(self):
+        """Un envoi plus long que le délai ne touche pas aux lignes reprises par un autre worker"""
+        bob = self.bob
+        autre = Livreur(canaux=[])
+
+        class CanalLent:
+            """Refuse bob ; pendant l'envoi, la réservation expire et un autre worker reprend le lot"""
+            def envoyer(self, digests):
+                Notification.objects.update(reserve_le=timezone.now() - timedelta(hours=1))
+                autre.reserver()
+                return [bob.id]
+
+        Livreur(canaux=[CanalLent()]).traiter_lot()
+        # Ni la réservation ni le compteur de refus de l'autre worker ne sont écrasés
+        notification = Notification.objects.get(destinataire=bob)
+        self.assertNotEqual(notification.reserve_par, '')
+        self.assertEqual((notification.nb_echecs, notification.canaux_livres), (0, []))
+
+
+class RegroupementTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin_user = User.objects.create_user(username='admin', password='x', role='admin')
+        admin = Administrateur.objects.create(nom='Admin', prenom='Test', email='admin@test.com', mot_de_passe='x')
+        maths = Matiere.objects.create(nom_matière='Maths', coefficient=4)
+        self.user = User.objects.create_user(username='alice', password='x', role='etudiant')
+        etudiant = Etudiant.objects.create(
+            matricule='M1', nom='Nom', prenom='Test', email='alice@test.com',
+            date_inscription='2024-09-01', user=self.user
+        )
+        self.notes = [
+            Note.objects.create(
+                student=etudiant, matiere=maths, admin=admin, type_evaluation='devoir',
+                valeur_note=10 + i, date_note=f'2024-10-0{i + 1}'
+            )
+            for i in range(4)
+        ]
+
+    def test_validations_regroupees(self):
+        self.client.force_authenticate(user=self.admin_user)
+        for note in self.notes[:3]:
+            self.client.post(f'/api/academic/notes/{note.id_note}/valider/')
+
+        notification = Notification.objects.get(destinataire=self.user)
+        self.assertEqual(notification.nombre, 3)
+        self.assertEqual(notification.titre, '3 notes validées')
+        self.assertEqual(notification.object_ids, [note.id_note for note in self.notes[:3]])
+
+        # Une fois lue, la notification n'absorbe plus les suivantes
+        notification.est_lu = True
+        notification.save()
+        NotificationService.notifier_notes_validees([self.notes[3].id_note])
+        self.assertEqual(Notification.objects.filter(destinataire=self.user).count(), 2)
+
+    def test_fenetre_depuis_le_debut_du_groupe(self):
+        debut = timezone.now()
+
+        def plus_tard(minutes):
+            return mock.patch('apps.notifications.regroupement.timezone.now', return_value=debut + timedelta(minutes=minutes))
+
+        NotificationService.notifier_notes_validees([self.notes[0].id_note])
+        # Fusions continues : la fenêtre ne glisse pas, le groupe suivant repart à zéro
+        with plus_tard(50):
+            NotificationService.notifier_notes_validees([self.notes[1].id_note])
+        with plus_tard(70):
+            NotificationService.notifier_notes_validees([self.notes[2].id_note])
+        self.assertEqual(
+            sorted(Notification.objects.values_list('nombre', flat=True)), [1, 2]
+        )
+
+        with mock.patch('apps.notifications.regroupement.OBJETS_MAX', 2):
+            NotificationService.notifier_notes_validees([note.id_note for note in self.notes[2:]])
+        groupe = Notification.objects.order_by('-id_notification').first()
+        self.assertEqual((groupe.nombre, groupe.object_ids), (3, [self.notes[2].id_note, self.notes[3].id_note]))
+
+    @override_settings(NOTIFICATIONS_REGROUPEMENT={'validation': 0})
+    def test_hors_fenetre(self):
+        NotificationService.notifier_notes_validees([note.id_note for note in self.notes[:2]])
+        NotificationService.notifier_notes_validees([self.notes[2].id_note])
+        # Un même lot reste regroupé ; la fenêtre nulle sépare les lots
+        self.assertEqual(
+            sorted(Notification.objects.values_list('nombre', flat=True)), [1, 2]
+        )
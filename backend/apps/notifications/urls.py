@@ -4,6 +4,8 @@ from . import views
 urlpatterns = [
     path('', views.NotificationListView.as_view(), name='notification-list'),
     path('non_lues/', views.NotificationNonLuesView.as_view(), name='notification-non-lues'),
+    path('non_lues/count/', views.NotificationNonLuesCountView.as_view(), name='notification-non-lues-count'),
     path('<int:pk>/marquer_lu/', views.MarquerNotificationLuView.as_view(), name='notification-marquer-lu'),
     path('marquer_tout_lu/', views.MarquerToutLuView.as_view(), name='notification-marquer-tout-lu'),
+    path('diffuser/', views.DiffusionView.as_view(), name='notification-diffuser'),
 ]
\ No newline at end of file
@@ -2,14 +2,22 @@ from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from apps.accounts.models import User
+from apps.accounts.permissions.roles import IsProfesseurOrAdmin
+from apps.academic.models import Classe
+from . import compteurs
 from .models import Notification
-from .serializers import NotificationSerializer
+from .pagination import NotificationCursorPagination
+from .serializers import DiffusionSerializer, NotificationSerializer
+from .services import NotificationService
 
 
 class NotificationListView(generics.ListAPIView):
     """Liste des notifications de l'utilisateur connecté"""
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationCursorPagination
+    filter_backends = []  # ordre imposé par la pagination par curseur
 
     def get_queryset(self):
         return Notification.objects.filter(
@@ -21,6 +29,8 @@ class NotificationNonLuesView(generics.ListAPIView):
     """Notifications non lues uniquement"""
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationCursorPagination
+    filter_backends = []  # ordre imposé par la pagination par curseur
 
     def get_queryset(self):
         return Notification.objects.filter(
@@ -29,15 +39,22 @@ class NotificationNonLuesView(generics.ListAPIView):
         ).order_by('-date_creation')
 
 
+class NotificationNonLuesCountView(APIView):
+    """Nombre de notifications non lues (badge), lu dans le cache"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({'unread_count': compteurs.non_lues(request.user.id)})
+
+
 class MarquerNotificationLuView(APIView):
     """Marquer une notification spécifique comme lue"""
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        notification = get_object_or_404(Notification, pk=pk, destinataire=request.user)
-        notification.est_lu = True
-        notification.date_lecture = timezone.now()
-        notification.save()
+        # Mise à jour conditionnelle : le compteur n'est décrémenté qu'une fois
+        if not NotificationService.marquer_comme_lu(request.user, pk):
+            get_object_or_404(Notification, pk=pk, destinataire=request.user)
         return Response({'message': 'Notification marquée comme lue'})
 
 
@@ -46,8 +63,60 @@ class MarquerToutLuView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        Notification.objects.filter(
-            destinataire=request.user,
-            est_lu=False
-        ).update(est_lu=True, date_lecture=timezone.now())
-        return Response({'message': 'Toutes les notifications ont été marquées comme lues'})
\ No newline at end of file
+        NotificationService.marquer_tout_comme_lu(request.user)
+        return Response({'message': 'Toutes les notifications ont été marquées comme lues'})
+
+
+class DiffusionView(APIView):
+    """
+    Diffuser une annonce à une classe, un rôle ou une liste d'utilisateurs.
+
+    Un professeur ne vise que ses classes et leurs étudiants ; rôles et
+    reste de l'établissement sont réservés aux administrateurs. Avec
+    "asynchrone": true, la diffusion est mise en file et la réponse (202)
+    n'attend pas l'écriture des notifications.
+    """
+    permission_classes = [IsProfesseurOrAdmin]
+
+    def hors_perimetre(self, user, donnees):
+        """Motif de refus si un professeur vise au-delà de ses classes, sinon None"""
+        if donnees.get('role'):
+            return "Seul un administrateur peut diffuser à un rôle"
+        classes = set(
+            Classe.objects.filter(professeurs__email=user.email).values_list('id_classe', flat=True)
+        ) if user.email else set()
+        if 'classe' in donnees and donnees['classe'] not in classes:
+            return "Vous n'enseignez pas dans cette classe"
+        users = set(donnees.get('users') or ())
+        if users and users - set(
+            User.objects.filter(id__in=users, etudiant__classe_id__in=classes).values_list('id', flat=True)
+        ):
+            return "Certains destinataires ne sont pas étudiants de vos classes"
+        return None
+
+    def post(self, request):
+        serializer = DiffusionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        donnees = serializer.validated_data
+        if request.user.role == 'professeur':
+            refus = self.hors_perimetre(request.user, donnees)
+            if refus:
+                return Response({'error': refus}, status=status.HTTP_403_FORBIDDEN)
+
+        parametres = {
+            'type': donnees['type'],
+            'titre': donnees['titre'],
+            'message': donnees['message'],
+            'classe_id': donnees.get('classe'),
+            'role': donnees.get('role'),
+            'user_ids': donnees.get('users'),
+        }
+        if donnees['asynchrone']:
+            NotificationService.diffuser_en_file(**parametres)
+            return Response({'message': 'Diffusion mise en file'}, status=status.HTTP_202_ACCEPTED)
+
+        nombre = NotificationService.diffuser(**parametres)
+        return Response({'message': f'{nombre} notifications envoyées', 'count': nombre},
+                        status=status.HTTP_201_CREATED)
@@ -0,0 +1,81 @@
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from apps.stats.services import snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcule les snapshots PerformanceStat / ClasseStat / GlobalStat d'un jour "
+        "ou d'une plage de jours (idempotent), ou les planifie chaque nuit"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help="Jour à calculer (AAAA-MM-JJ), aujourd'hui par défaut")
+        parser.add_argument('--debut', type=date.fromisoformat, help='Premier jour de la plage à rattraper')
+        parser.add_argument('--fin', type=date.fromisoformat, help="Dernier jour de la plage (aujourd'hui par défaut)")
+        parser.add_argument('--taille-lot', type=int, default=500, help="Nombre d'étudiants par lot")
+        parser.add_argument('--planifier', action='store_true', help='Reste actif et calcule le snapshot chaque jour')
+        parser.add_argument('--heure', default='23:30', help='Heure locale du snapshot planifié (HH:MM)')
+
+    def handle(self, *args, **options):
+        if options['planifier']:
+            try:
+                heure = datetime.strptime(options['heure'], '%H:%M').time()
+            except ValueError:
+                raise CommandError("--heure doit être au format HH:MM")
+            self._planifier(heure, options['taille_lot'])
+            return
+
+        if options['debut']:
+            fin = options['fin'] or timezone.localdate()
+            if options['debut'] > fin:
+                raise CommandError("--debut doit précéder --fin")
+            jours = [options['debut'] + timedelta(days=i) for i in range((fin - options['debut']).days + 1)]
+        else:
+            jours = [options['date'] or timezone.localdate()]
+
+        total_lignes = 0
+        debut = time.monotonic()
+        for jour in jours:
+            total_lignes += self._calculer(jour, options['taille_lot'])
+
+        if len(jours) > 1:
+            duree = time.monotonic() - debut
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(jours)} jours, {total_lignes} lignes en {duree:.2f}s "
+                f"({total_lignes / duree if duree else 0:.0f} lignes/s)"
+            ))
+
+    def _calculer(self, jour, taille_lot):
+        resultat = snapshot(jour, taille_lot=taille_lot)
+        nb_lignes = resultat['performance'] + resultat['classes'] + resultat['global']
+        duree = resultat['duree']
+        self.stdout.write(self.style.SUCCESS(
+            f"{jour} : {resultat['performance']} performances, {resultat['classes']} classes, "
+            f"{resultat['global']} globale en {duree:.2f}s "
+            f"({nb_lignes / duree if duree else 0:.0f} lignes/s)"
+        ))
+        return nb_lignes
+
+    def _planifier(self, heure, taille_lot):
+        """Boucle du planificateur intégré : un snapshot par jour à l'heure donnée"""
+        self.stdout.write(f"Snapshot planifié chaque jour à {heure:%H:%M}")
+        while True:
+            maintenant = timezone.localtime()
+            prochain = maintenant.replace(hour=heure.hour, minute=heure.minute, second=0, microsecond=0)
+            if prochain <= maintenant:
+                prochain += timedelta(days=1)
+            time.sleep((prochain - maintenant).total_seconds())
+
+            close_old_connections()
+            try:
+                self._calculer(prochain.date(), taille_lot)
+            except Exception as exc:
+                # Le planificateur survit à un échec ponctuel
+                self.stderr.write(self.style.ERROR(f"Échec du snapshot du {prochain.date()} : {exc}"))
+            finally:
+                close_old_connections()
@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 10:48
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0002_classestat_globalstat_performancestat_nb_notes_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='classestat',
+            name='date_calcul',
+            field=models.DateField(default=datetime.date.today),
+        ),
+        migrations.AlterField(
+            model_name='globalstat',
+            name='date_calcul',
+            field=models.DateField(default=datetime.date.today, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='performancestat',
+            name='date_calcul',
+            field=models.DateField(default=datetime.date.today),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 11:47
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0003_alter_classestat_date_calcul_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='classestat',
+            name='date_calcul',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AlterField(
+            model_name='globalstat',
+            name='date_calcul',
+            field=models.DateField(default=django.utils.timezone.localdate, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='performancestat',
+            name='date_calcul',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from apps.academic.models import Etudiant, Matiere, Note, Professeur, Classe
@@ -13,7 +14,7 @@ class PerformanceStat(models.Model):
     nb_exercices = models.IntegerField(default=0)
     taux_reussite = models.FloatField(default=0)  # en pourcentage
     temps_moyen = models.IntegerField(default=0)  # en minutes
-    date_calcul = models.DateField(auto_now_add=True)
+    date_calcul = models.DateField(default=timezone.localdate)
 
     class Meta:
         db_table = 'stats_performance'
@@ -35,7 +36,7 @@ class ClasseStat(models.Model):
     meilleure_matiere = models.CharField(max_length=100, blank=True)
     matiere_faible = models.CharField(max_length=100, blank=True)
     distribution = models.JSONField(default=dict)  # {'excellent': 5, 'bon': 10, ...}
-    date_calcul = models.DateField(auto_now_add=True)
+    date_calcul = models.DateField(default=timezone.localdate)
 
     class Meta:
         db_table = 'stats_classe'
@@ -55,7 +56,7 @@ class GlobalStat(models.Model):
     taux_reussite_global = models.FloatField(default=0)
     utilisateurs_actifs = models.IntegerField(default=0)
     connexions_jour = models.IntegerField(default=0)
-    date_calcul = models.DateField(auto_now_add=True, unique=True)
+    date_calcul = models.DateField(default=timezone.localdate, unique=True)
 
     class Meta:
         db_table = 'stats_global'
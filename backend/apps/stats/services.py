@@ -0,0 +1,285 @@
+import time as chrono
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+from apps.academic.aggregations import agreger_notes_par_etudiant, comparer_periodes
+from apps.academic.models import Classe, Etudiant, Matiere, Note, Professeur
+from apps.academic.synthese import resume_etudiant
+from apps.accounts.models import User
+from .models import ClasseStat, GlobalStat, PerformanceStat
+
+# Bornes de la distribution des notes
+DISTRIBUTION = {
+    'excellent': Q(valeur_note__gte=16),
+    'bon': Q(valeur_note__gte=12, valeur_note__lt=16),
+    'moyen': Q(valeur_note__gte=10, valeur_note__lt=12),
+    'insuffisant': Q(valeur_note__lt=10),
+}
+
+CHAMPS_CLASSE_STAT = [
+    'moyenne_generale', 'taux_reussite', 'nb_etudiants', 'nb_notes',
+    'meilleure_matiere', 'matiere_faible', 'distribution',
+]
+
+
+def upsert(model, objets, unique_fields, update_fields, batch_size=500):
+    """bulk_create avec mise à jour en cas de conflit sur la clé unique"""
+    if not connection.features.supports_update_conflicts_with_target:
+        unique_fields = None  # MySQL : ON DUPLICATE KEY UPDATE sans cible
+    return model.objects.bulk_create(
+        objets,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields,
+    )
+
+
+def calculer_stats_classes(classe_ids=None, jour=None):
+    """
+    Statistiques des classes en une seule passe sur Note.
+
+    Une requête groupée par classe (moyenne, distribution et réussites via
+    Count(filter=...)), une requête groupée par (classe, matière) pour le
+    classement des matières et une pour les effectifs.
+    Si `jour` est fourni, seules les notes et inscriptions jusqu'à ce jour
+    sont prises en compte (rattrapage de snapshots).
+    Retourne {classe_id: {champs de ClasseStat}} pour les classes ayant des notes.
+    """
+    notes = Note.objects.order_by()
+    etudiants = Etudiant.objects.order_by()
+    if jour is not None:
+        notes = notes.filter(date_note__lte=jour)
+        etudiants = etudiants.filter(date_inscription__lte=jour)
+    if classe_ids is not None:
+        notes = notes.filter(student__classe_id__in=classe_ids)
+        etudiants = etudiants.filter(classe_id__in=classe_ids)
+
+    lignes = notes.values('student__classe').annotate(
+        moyenne=Avg('valeur_note'),
+        nb_notes=Count('id_note'),
+        reussites=Count('id_note', filter=Q(valeur_note__gte=10)),
+        **{nom: Count('id_note', filter=condition) for nom, condition in DISTRIBUTION.items()}
+    )
+
+    # Classement des matières de chaque classe
+    matieres = {}
+    for ligne in notes.values('student__classe', 'matiere', 'matiere__nom_matière').annotate(
+        moyenne=Avg('valeur_note')
+    ):
+        matieres.setdefault(ligne['student__classe'], []).append(
+            (float(ligne['moyenne']), ligne['matiere__nom_matière'])
+        )
+
+    effectifs = dict(
+        etudiants.values('classe').annotate(nb=Count('id_student')).values_list('classe', 'nb')
+    )
+
+    stats = {}
+    for ligne in lignes:
+        classe_id = ligne['student__classe']
+        if classe_id is None:
+            continue  # Étudiants sans classe
+        classement = sorted(matieres.get(classe_id, []), reverse=True)
+        stats[classe_id] = {
+            'moyenne_generale': float(ligne['moyenne']),
+            'taux_reussite': (ligne['reussites'] / ligne['nb_notes']) * 100,
+            'nb_etudiants': effectifs.get(classe_id, 0),
+            'nb_notes': ligne['nb_notes'],
+            'meilleure_matiere': classement[0][1] if classement else "",
+            'matiere_faible': classement[-1][1] if classement else "",
+            'distribution': {nom: ligne[nom] for nom in DISTRIBUTION},
+        }
+    return stats
+
+
+def enregistrer_stats_classes(classe_ids=None, date_calcul=None):
+    """Calcule et enregistre les ClasseStat du jour ; retourne le nombre de lignes"""
+    date_calcul = date_calcul or timezone.localdate()
+    stats = calculer_stats_classes(classe_ids, jour=date_calcul)
+    upsert(
+        ClasseStat,
+        [
+            ClasseStat(classe_id=classe_id, date_calcul=date_calcul, **valeurs)
+            for classe_id, valeurs in stats.items()
+        ],
+        unique_fields=['classe', 'date_calcul'],
+        update_fields=CHAMPS_CLASSE_STAT,
+    )
+    return len(stats)
+
+
+def _debut_journee(jour):
+    """Minuit (heure locale) du jour donné, en datetime aware"""
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+
+def _progression(periodes):
+    """Évolution (%) de la moyenne des 30 derniers jours par rapport à la précédente"""
+    if periodes['moyenne_avant'] and periodes['moyenne_apres'] is not None:
+        moy_ancienne = float(periodes['moyenne_avant'])
+        return ((float(periodes['moyenne_apres']) - moy_ancienne) / moy_ancienne) * 100
+    return 0
+
+
+def _lignes_performance(student_id, jour, resume, periodes):
+    """PerformanceStat globale puis par matière d'un étudiant"""
+    stats = [PerformanceStat(
+        etudiant_id=student_id,
+        matiere=None,
+        date_calcul=jour,
+        moyenne=resume.moyenne_generale,
+        progression=_progression(periodes),
+        nb_notes=resume.nb_notes,
+        taux_reussite=(resume.nb_reussites / resume.nb_notes) * 100,
+    )]
+    for matiere_id, data in resume.par_matiere.items():
+        stats.append(PerformanceStat(
+            etudiant_id=student_id,
+            matiere_id=matiere_id,
+            date_calcul=jour,
+            moyenne=data['moyenne'],
+            nb_notes=data['nb_notes'],
+            taux_reussite=(data['nb_reussites'] / data['nb_notes']) * 100,
+        ))
+    return stats
+
+
+def calculer_stats_performance(jour, student_ids):
+    """
+    PerformanceStat (globale et par matière) d'un lot d'étudiants au jour donné.
+
+    Deux requêtes groupées quel que soit le nombre d'étudiants : l'agrégat
+    (étudiant, matière) et la progression sur 30 jours par étudiant.
+    """
+    notes = Note.objects.filter(student_id__in=student_ids, date_note__lte=jour)
+    resumes = agreger_notes_par_etudiant(notes)
+
+    coupure = jour - timedelta(days=30)
+    progressions = {
+        ligne['student']: ligne
+        for ligne in notes.order_by().values('student').annotate(
+            moyenne_avant=Avg('valeur_note', filter=Q(date_note__lt=coupure)),
+            moyenne_apres=Avg('valeur_note', filter=Q(date_note__gte=coupure)),
+        )
+    }
+
+    stats = []
+    for student_id, resume in resumes.items():
+        stats.extend(_lignes_performance(student_id, jour, resume, progressions[student_id]))
+    return stats
+
+
+def enregistrer_performance_etudiant(student_id, jour=None):
+    """
+    Recalcule les PerformanceStat du jour courant d'un étudiant depuis la synthèse.
+
+    La synthèse (SyntheseNotes) porte l'état courant des notes : elle ne sert
+    qu'au jour même, les snapshots passés restent calculés sur Note par
+    enregistrer_stats_performance. Retourne le nombre de lignes écrites.
+    """
+    jour = jour or timezone.localdate()
+    resume = resume_etudiant(student_id)
+    stats = []
+    if resume.nb_notes:
+        periodes = comparer_periodes(
+            Note.objects.filter(student_id=student_id), coupure=jour - timedelta(days=30)
+        )
+        stats = _lignes_performance(student_id, jour, resume, periodes)
+
+    with transaction.atomic():
+        PerformanceStat.objects.filter(etudiant_id=student_id, date_calcul=jour).delete()
+        PerformanceStat.objects.bulk_create(stats)
+    return len(stats)
+
+
+def enregistrer_stats_performance(jour, student_ids=None, taille_lot=500):
+    """
+    Remplace les PerformanceStat du jour, par lots d'étudiants.
+
+    La ligne globale a matiere=NULL, que l'unicité SQL ne couvre pas : les
+    lignes du jour sont donc supprimées puis recréées dans une transaction,
+    ce qui rend le calcul idempotent. Retourne le nombre de lignes écrites.
+    """
+    etudiants = Etudiant.objects.order_by('id_student')
+    if student_ids is not None:
+        etudiants = etudiants.filter(id_student__in=student_ids)
+    ids = list(etudiants.values_list('id_student', flat=True))
+
+    nb_lignes = 0
+    with transaction.atomic():
+        existantes = PerformanceStat.objects.filter(date_calcul=jour)
+        if student_ids is not None:
+            existantes = existantes.filter(etudiant_id__in=ids)
+        existantes.delete()
+
+        for i in range(0, len(ids), taille_lot):
+            stats = calculer_stats_performance(jour, ids[i:i + taille_lot])
+            PerformanceStat.objects.bulk_create(stats, batch_size=taille_lot)
+            nb_lignes += len(stats)
+    return nb_lignes
+
+
+def calculer_stats_globales(jour):
+    """
+    Champs de GlobalStat au jour donné.
+
+    Les connexions reposent sur User.last_login (dernière connexion
+    seulement) : elles ne sont exactes que pour le jour courant.
+    """
+    notes = Note.objects.filter(date_note__lte=jour).aggregate(
+        total=Count('id_note'),
+        moyenne=Avg('valeur_note'),
+        reussites=Count('id_note', filter=Q(valeur_note__gte=10)),
+    )
+    fin_journee = _debut_journee(jour + timedelta(days=1))
+    connexions = User.objects.aggregate(
+        actifs=Count('id', filter=Q(
+            last_login__gte=fin_journee - timedelta(days=7), last_login__lt=fin_journee
+        )),
+        jour=Count('id', filter=Q(
+            last_login__gte=_debut_journee(jour), last_login__lt=fin_journee
+        )),
+    )
+    return {
+        'total_etudiants': Etudiant.objects.filter(date_inscription__lte=jour).count(),
+        'total_professeurs': Professeur.objects.count(),
+        'total_classes': Classe.objects.count(),
+        'total_matieres': Matiere.objects.count(),
+        'total_notes': notes['total'],
+        'moyenne_generale': float(notes['moyenne']) if notes['moyenne'] is not None else None,
+        'taux_reussite_global': (notes['reussites'] / notes['total']) * 100 if notes['total'] else 0,
+        'utilisateurs_actifs': connexions['actifs'],
+        'connexions_jour': connexions['jour'],
+    }
+
+
+def enregistrer_stats_globales(jour):
+    """Calcule et enregistre (upsert) la GlobalStat du jour"""
+    valeurs = calculer_stats_globales(jour)
+    upsert(
+        GlobalStat,
+        [GlobalStat(date_calcul=jour, **valeurs)],
+        unique_fields=['date_calcul'],
+        update_fields=list(valeurs),
+    )
+    return 1
+
+
+def snapshot(jour, taille_lot=500):
+    """
+    Calcule les trois tables de statistiques pour un jour.
+
+    Idempotent : relancer le snapshot d'un jour remplace ses lignes.
+    Retourne {'performance', 'classes', 'global', 'duree'}.
+    """
+    debut = chrono.monotonic()
+    resultat = {
+        'performance': enregistrer_stats_performance(jour, taille_lot=taille_lot),
+        'classes': enregistrer_stats_classes(date_calcul=jour),
+        'global': enregistrer_stats_globales(jour),
+    }
+    resultat['duree'] = chrono.monotonic() - debut
+    return resultat
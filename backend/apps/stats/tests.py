@@ -1,3 +1,91 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from apps.academic.models import Classe, Etudiant, Matiere, Note, Administrateur
+from .models import ClasseStat, GlobalStat, PerformanceStat
+from .services import calculer_stats_classes, calculer_stats_performance
+
+User = get_user_model()
+
+
+class ClasseStatsTestCase(TestCase):
+    def setUp(self):
+        """Deux classes avec des notes sur deux matières"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='admin', password='x', role='admin')
+        self.client.force_authenticate(user=self.user)
+
+        admin = Administrateur.objects.create(
+            nom='Admin', prenom='Test', email='admin@test.com', mot_de_passe='x'
+        )
+        maths = Matiere.objects.create(nom_matière='Maths', coefficient=4)
+        info = Matiere.objects.create(nom_matière='Info', coefficient=2)
+        self.classes = []
+        for c, valeurs in enumerate(([8, 17], [12, 14])):
+            classe = Classe.objects.create(nom_class=f'Classe {c}', niveau='L1')
+            etudiant = Etudiant.objects.create(
+                matricule=f'M{c}', nom='Nom', prenom='Test', email=f'etu{c}@test.com',
+                date_inscription='2024-09-01', classe=classe, user=self.user
+            )
+            for matiere, valeur in zip((maths, info), valeurs):
+                Note.objects.create(
+                    student=etudiant, matiere=matiere, admin=admin, type_evaluation='devoir',
+                    valeur_note=valeur, date_note='2024-10-01', valide=True
+                )
+            self.classes.append(classe)
+
+    def test_calculer_stats_classes(self):
+        """Toutes les classes en un nombre constant de requêtes"""
+        with self.assertNumQueries(3):
+            stats = calculer_stats_classes()
+
+        premiere = stats[self.classes[0].id_classe]
+        self.assertEqual(premiere['nb_notes'], 2)
+        self.assertEqual(premiere['taux_reussite'], 50)
+        self.assertEqual(premiere['distribution'], {'excellent': 1, 'bon': 0, 'moyen': 0, 'insuffisant': 1})
+        self.assertEqual((premiere['meilleure_matiere'], premiere['matiere_faible']), ('Info', 'Maths'))
+        self.assertEqual(stats[self.classes[1].id_classe]['moyenne_generale'], 13)
+
+    def test_calculer_une_puis_toutes_les_classes(self):
+        classe_id = self.classes[0].id_classe
+        response = self.client.post(f'/api/stats/classes/calculate/{classe_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['nb_etudiants'], 1)
+
+        response = self.client.post('/api/stats/classes/calculate/')
+        self.assertEqual(response.data['nb_classes'], 2)
+        # Idempotent pour une même date
+        self.assertEqual(ClasseStat.objects.count(), 2)
+
+    def test_snapshot_idempotent_et_rattrapage(self):
+        """Relancer un jour remplace ses lignes ; un jour passé ignore les notes ultérieures"""
+        call_command('snapshot_stats', '--date=2024-10-15', stdout=StringIO())
+        call_command('snapshot_stats', '--date=2024-10-15', stdout=StringIO())
+        self.assertEqual(PerformanceStat.objects.filter(date_calcul='2024-10-15').count(), 6)
+        self.assertEqual(ClasseStat.objects.filter(date_calcul='2024-10-15').count(), 2)
+        self.assertEqual(GlobalStat.objects.get(date_calcul='2024-10-15').total_notes, 4)
+
+        call_command('snapshot_stats', '--debut=2024-09-30', '--fin=2024-10-01', stdout=StringIO())
+        self.assertEqual(GlobalStat.objects.get(date_calcul='2024-09-30').total_notes, 0)
+        self.assertFalse(PerformanceStat.objects.filter(date_calcul='2024-09-30').exists())
+        self.assertEqual(PerformanceStat.objects.filter(date_calcul='2024-10-01').count(), 6)
+
+    def test_calculer_performance_depuis_la_synthese(self):
+        """Le calcul du jour lit la synthèse et donne les mêmes lignes que le parcours des notes"""
+        etudiant = Etudiant.objects.get(matricule='M0')
+        response = self.client.post(f'/api/stats/performance/calculate/{etudiant.id_student}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['date_calcul'], timezone.localdate().isoformat())
+        self.assertEqual(response.data['taux_reussite'], 50)
 
-# Create your tests here.
+        attendues = calculer_stats_performance(timezone.localdate(), [etudiant.id_student])
+        champs = ('matiere_id', 'moyenne', 'progression', 'nb_notes', 'taux_reussite')
+        self.assertCountEqual(
+            PerformanceStat.objects.filter(etudiant=etudiant).values_list(*champs),
+            [tuple(getattr(stat, champ) for champ in champs) for stat in attendues],
+        )
@@ -10,6 +10,7 @@ urlpatterns = [
 
     # Classe stats
     path('classes/', views.ClasseStatListView.as_view(), name='classe-stats-list'),
+    path('classes/calculate/', views.CalculateClasseStatsView.as_view(), name='classe-stats-calculate-all'),
     path('classes/calculate/<int:classe_id>/', views.CalculateClasseStatsView.as_view(), name='classe-stats-calculate'),
 
     # Global stats
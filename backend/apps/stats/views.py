@@ -1,13 +1,11 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Avg, Count, Q, Sum
 from django.utils import timezone
-from datetime import timedelta
-from apps.academic.models import Etudiant, Note, Matiere, Classe, Professeur
-from apps.accounts.models import User
+from apps.academic.models import Etudiant, Classe
 from .models import PerformanceStat, ClasseStat, GlobalStat
 from .serializers import PerformanceStatSerializer, ClasseStatSerializer, GlobalStatSerializer
+from .services import enregistrer_performance_etudiant, enregistrer_stats_classes, enregistrer_stats_globales
 
 
 class PerformanceStatListView(generics.ListAPIView):
@@ -20,15 +18,14 @@ class PerformanceStatListView(generics.ListAPIView):
 
         if user.role == 'etudiant':
             # Un étudiant ne voit que ses propres stats
-            etudiant = Etudiant.objects.get(user=user)
-            return PerformanceStat.objects.filter(etudiant=etudiant)
+            return PerformanceStat.objects.filter(etudiant__user=user).select_related('etudiant', 'matiere')
         elif user.role == 'professeur':
             # Un professeur voit les stats de ses étudiants
             # À adapter selon votre logique
-            return PerformanceStat.objects.all()
+            return PerformanceStat.objects.select_related('etudiant', 'matiere')
         else:
             # Admin voit tout
-            return PerformanceStat.objects.all()
+            return PerformanceStat.objects.select_related('etudiant', 'matiere')
 
 
 class PerformanceStatDetailView(generics.RetrieveAPIView):
@@ -51,68 +48,17 @@ class CalculatePerformanceStatsView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Récupérer toutes les notes de l'étudiant
-        notes = Note.objects.filter(student=etudiant)
-
-        if not notes.exists():
+        aujourd_hui = timezone.localdate()
+        # Synthèse matérialisée de l'étudiant, sans parcourir ses notes
+        if not enregistrer_performance_etudiant(etudiant.id_student, aujourd_hui):
             return Response(
                 {'message': "Pas assez de données pour calculer les statistiques"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Statistiques globales
-        moyenne_generale = notes.aggregate(Avg('valeur_note'))['valeur_note__avg']
-        nb_notes = notes.count()
-
-        # Taux de réussite (notes >= 10)
-        taux_reussite = (notes.filter(valeur_note__gte=10).count() / nb_notes) * 100
-
-        # Calculer la progression (comparer avec le mois précédent)
-        maintenant = timezone.now().date()
-        mois_dernier = maintenant - timedelta(days=30)
-
-        notes_recentes = notes.filter(date_note__gte=mois_dernier)
-        notes_anciennes = notes.filter(date_note__lt=mois_dernier)
-
-        progression = 0
-        if notes_recentes.exists() and notes_anciennes.exists():
-            moy_recente = notes_recentes.aggregate(Avg('valeur_note'))['valeur_note__avg']
-            moy_ancienne = notes_anciennes.aggregate(Avg('valeur_note'))['valeur_note__avg']
-
-            if moy_ancienne > 0:
-                progression = ((moy_recente - moy_ancienne) / moy_ancienne) * 100
-
-        # Créer ou mettre à jour la statistique globale
-        stat, created = PerformanceStat.objects.update_or_create(
-            etudiant=etudiant,
-            matiere=None,
-            date_calcul=maintenant,
-            defaults={
-                'moyenne': moyenne_generale,
-                'progression': progression,
-                'nb_notes': nb_notes,
-                'taux_reussite': taux_reussite,
-            }
+        stat = PerformanceStat.objects.select_related('etudiant').get(
+            etudiant=etudiant, matiere__isnull=True, date_calcul=aujourd_hui
         )
-
-        # Calculer les stats par matière
-        for matiere in Matiere.objects.all():
-            notes_matiere = notes.filter(matiere=matiere)
-            if notes_matiere.exists():
-                moy_matiere = notes_matiere.aggregate(Avg('valeur_note'))['valeur_note__avg']
-                taux_matiere = (notes_matiere.filter(valeur_note__gte=10).count() / notes_matiere.count()) * 100
-
-                PerformanceStat.objects.update_or_create(
-                    etudiant=etudiant,
-                    matiere=matiere,
-                    date_calcul=maintenant,
-                    defaults={
-                        'moyenne': moy_matiere,
-                        'taux_reussite': taux_matiere,
-                        'nb_notes': notes_matiere.count(),
-                    }
-                )
-
         serializer = PerformanceStatSerializer(stat)
         return Response(serializer.data)
 
@@ -123,73 +69,42 @@ class ClasseStatListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return ClasseStat.objects.all().order_by('-date_calcul')
+        return ClasseStat.objects.select_related('classe').order_by('-date_calcul')
 
 
 class CalculateClasseStatsView(APIView):
-    """Calculer les statistiques pour une classe"""
+    """
+    Calculer les statistiques pour une classe, ou pour toutes les classes
+    en une seule passe sur les notes si aucun classe_id n'est fourni
+    """
     permission_classes = [permissions.IsAuthenticated]
 
-    def post(self, request, classe_id):
-        try:
-            classe = Classe.objects.get(id_classe=classe_id)
-        except Classe.DoesNotExist:
+    def post(self, request, classe_id=None):
+        aujourd_hui = timezone.localdate()
+
+        if classe_id is None:
+            nb_classes = enregistrer_stats_classes(date_calcul=aujourd_hui)
+            return Response({
+                'message': f'Statistiques calculées pour {nb_classes} classes',
+                'nb_classes': nb_classes,
+                'date_calcul': aujourd_hui
+            })
+
+        if not Classe.objects.filter(id_classe=classe_id).exists():
             return Response(
                 {'error': 'Classe non trouvée'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        etudiants = Etudiant.objects.filter(classe=classe)
-        notes = Note.objects.filter(student__in=etudiants)
-
-        if not notes.exists():
+        if not enregistrer_stats_classes([classe_id], date_calcul=aujourd_hui):
             return Response(
                 {'message': "Pas assez de données"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        moyenne_classe = notes.aggregate(Avg('valeur_note'))['valeur_note__avg']
-        nb_etudiants = etudiants.count()
-        nb_notes = notes.count()
-
-        # Distribution des notes
-        distribution = {
-            'excellent': notes.filter(valeur_note__gte=16).count(),
-            'bon': notes.filter(valeur_note__gte=12, valeur_note__lt=16).count(),
-            'moyen': notes.filter(valeur_note__gte=10, valeur_note__lt=12).count(),
-            'insuffisant': notes.filter(valeur_note__lt=10).count(),
-        }
-
-        # Meilleure et pire matière
-        matieres_stats = []
-        for matiere in Matiere.objects.all():
-            notes_matiere = notes.filter(matiere=matiere)
-            if notes_matiere.exists():
-                moy_matiere = notes_matiere.aggregate(Avg('valeur_note'))['valeur_note__avg']
-                matieres_stats.append({
-                    'nom': matiere.nom_matière,
-                    'moyenne': moy_matiere
-                })
-
-        matieres_stats.sort(key=lambda x: x['moyenne'], reverse=True)
-
-        meilleure_matiere = matieres_stats[0]['nom'] if matieres_stats else ""
-        matiere_faible = matieres_stats[-1]['nom'] if matieres_stats else ""
-
-        stat, created = ClasseStat.objects.update_or_create(
-            classe=classe,
-            date_calcul=timezone.now().date(),
-            defaults={
-                'moyenne_generale': moyenne_classe,
-                'taux_reussite': (notes.filter(valeur_note__gte=10).count() / nb_notes) * 100,
-                'nb_etudiants': nb_etudiants,
-                'nb_notes': nb_notes,
-                'meilleure_matiere': meilleure_matiere,
-                'matiere_faible': matiere_faible,
-                'distribution': distribution,
-            }
+        stat = ClasseStat.objects.select_related('classe').get(
+            classe_id=classe_id, date_calcul=aujourd_hui
         )
-
         serializer = ClasseStatSerializer(stat)
         return Response(serializer.data)
 
@@ -208,39 +123,10 @@ class CalculateGlobalStatsView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def post(self, request):
-        aujourd_hui = timezone.now().date()
-
-        total_etudiants = Etudiant.objects.count()
-        total_professeurs = Professeur.objects.count()
-        total_classes = Classe.objects.count()
-        total_matieres = Matiere.objects.count()
-        total_notes = Note.objects.count()
-
-        moyenne_generale = Note.objects.aggregate(Avg('valeur_note'))['valeur_note__avg']
-
-        # Utilisateurs actifs (connexion dans les 7 derniers jours)
-        semaine_derniere = timezone.now() - timedelta(days=7)
-        utilisateurs_actifs = User.objects.filter(last_login__gte=semaine_derniere).count()
-
-        # Connexions aujourd'hui
-        aujourd_hui_debut = timezone.now().replace(hour=0, minute=0, second=0)
-        connexions_jour = User.objects.filter(last_login__gte=aujourd_hui_debut).count()
-
-        stat, created = GlobalStat.objects.update_or_create(
-            date_calcul=aujourd_hui,
-            defaults={
-                'total_etudiants': total_etudiants,
-                'total_professeurs': total_professeurs,
-                'total_classes': total_classes,
-                'total_matieres': total_matieres,
-                'total_notes': total_notes,
-                'moyenne_generale': moyenne_generale,
-                'taux_reussite_global': (Note.objects.filter(
-                    valeur_note__gte=10).count() / total_notes) * 100 if total_notes > 0 else 0,
-                'utilisateurs_actifs': utilisateurs_actifs,
-                'connexions_jour': connexions_jour,
-            }
-        )
+        aujourd_hui = timezone.localdate()
+
+        enregistrer_stats_globales(aujourd_hui)
+        stat = GlobalStat.objects.get(date_calcul=aujourd_hui)
 
         serializer = GlobalStatSerializer(stat)
         return Response(serializer.data)
\ No newline at end of file
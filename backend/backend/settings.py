@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'apps.logs',
     'apps.stats',
     'apps.gestion_admin',
+    'apps.fichiers',
 ]
 
 # ============================================
@@ -115,6 +116,19 @@ else:
         }
     }
 
+# ============================================
+# CACHE
+# ============================================
+# Redis partagé entre processus si REDIS_URL est défini ; sinon cache local à
+# chaque processus (les compteurs de notifications comptent alors en base)
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
 # ============================================
 # VALIDATEURS DE MOTS DE PASSE
 # ============================================
@@ -143,6 +157,11 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Fichiers adressés par contenu (apps.fichiers)
+BLOBS_ROOT = MEDIA_ROOT / 'blobs'
+BLOBS_TAILLE_MAX = 100 * 1024 * 1024  # 100MB
+BLOBS_URL_DUREE = 24 * 3600  # tranche de validité des liens de téléchargement signés (apps.fichiers.liens)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # ============================================
@@ -202,6 +221,41 @@ REST_FRAMEWORK = {
     }
 }
 
+# Ingestion tamponnée des logs (apps.logs.buffer)
+LOGS_TAMPON = {
+    'ACTIF': os.environ.get('LOGS_TAMPON_ACTIF', 'True') == 'True',
+    'TAILLE_MAX': 10000,  # logs en attente avant abandon
+    'TAILLE_LOT': 200,
+    'INTERVALLE': 2.0,  # secondes
+}
+
+# Broker pub/sub des événements de chat (apps.chat.broker)
+CHAT_BROKER = os.environ.get('CHAT_BROKER', 'apps.chat.broker.BrokerLocal')
+CHAT_TYPING_TTL = 6  # secondes avant expiration du statut de frappe
+CHAT_TICKET_DUREE = 600  # validité (secondes) des tickets du flux d'événements (apps.chat.authentication)
+CHAT_RETENTION_JOURS = 180  # âge des messages déplacés vers l'archive (apps.chat.retention)
+
+# Génération des suggestions d'une classe en arrière-plan (False : exécutée dans la requête) ;
+# une génération interrompue est reprise par generer_suggestions_classe --file
+SUGGESTIONS_GENERATION_ASYNC = os.environ.get('SUGGESTIONS_GENERATION_ASYNC', 'True') == 'True'
+SUGGESTIONS_DELAI_REPRISE = 600  # secondes sans progression avant de reprendre une génération
+
+# Diffusions de notifications en arrière-plan (False : exécutées dans la requête) ;
+# une diffusion interrompue reste en file (modèle Diffusion) et livrer_notifications la reprend
+NOTIFICATIONS_DIFFUSION_ASYNC = os.environ.get('NOTIFICATIONS_DIFFUSION_ASYNC', 'True') == 'True'
+# Canaux du worker de livraison (apps.notifications.livraison) ; CanalEmail utilise EMAIL_BACKEND
+NOTIFICATIONS_CANAUX = os.environ.get('NOTIFICATIONS_CANAUX', 'apps.notifications.canaux.CanalConsole').split(',')
+NOTIFICATIONS_DELAI_REPRISE = 300  # secondes avant de reprendre un envoi refusé ou une réservation abandonnée
+NOTIFICATIONS_ECHECS_MAX = 5  # refus (ou échecs de diffusion) avant de mettre une notification de côté
+# Fenêtre (secondes) de regroupement par type de notification (apps.notifications.regroupement)
+NOTIFICATIONS_REGROUPEMENT = {
+    'suggestion': 3600,
+    'validation': 3600,
+}
+
+# Archives JSONL compressées des logs purgés (apps.logs.retention)
+LOGS_ARCHIVE_DIR = os.environ.get('LOGS_ARCHIVE_DIR', BASE_DIR / 'archives' / 'logs')
+
 # ============================================
 # SÉCURITÉ RENFORCÉE (en production)
 # ============================================
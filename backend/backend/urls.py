@@ -32,5 +32,6 @@ urlpatterns = [
     path('api/logs/', include('apps.logs.urls')),            # ← Nouveau
     path('api/stats/', include('apps.stats.urls')),
     path('api/gestion-admin/', include('apps.gestion_admin.urls')),  # ← Nouveau chemin
+    path('api/fichiers/', include('apps.fichiers.urls')),
 
 ]
\ No newline at end of file
@@ -68,8 +68,8 @@ const Navbar = ({ toggleSidebar, isSidebarOpen }) => {
   const fetchUnreadCount = useCallback(async () => {
     if (user) {
       try {
-        const response = await notificationsService.getNonLues()
-        setUnreadCount(response.data.length)
+        const response = await notificationsService.getNonLuesCount()
+        setUnreadCount(response.data)
       } catch (error) {
         console.error('Erreur chargement notifications:', error)
       }
@@ -1,4 +1,4 @@
-import React, { createContext, useContext, useState, useEffect } from 'react'
+import React, { createContext, useContext, useState, useEffect, useRef } from 'react'
 import { useAuth } from '../hooks/useAuth'
 import { chatService } from '../services/chat'
 
@@ -16,21 +16,64 @@ export const ChatProvider = ({ children }) => {
   const [messages, setMessages] = useState([])
   const [loading, setLoading] = useState(true)
   const [unreadCount, setUnreadCount] = useState(0)
+  const activeConversationRef = useRef(null)
 
   useEffect(() => {
-    if (user) {
-      loadConversations()
-      loadUnreadCount()
+    if (!user) return
+
+    loadConversations()
+    loadUnreadCount()
+
+    // Événements poussés par le serveur (SSE) à la place du rafraîchissement périodique
+    let source = null
+    let reconnectTimer = null
+    let closed = false
+
+    const scheduleReconnect = () => {
+      if (!closed) reconnectTimer = setTimeout(openStream, 5000)
+    }
 
-      // Rafraîchir toutes les 30 secondes
-      const interval = setInterval(() => {
-        loadUnreadCount()
-      }, 30000)
+    const openStream = async () => {
+      try {
+        const response = await chatService.getStreamTicket()
+        if (closed) return
+        source = chatService.openStream(response.data.ticket)
+        source.addEventListener('message', (e) => handleNewMessage(JSON.parse(e.data)))
+        source.addEventListener('read', (e) => {
+          const event = JSON.parse(e.data)
+          if (event.data.user === user.id) loadUnreadCount()
+        })
+        source.onerror = () => {
+          // Fin normale du flux : le navigateur se reconnecte seul.
+          // Flux refusé (ticket expiré) : nouveau ticket.
+          if (source.readyState === EventSource.CLOSED) scheduleReconnect()
+        }
+      } catch (error) {
+        console.error('Erreur ouverture du flux:', error)
+        scheduleReconnect()
+      }
+    }
+
+    openStream()
 
-      return () => clearInterval(interval)
+    return () => {
+      closed = true
+      clearTimeout(reconnectTimer)
+      source?.close()
     }
   }, [user])
 
+  const handleNewMessage = (event) => {
+    const message = event.data
+    if (Number(event.conversation) === Number(activeConversationRef.current)) {
+      setMessages((previous) =>
+        previous.some((m) => m.id === message.id) ? previous : [...previous, message]
+      )
+    }
+    loadConversations()
+    if (message.sender !== user.id) loadUnreadCount()
+  }
+
   const loadConversations = async () => {
     try {
       const response = await chatService.getConversations()
@@ -53,8 +96,10 @@ export const ChatProvider = ({ children }) => {
 
   const loadMessages = async (conversationId) => {
     try {
+      activeConversationRef.current = conversationId
       const response = await chatService.getMessages(conversationId)
-      setMessages(response.data || [])
+      // Réponse paginée par curseur : les messages sont dans results
+      setMessages(response.data?.results || [])
 
       // Marquer comme lu
       await chatService.markAsRead(conversationId)
@@ -12,4 +12,8 @@ export const chatService = {
   setTyping: (conversationId, isTyping) =>
     api.post(`/chat/conversations/${conversationId}/typing/`, { is_typing: isTyping }),
   getUnreadCount: () => api.get('/chat/unread-count/'),
+  // Flux d'événements (SSE) : EventSource n'envoie pas le jeton, d'où le ticket
+  getStreamTicket: () => api.post('/chat/stream/ticket/'),
+  openStream: (ticket) =>
+    new EventSource(`${api.defaults.baseURL}/chat/stream/?ticket=${encodeURIComponent(ticket)}`),
 }
\ No newline at end of file
@@ -69,6 +69,16 @@ export const notificationsService = {
     }
   },
 
+  // Nombre de notifications non lues (badge)
+  getNonLuesCount: async () => {
+    try {
+      const response = await api.get('/notifications/non_lues/count/')
+      return { data: response.data?.unread_count ?? 0 }
+    } catch (error) {
+      return { data: mockNotifications.filter(n => !n.est_lu).length }
+    }
+  },
+
   // Marquer une notification comme lue
   marquerLu: async (id) => {
     try {